@@ -3,6 +3,7 @@ sys.path.append(r"C:/Users/nundinir/Desktop/Bertec_Streaming_GSE/vicon_dssdk")
 
 from vicon_dssdk import ViconDataStream
 from time import sleep
+import numpy as np
 
 class ViconSDK_Wrapper:
     '''
@@ -19,6 +20,8 @@ class ViconSDK_Wrapper:
         # Enable streaming device data. Could enable other data here too. 
         self.client.EnableDeviceData()
         self.lastZForce = 0
+        self.last_frame_number = None
+        self.new_frame = False  # False if the last batch fetch returned an already-seen frame
         sleep(0.2)
         self.client.GetFrame()
         forceplate_to_vicon_latency=self.client.GetLatencyTotal()
@@ -44,6 +47,38 @@ class ViconSDK_Wrapper:
 
         return results
 
+    def get_device_values_batch(self, forceplate_name_list = ["Hexapod"], output_names = ["Force"], component_names = ["Fz"]):
+        """
+        Gets every sub-sample of the latest frame for all requested plates/outputs/components in one call.
+        The Bertec plates sample faster than the Vicon frame rate, so each frame carries several device sub-samples.
+        Rows are sorted first by forceplate, then by output_names, and then by component (same order as get_latest_device_values).
+
+        Returns:
+            values (np.ndarray): shape (n_channels, n_subsamples), oldest sub-sample first
+        """
+        self.client.GetFrame()
+        frame_number = self.client.GetFrameNumber()
+        self.new_frame = frame_number != self.last_frame_number
+        self.last_frame_number = frame_number
+
+        n_channels = len(forceplate_name_list) * len(output_names) * len(component_names)
+        values = None
+        row = 0
+        for plate_name in forceplate_name_list:
+            for output_name in output_names:
+                for component_name in component_names:
+                    (retData,interpdFrame) = self.client.GetDeviceOutputValues(plate_name,output_name, component_name)
+                    if values is None:
+                        values = np.empty((n_channels, len(retData)))
+                    values[row, :] = retData
+                    row += 1
+
+        return values
+
+    def get_subsample_period(self, n_subsamples):
+        """Time between device sub-samples (s), given the number of sub-samples in a Vicon frame"""
+        return 1 / (self.client.GetFrameRate() * n_subsamples)
+
 
 if __name__=='__main__':
     client = ViconSDK_Wrapper('ROB-ROUSE-VICON.adsroot.itcs.umich.edu')
@@ -44,6 +44,17 @@ class Subscriber():
             message_decoded = str(message, self.encoding)
         return topic_decoded, message_decoded, msg_received
 
+    def get_frame(self) -> (str, float, float, list, bool):
+        """
+        Checks for a frame message sent with Publisher.publish_frame(). If no message is available in the timeout, the values list is empty. 
+        Returns topic, timestamp of the newest sample, sample period, list of values (oldest first), msg_received flag
+        """
+        topic, message, msg_received = self.get_message()
+        if not msg_received:
+            return topic, 0.0, 0.0, [], msg_received
+        fields = [float(field) for field in message.split(',')]
+        return topic, fields[0], fields[1], fields[2:], msg_received
+
 
 class Publisher():
     """ 
@@ -62,6 +73,13 @@ class Publisher():
         assert " " not in topic, "topic name cannot have spaces!"
         self.socket.send_string(topic + " " + message)
 
+    def publish_frame(self, topic, timestamp, sample_period, values) -> None:
+        """
+        Publish a block of evenly spaced samples as one message: timestamp of the newest sample, the sample period, then the values (oldest first). 
+        Read it back with Subscriber.get_frame().
+        """
+        self.publish(topic, '%f,%f,' % (timestamp, sample_period) + ','.join('%f' % value for value in values))
+
 
 def testSub():
     """
@@ -0,0 +1,153 @@
+"""
+NTP-style clock offset/drift estimation between the Vicon PC (force plate publisher) and the Pi (controller).
+
+The publisher stamps force plate frames with its own time.time(). Those stamps are only useful on the Pi once they are mapped into the Pi clock.
+TimeServer runs next to the Publisher and answers pings without blocking its loop.
+ClockOffsetEstimator runs on the Pi, pings the TimeServer every ping_period seconds and fits offset + drift on the lowest round-trip pings.
+
+For every ping:
+    t1: client send time (Pi clock)
+    t2: server receive time (Vicon clock)
+    t3: server reply time (Vicon clock)
+    t4: client receive time (Pi clock)
+    offset = ((t2 - t1) + (t3 - t4)) / 2     (Vicon clock - Pi clock)
+    round trip delay = (t4 - t1) - (t3 - t2)
+
+Requires pyzmq
+"""
+import time
+import numpy as np
+import zmq
+
+class TimeServer():
+    """
+    Answers clock sync pings from ClockOffsetEstimator. Call serve_pending() once per publisher loop; it never blocks.
+    clock is the time source used for the replies (the same one that stamps the published frames).
+    """
+    def __init__(self, port = "5557", clock = time.time) -> None:
+        self.clock = clock
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.ROUTER)
+        self.socket.bind("tcp://*:%s" % port)
+
+    def serve_pending(self) -> int:
+        """Replies to every ping waiting in the socket. Returns the number of pings answered."""
+        served = 0
+        while True:
+            try:
+                identity, message = self.socket.recv_multipart(zmq.NOBLOCK)
+            except zmq.Again:
+                return served
+            t2 = self.clock()
+            seq, t1 = message.split(b',')
+            t3 = self.clock()
+            self.socket.send_multipart([identity, b'%s,%s,%f,%f' % (seq, t1, t2, t3)])
+            served += 1
+
+
+class ClockOffsetEstimator():
+    """
+    Estimates offset and drift of the publisher clock relative to the local clock, and maps publisher timestamps into the local clock.
+
+    Args:
+        publisher_ip: IP address of the PC running the TimeServer
+        port: TimeServer port
+        ping_period: time between pings (s)
+        history_size: number of pings kept for the fit
+        best_fraction: fraction of the lowest round-trip pings used for the fit (network jitter only ever adds delay)
+    """
+    def __init__(self, publisher_ip = 'localhost', port = "5557", ping_period = 0.25, history_size = 64, best_fraction = 0.5) -> None:
+        self.context = zmq.Context()
+        self.socket = self.context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        # Only queue pings on a live connection, and only a few: a stale ping is useless for the fit
+        self.socket.setsockopt(zmq.IMMEDIATE, 1)
+        self.socket.setsockopt(zmq.SNDHWM, 4)
+        self.socket.connect(("tcp://" + publisher_ip + ":%s") % port)
+
+        self.ping_period = ping_period
+        self.best_fraction = best_fraction
+
+        # ping history (circular): local midpoint time, offset, round trip delay
+        self.history_size = history_size
+        self.ping_times = np.zeros(history_size)
+        self.offsets = np.zeros(history_size)
+        self.delays = np.zeros(history_size)
+        self.num_pings = 0
+        self.pntr = 0
+
+        self.seq = 0
+        self.last_ping_time = 0
+
+        # fitted model: offset(t) = offset + drift * (t - t_ref)
+        self.offset = 0.0
+        self.drift = 0.0
+        self.t_ref = 0.0
+        self.round_trip_delay = 0.0
+
+    def is_synced(self) -> bool:
+        return self.num_pings > 0
+
+    def update(self) -> bool:
+        """
+        Sends a ping if ping_period has passed and reads any replies. Never blocks; call once per receiver loop.
+        Returns True if a new reply was folded into the estimate.
+        """
+        now = time.time()
+        if now - self.last_ping_time >= self.ping_period:
+            self.seq += 1
+            try:
+                self.socket.send(b'%d,%f' % (self.seq, now), zmq.NOBLOCK)
+            except zmq.Again:
+                pass    # TimeServer not reachable (or pings backed up): skip this ping, keep the current estimate
+            self.last_ping_time = now
+
+        new_estimate = False
+        while True:
+            try:
+                reply = self.socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                break
+            t4 = time.time()
+            seq, t1, t2, t3 = reply.split(b',')
+            self.add_ping(float(t1), float(t2), float(t3), t4)
+            new_estimate = True
+
+        return new_estimate
+
+    def add_ping(self, t1, t2, t3, t4) -> None:
+        """Adds one ping (see module docstring for the timestamps) and refits offset and drift."""
+        self.ping_times[self.pntr] = (t1 + t4) / 2
+        self.offsets[self.pntr] = ((t2 - t1) + (t3 - t4)) / 2
+        self.delays[self.pntr] = (t4 - t1) - (t3 - t2)
+        self.pntr = (self.pntr + 1) % self.history_size
+        self.num_pings = min(self.num_pings + 1, self.history_size)
+        self.fit()
+
+    def fit(self) -> None:
+        """Least-squares fit of offset vs local time over the lowest round-trip pings."""
+        n = self.num_pings
+        ping_times = self.ping_times[:n]
+        offsets = self.offsets[:n]
+        delays = self.delays[:n]
+
+        n_best = max(int(n * self.best_fraction), 1)
+        best = np.argsort(delays)[:n_best]
+        self.round_trip_delay = delays[best[0]]
+
+        self.t_ref = np.mean(ping_times[best])
+        self.offset = np.mean(offsets[best])
+        t_span = ping_times[best] - self.t_ref
+        if n_best >= 3 and np.ptp(t_span) > 0:
+            self.drift = np.dot(t_span, offsets[best] - self.offset) / np.dot(t_span, t_span)
+        else:
+            self.drift = 0.0
+
+    def offset_at(self, local_time) -> float:
+        """Publisher clock minus local clock at local_time (s)"""
+        return self.offset + self.drift * (local_time - self.t_ref)
+
+    def to_local(self, publisher_time) -> float:
+        """Maps a publisher timestamp into the local clock"""
+        # solves publisher_time = t_local + offset_at(t_local) for t_local
+        return (publisher_time - self.offset + self.drift * self.t_ref) / (1 + self.drift)
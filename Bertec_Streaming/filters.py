@@ -1,5 +1,6 @@
 import numpy as np
 import time
+from scipy import signal
 
 class LowPassFilter:
     def __init__(self, w):
@@ -33,4 +34,124 @@ class LowPassFilter:
         self.x_prev = x
         self.state_time_prev = state_time
 
-        return y
\ No newline at end of file
+        return y
+
+class ButterworthFilterBank:
+    """
+    Butterworth lowpass that filters several channels at once (e.g. left and right plate) as second-order sections.
+
+    Coefficients are designed for the sample period rounded to dt_resolution and cached, so a jittery loop period
+    doesn't mean a filter redesign every sample. Streaming (update, filter_block on consecutive blocks) and
+    offline use (filter_block on a whole recording) share the same filter state.
+
+    Args:
+        cutoff: cutoff frequency (Hz)
+        channels: number of channels filtered together
+        order: Butterworth order. 1 (default) is the same first-order filter as LowPassFilter (bilinear transform without
+            prewarping); higher orders roll off faster but add group delay, which shifts heel strike/toe off detection
+        dt_resolution: sample period quantization for the coefficient cache (s)
+    """
+    def __init__(self, cutoff, channels=1, order=1, dt_resolution=1e-5):
+        self.cutoff = cutoff
+        self.channels = channels
+        self.order = order
+        self.dt_resolution = dt_resolution
+
+        self.sos_cache = {}
+        self.max_cache_size = 64
+
+        self.state_time_prev = None
+        self.x_prev = None
+        self.zi = None  # (n_sections, channels, 2), same layout as scipy.signal.sosfilt
+
+        # Fill up history before filtering
+        self.cold = True
+
+    def coefficients(self, dt):
+        """Second-order sections for sample period dt, from the cache when possible"""
+        key = max(int(round(dt / self.dt_resolution)), 1)
+        sos = self.sos_cache.get(key)
+        if sos is None:
+            fs = 1 / (key * self.dt_resolution)
+            # keep the cutoff below Nyquist if the loop momentarily runs slow
+            cutoff = min(self.cutoff, 0.45 * fs)
+            if self.order == 1:
+                # LowPassFilter's coefficients: y = a * y_prev + b * (x + x_prev)
+                w_dt = 2 * np.pi * cutoff / fs
+                a = -(w_dt - 2) / (w_dt + 2)
+                b = w_dt / (w_dt + 2)
+                sos = np.array([[b, b, 0.0, 1.0, -a, 0.0]])
+            else:
+                sos = signal.butter(self.order, cutoff, fs=fs, output='sos')
+            if len(self.sos_cache) >= self.max_cache_size:
+                self.sos_cache.clear()
+            self.sos_cache[key] = sos
+        return sos
+
+    def warm_up(self, sos, x0):
+        """Starts the filter at steady state for input x0 (no start-up transient)"""
+        self.zi = signal.sosfilt_zi(sos)[:, np.newaxis, :] * np.asarray(x0, dtype=float)[np.newaxis, :, np.newaxis]
+        self.cold = False
+
+    def reset(self):
+        self.state_time_prev = None
+        self.x_prev = None
+        self.zi = None
+        self.cold = True
+
+    def update(self, x, state_time):
+        """
+        Filters one sample per channel.
+
+        Args:
+            x: array-like of length channels
+            state_time: time of the sample (s)
+
+        Returns:
+            y (np.ndarray): filtered sample per channel
+        """
+        x = np.asarray(x, dtype=float)
+        if self.state_time_prev is None:
+            # need a sample period before the first filtered value
+            self.x_prev = x
+            self.state_time_prev = state_time
+            return x
+
+        sos = self.coefficients(state_time - self.state_time_prev)
+        if self.cold:
+            self.warm_up(sos, self.x_prev)
+
+        # Transposed direct form II, one section at a time, all channels at once
+        y = x
+        for section, z in zip(sos, self.zi):
+            b0, b1, b2, _, a1, a2 = section
+            out = b0 * y + z[:, 0]
+            z[:, 0] = b1 * y - a1 * out + z[:, 1]
+            z[:, 1] = b2 * y - a2 * out
+            y = out
+
+        self.state_time_prev = state_time
+        return y
+
+    def filter_block(self, x, dt, state_time=None):
+        """
+        Filters evenly spaced samples for all channels in one vectorized call, continuing from the current state.
+
+        Args:
+            x: array of shape (channels, n_samples), oldest first
+            dt: sample period (s)
+            state_time: time of the newest sample (s), lets update() continue from this block
+
+        Returns:
+            y (np.ndarray): filtered samples, shape (channels, n_samples)
+        """
+        x = np.asarray(x, dtype=float)
+        sos = self.coefficients(dt)
+        if self.cold:
+            self.warm_up(sos, x[:, 0] if self.x_prev is None else self.x_prev)
+
+        y, self.zi = signal.sosfilt(sos, x, axis=-1, zi=self.zi)
+
+        if state_time is not None:
+            self.state_time_prev = state_time
+        return y
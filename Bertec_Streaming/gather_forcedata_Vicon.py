@@ -3,21 +3,23 @@ sys.path.append(r"C:/Users/nundinir/Downloads/SoftRTloop/")
 
 from Vicon import ViconSDK_Wrapper
 from ZMQ_PubSub import Publisher 
+from clock_sync import TimeServer
 import time
 from SoftRTloop import FlexibleTimer
 from utils import CircularBuffer
-from filters import LowPassFilter
+from filters import ButterworthFilterBank
 
 vicon = ViconSDK_Wrapper('localhost','801') 
 bertec_period_tracker = CircularBuffer(channels=2, size=500)
 
 # Get force data from bertec 
 pub = Publisher()
+time_server = TimeServer()     # answers clock sync pings from the Pi
 loopFreq = 1000 # Hz
 
 filter_w = 5.0  # Hz
-left_fp_filter = LowPassFilter(filter_w)
-right_fp_filter = LowPassFilter(filter_w)
+filter_order = 1   # 1: same response as the old LowPassFilter; 2+ is a steeper Butterworth (more delay, shifts HS/TO)
+fp_filter = ButterworthFilterBank(filter_w, channels=2, order=filter_order)    # row 0: right plate, row 1: left plate
 # softRTloop = FlexibleTimer(target_freq=loopFreq)	# instantiate soft real-time loop
 
 starting_time = time.time()
@@ -26,20 +28,29 @@ count = 0
 print_every = 2000
 try:
     while True:
+        time_server.serve_pending()
         collection_time = time.time()
-        z_forces = [f*-1 for f in vicon.get_latest_device_values(["RightForcePlate", "LeftForcePlate"], ["Force"], ["Fz"])] #this is done on the Vicon computer 
+        # every sub-sample of the frame: row 0 is right, row 1 is left
+        z_forces = -1 * vicon.get_device_values_batch(["RightForcePlate", "LeftForcePlate"], ["Force"], ["Fz"]) #this is done on the Vicon computer 
+        if not vicon.new_frame:
+            continue    # same frame as last time, its sub-samples were already published
+        n_subsamples = z_forces.shape[1]
+        subsample_period = vicon.get_subsample_period(n_subsamples)
 
-        z_filt_right = right_fp_filter.update(z_forces[0], collection_time)
-        z_filt_left = left_fp_filter.update(z_forces[1], collection_time)
+        # the newest sub-sample was measured GetLatencyTotal before it reached the SDK
+        streaming_latency = vicon.get_streaming_latency()
+        sample_time = collection_time - streaming_latency
+
+        [z_filt_right, z_filt_left] = fp_filter.filter_block(z_forces, subsample_period, sample_time)
 
         # pub.send_array(z_forces)
         pub.publish('time', '%f' %collection_time)
-        pub.publish('fz_right','% f' %z_filt_right)
-        pub.publish('fz_left', '%f' %z_filt_left)
+        pub.publish_frame('fz_right', sample_time, subsample_period, z_filt_right)
+        pub.publish_frame('fz_left', sample_time, subsample_period, z_filt_left)
 
         # Clock the Frequency of the loop
         end_time = time.time()
-        bertec_period_tracker.update(end_time-prev_time, vicon.get_streaming_latency())
+        bertec_period_tracker.update(end_time-prev_time, streaming_latency)
         prev_time = end_time
 
         count += 1
@@ -48,6 +59,7 @@ try:
             print("Time alive: {:.2f} seconds".format(prev_time - starting_time))
             print("Streaming Latency: {}".format(latency))
             print("Loop Frequency:", 1/period)
+            print("Sub-samples per frame:", n_subsamples)
             # print("Raw FP Data:", z_forces)
             # print("Filtered FP Data:", [z_filt_right, z_filt_left])
             print()
@@ -0,0 +1,155 @@
+# Description:
+# Replays recorded Bertec force plate data through ZMQ_PubSub.Publisher so the Pi-side Bertec pipeline
+# (bertec_communication_thread + GroundContact) can be exercised without the Vicon PC and treadmill.
+# Publishes the same 'fz_right'/'fz_left' frame messages and runs the same clock sync TimeServer as gather_forcedata_Vicon.py.
+#
+# Supported recordings:
+#   GSE log (Experimental_Logs/*.csv): 'state_time_left', 'all_bertec_left', 'all_bertec_right' columns
+#   treadmill_buddy log (*_fpdata.csv): 'pitime', 'fp_l', 'fp_r' columns
+#
+# Example (2x speed, 3 ms jitter, 1% dropped frames):
+#   python replay_forcedata.py Sub1_Vickrey_NPO_07012024.csv --speed 2 --jitter 0.003 --dropout 0.01
+
+import argparse
+import csv
+import time
+import numpy as np
+
+from ZMQ_PubSub import Publisher
+from clock_sync import TimeServer
+from filters import ButterworthFilterBank
+
+# (time column, left force column, right force column) for each supported recording
+RECORDING_COLUMNS = [('state_time_left', 'all_bertec_left', 'all_bertec_right'),   # GSE log
+                     ('pitime', 'fp_l', 'fp_r')]                                    # treadmill_buddy *_fpdata.csv
+
+def load_recording(filename):
+    """
+    Loads force plate data from a GSE log or a treadmill_buddy fpdata file.
+
+    Returns:
+        t (np.ndarray): sample times (s), starting at 0
+        fz_left, fz_right (np.ndarray): vertical forces (N)
+    """
+    with open(filename, 'r') as f:
+        reader = csv.reader(f, quotechar='|')
+        header = next(reader)
+        rows = [row for row in reader if row]
+
+    for time_col, left_col, right_col in RECORDING_COLUMNS:
+        if time_col in header and left_col in header and right_col in header:
+            break
+    else:
+        raise ValueError("{} has no recognized force plate columns".format(filename))
+
+    data = np.array([[row[header.index(time_col)], row[header.index(left_col)], row[header.index(right_col)]] for row in rows], dtype=float)
+    t = data[:, 0] - data[0, 0]
+    return t, data[:, 1], data[:, 2]
+
+def resample_uniform(t, fz_left, fz_right, sample_period=None):
+    """Resamples onto a uniform grid (the recordings are logged at the thread rate, not the plate rate). Defaults to the median period."""
+    if sample_period is None:
+        sample_period = np.median(np.diff(t))
+    t_uniform = np.arange(0, t[-1], sample_period)
+    return t_uniform, np.interp(t_uniform, t, fz_left), np.interp(t_uniform, t, fz_right), sample_period
+
+def filter_recording(fz_left, fz_right, sample_period, cutoff, order=1):
+    """Applies the publisher's force plate filter offline (for raw recordings, so the replay matches what gather_forcedata_Vicon.py sends)"""
+    fp_filter = ButterworthFilterBank(cutoff, channels=2, order=order)
+    [fz_left, fz_right] = fp_filter.filter_block(np.vstack([fz_left, fz_right]), sample_period)
+    return fz_left, fz_right
+
+class ForceReplayer:
+    """
+    Publishes a recording frame by frame on the wall clock.
+
+    Args:
+        t, fz_left, fz_right: uniformly sampled recording (see resample_uniform)
+        sample_period: recording sample period (s)
+        frame_rate: emulated Vicon frame rate (Hz); each frame carries every sample since the last one
+        speed: playback speed (2 = twice real time)
+        jitter: std of the extra (non-negative) publish delay per frame (s)
+        dropout: probability of dropping a frame
+        clock_offset: added to the published timestamps and the TimeServer clock to emulate a Vicon PC clock offset (s)
+    """
+    def __init__(self, t, fz_left, fz_right, sample_period, frame_rate=100, speed=1.0, jitter=0.0, dropout=0.0,
+                 clock_offset=0.0, port="5556", clock_sync_port="5557", seed=None):
+        self.t = t
+        self.fz_left = fz_left
+        self.fz_right = fz_right
+        self.sample_period = sample_period
+        self.samples_per_frame = max(int(round(1 / (frame_rate * sample_period))), 1)
+        self.speed = speed
+        self.jitter = jitter
+        self.dropout = dropout
+        self.clock_offset = clock_offset
+        self.rng = np.random.default_rng(seed)
+
+        self.pub = Publisher(port)
+        self.time_server = TimeServer(clock_sync_port, clock=self.publisher_clock)
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+
+    def publisher_clock(self):
+        return time.time() + self.clock_offset
+
+    def wait_until(self, wall_time):
+        """Sleeps until wall_time while still answering clock sync pings"""
+        while True:
+            self.time_server.serve_pending()
+            remaining = wall_time - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 0.001))
+
+    def run(self, warmup=1.0):
+        # give subscribers time to connect (ZMQ drops messages sent before they join) and clock sync to settle
+        self.wait_until(time.time() + warmup)
+
+        start_time = time.time()
+        n_samples = len(self.t)
+        for end in range(self.samples_per_frame, n_samples + 1, self.samples_per_frame):
+            frame = slice(end - self.samples_per_frame, end)
+            sample_time = start_time + self.t[end - 1] / self.speed   # wall time the newest sample "happened"
+
+            delay = abs(self.rng.normal(0, self.jitter)) if self.jitter > 0 else 0.0
+            self.wait_until(sample_time + delay)
+
+            if self.rng.random() < self.dropout:
+                self.frames_dropped += 1
+                continue
+
+            self.pub.publish_frame('fz_right', sample_time + self.clock_offset, self.sample_period / self.speed, self.fz_right[frame])
+            self.pub.publish_frame('fz_left', sample_time + self.clock_offset, self.sample_period / self.speed, self.fz_left[frame])
+            self.frames_sent += 1
+
+        print("Replay finished: {} frames sent, {} dropped".format(self.frames_sent, self.frames_dropped))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay recorded Bertec force plate data over ZMQ")
+    parser.add_argument('recording', help="GSE log or treadmill_buddy *_fpdata.csv")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback speed (N x real time)")
+    parser.add_argument('--frame-rate', type=float, default=100, help="emulated Vicon frame rate (Hz)")
+    parser.add_argument('--sample-period', type=float, default=None, help="resampling period (s), defaults to the recording's median")
+    parser.add_argument('--jitter', type=float, default=0.0, help="std of injected publish delay (s)")
+    parser.add_argument('--dropout', type=float, default=0.0, help="probability of dropping a frame")
+    parser.add_argument('--clock-offset', type=float, default=0.0, help="emulated publisher clock offset (s)")
+    parser.add_argument('--filter-cutoff', type=float, default=None, help="lowpass raw recordings like the Vicon publisher does (Hz)")
+    parser.add_argument('--filter-order', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    t, fz_left, fz_right = load_recording(args.recording)
+    t, fz_left, fz_right, sample_period = resample_uniform(t, fz_left, fz_right, args.sample_period)
+    if args.filter_cutoff is not None:
+        fz_left, fz_right = filter_recording(fz_left, fz_right, sample_period, args.filter_cutoff, args.filter_order)
+    print("Loaded {:.1f} s of force data at {:.0f} Hz".format(t[-1], 1 / sample_period))
+
+    replayer = ForceReplayer(t, fz_left, fz_right, sample_period, frame_rate=args.frame_rate, speed=args.speed,
+                             jitter=args.jitter, dropout=args.dropout, clock_offset=args.clock_offset, seed=args.seed)
+    try:
+        replayer.run()
+    except KeyboardInterrupt:
+        print("Stopping Replay")
@@ -5,17 +5,24 @@ import numpy as np
 
 class CircularBuffer:
     # Use to track averages of some numerical quantity
+    # Keeps a running per-channel sum so mean() is O(channels) instead of O(channels * size)
     def __init__(self, channels: int = 1, size:int = 100):
         self.size = size
         self.channels = channels
         self.buffer = np.zeros((self.channels, self.size))
+        self.sums = np.zeros(self.channels)
         self.pntr = 0
 
     def mean(self):
         """Moving average filter of the data. Window size equivalent to buffer size."""
-        return np.mean(self.buffer, axis=1)
+        return self.sums / self.size
     
     def update(self, *vargin):
-        for i, val in enumerate(vargin):
-            self.buffer[i, self.pntr] = val
-        self.pntr = (self.pntr + 1) % self.size
\ No newline at end of file
+        n = len(vargin)
+        column = self.buffer[:n, self.pntr]
+        self.sums[:n] += np.asarray(vargin, dtype=float) - column
+        column[:] = vargin
+        self.pntr = (self.pntr + 1) % self.size
+        if self.pntr == 0:
+            # Re-sum once per wrap so rounding error doesn't accumulate
+            self.sums = np.sum(self.buffer, axis=1)
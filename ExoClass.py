@@ -17,6 +17,7 @@ from scipy import interpolate
 from flexsea.device import Device
 from assistance_generator import AssistanceGenerator
 from thermal import ThermalModel
+from torque_tracking import StrideEnsemble
 import config
 
 class ExoObject:
@@ -56,7 +57,7 @@ class ExoObject:
         self.winding_temperature = 0
         self.max_case_temperature = 80
         self.max_winding_temperature = 115
-        self.frequency = 175 #(in OSL Lib: 500)
+        self.prev_thermal_update_time = None    # perf_counter() of the last thermal model update
         self.exo_safety_shutoff_flag = False
 
         # Unit Conversions (from Dephy Website, Units Section: https://dephy.com/start/#programmable_safety_features)
@@ -70,6 +71,10 @@ class ExoObject:
         self.Res_phase = 0.279  # ohms
         self.L_phase = 0.5 * 138 * 10e-6  # henrys
         self.CURRENT_THRESHOLD = config.MAX_ALLOWABLE_CURRENT  # mA
+
+        # Stride-normalized ensemble of desired vs delivered torque, reset when the GUI torque changes
+        self.torque_ensemble = StrideEnsemble(n_bins=101)
+        self.ensemble_peak_torque = None
         
     def set_spline_timing_params(self, spline_timing_params):
         """ 
@@ -250,6 +255,17 @@ class ExoObject:
             
         return new_commanded_current
     
+    def thermal_update_dt(self) -> float:
+        """Time since the last thermal model update (s), so the model follows the real loop rate.
+        The first update uses the control loop's average period."""
+        now = perf_counter()
+        if self.prev_thermal_update_time is None:
+            dt = 1 / config.vas_main_frequency
+        else:
+            dt = now - self.prev_thermal_update_time
+        self.prev_thermal_update_time = now
+        return dt
+    
     def thermal_safety_checker(self):
         """Ensure that winding temperature is below 100°C (115°C is the hard limit).
         Ensure that case temperature is below 75°C (80°C is the hard limit).
@@ -270,7 +286,7 @@ class ExoObject:
             
         # determine modeled case & winding temp
         self.thermalModel.T_c = measured_temp
-        self.thermalModel.update(dt=(1 / self.frequency), motor_current=motor_current)
+        self.thermalModel.update(dt=self.thermal_update_dt(), motor_current=motor_current)
         self.winding_temperature = self.thermalModel.T_w
 
         # Shut off exo if thermal limits breached
@@ -298,7 +314,7 @@ class ExoObject:
         Used to toggle whether the device should be shut off.
         """
         self.thermalModel.T_c = self.case_temperature
-        self.thermalModel.update(dt=(1 / self.frequency), motor_current=motor_current)
+        self.thermalModel.update(dt=self.thermal_update_dt(), motor_current=motor_current)
         self.winding_temperature = self.thermalModel.T_w
         
         if self.case_temperature >= self.max_case_temperature:
@@ -310,7 +326,83 @@ class ExoObject:
         
         return shutoff_flag
     
+    def stance_time_lookahead(self, time_in_current_stance:float, newest_sample_time:float) -> float:
+        """Compensates time in stance for the delay between the force sample it was computed from and the motor command.
+        
+        The delay is measured every tick as the age of the newest force sample (Vicon, ZMQ, Bertec thread and control tick
+        latency) plus config.actuation_delay, capped at config.max_lookahead. It isn't smoothed: the sample age grows
+        between force frames and drops on each new one, and time in stance has to follow it tick by tick.
+        No compensation before the first force sample or with config.max_lookahead = 0.
+
+        Args:
+        time_in_current_stance (float): time in stance as of the newest force sample (s)
+        newest_sample_time (float): Pi-clock time of the newest force sample (s)
+        
+        Returns:
+        time in stance at which to evaluate the torque profile (s)
+        """
+        if newest_sample_time <= 0:
+            return time_in_current_stance
+        delay = time() - newest_sample_time + config.actuation_delay
+
+        # logged uncapped, so the delay can be checked on hardware while compensation is off
+        if self.side == "left":
+            config.pipeline_delay_left = delay
+        elif self.side == "right":
+            config.pipeline_delay_right = delay
+
+        return time_in_current_stance + min(max(delay, 0), config.max_lookahead)
+
+    def stance_timing(self) -> Tuple[float, bool]:
+        """Time in stance (latency compensated) and swing flag for this side, from the fused IMU + force plate
+        heel strike when config.fused_heel_strike is set, otherwise from the force plates.
+        
+        Returns:
+        time_in_current_stance (float): time at which to evaluate the torque profile (s)
+        in_swing (bool): swing flag
+        """
+        if self.side == "left":
+            fused_HS_time, fused_in_swing = config.fused_HS_time_left, config.fused_in_swing_left
+            bertec_stance_time, bertec_sample_time, bertec_in_swing = config.time_in_current_stance_left, config.bertec_sample_time_left, config.in_swing_bertec_left
+        else:
+            fused_HS_time, fused_in_swing = config.fused_HS_time_right, config.fused_in_swing_right
+            bertec_stance_time, bertec_sample_time, bertec_in_swing = config.time_in_current_stance_right, config.bertec_sample_time_right, config.in_swing_bertec_right
+
+        if config.fused_heel_strike:
+            # fused heel strike time is on the Pi clock, so time in stance is current; only the actuation delay is left
+            return time() - fused_HS_time + min(config.actuation_delay, config.max_lookahead), fused_in_swing
+        return self.stance_time_lookahead(bertec_stance_time, bertec_sample_time), bertec_in_swing
+
+    def track_torque(self, time_in_current_stance:float, desired_torque:float, in_swing:bool, peak_torque:float):
+        """Adds this tick to the desired vs delivered torque ensemble and publishes the RMS tracking errors and peak delivered torque after each stride"""
+        if peak_torque != self.ensemble_peak_torque:
+            self.torque_ensemble.reset()
+            self.ensemble_peak_torque = peak_torque
+
+        if self.side == "left":
+            stance_period, measured_torque = config.stance_time_left, config.act_ank_torque_left
+        else:
+            stance_period, measured_torque = config.stance_time_right, config.act_ank_torque_right
+
+        percent_stance = 100 * time_in_current_stance / stance_period if stance_period > 0 else 0
+        if self.torque_ensemble.update(percent_stance, float(desired_torque), measured_torque, in_swing):
+            if self.side == "left":
+                config.torque_rms_error_left = self.torque_ensemble.stride_rms_error
+                config.torque_ensemble_rms_error_left = self.torque_ensemble.ensemble_rms_error
+                config.peak_torque_measured_left = self.torque_ensemble.peak_measured
+            else:
+                config.torque_rms_error_right = self.torque_ensemble.stride_rms_error
+                config.torque_ensemble_rms_error_right = self.torque_ensemble.ensemble_rms_error
+                config.peak_torque_measured_right = self.torque_ensemble.peak_measured
+
+    def mark_gui_command_applied(self, gui_torque_seq:int):
+        """Records the first control tick (either exo) that commanded the motors with the torque of GUI command gui_torque_seq"""
+        if gui_torque_seq != config.gui_torque_applied[0]:
+            config.gui_torque_applied = (gui_torque_seq, time())    # one assignment, so readers never see a mismatched pair
+
     def iterate(self):
+        # GUI torque command this tick acts on. Read before GUI_commanded_torque: the GUI thread writes the torque first.
+        gui_torque_seq = config.gui_torque_seq
         
         # TO ENABLE TORQUE BASED FSM:
         if config.in_torque_FSM_mode:
@@ -325,27 +417,37 @@ class ExoObject:
             if(self.side == 'left'):
                 # 4-point spline generated torque
                 # desired_spline_torque = self.assistance_generator.torque_generator_MAIN(config.time_in_current_stride_left, config.stride_time_left, peak_torque, config.in_swing_start_left)
-                desired_spline_torque = self.assistance_generator.torque_generator_stance_MAIN(config.time_in_current_stance_left, 
-                                                                                               config.stride_period_bertec_left, 
-                                                                                               config.stance_time_left, 
-                                                                                               peak_torque, 
-                                                                                               config.in_swing_bertec_left)                
+                time_in_current_stance, in_swing = self.stance_timing()
+                if config.phase_based_assistance and config.gait_phase_locked_left:
+                    desired_spline_torque = self.assistance_generator.torque_generator_phase_MAIN(config.gait_phase_left, peak_torque, in_swing)
+                else:
+                    desired_spline_torque = self.assistance_generator.torque_generator_stance_MAIN(time_in_current_stance, 
+                                                                                                   config.stride_period_bertec_left, 
+                                                                                                   config.stance_time_left, 
+                                                                                                   peak_torque, 
+                                                                                                   in_swing)                
                 # desired_spline_torque = self.assistance_generator.biomimetic_torque_generator_MAIN(config.time_in_current_stance_left, config.stance_time_left, peak_torque, config.in_swing_bertec_left)
                 config.desired_spline_torque_left = desired_spline_torque
                 
                 
             elif(self.side == 'right'):
                 # desired_spline_torque = self.assistance_generator.torque_generator_MAIN(config.time_in_current_stride_right, config.stride_time_right, peak_torque, config.in_swing_start_right)
-                desired_spline_torque = self.assistance_generator.torque_generator_stance_MAIN(config.time_in_current_stance_right, 
-                                                                                               config.stride_period_bertec_right, 
-                                                                                               config.stance_time_right, 
-                                                                                               peak_torque, 
-                                                                                               config.in_swing_bertec_right)                 
+                time_in_current_stance, in_swing = self.stance_timing()
+                if config.phase_based_assistance and config.gait_phase_locked_right:
+                    desired_spline_torque = self.assistance_generator.torque_generator_phase_MAIN(config.gait_phase_right, peak_torque, in_swing)
+                else:
+                    desired_spline_torque = self.assistance_generator.torque_generator_stance_MAIN(time_in_current_stance, 
+                                                                                                   config.stride_period_bertec_right, 
+                                                                                                   config.stance_time_right, 
+                                                                                                   peak_torque, 
+                                                                                                   in_swing)                 
                 # desired_spline_torque = self.assistance_generator.biomimetic_torque_generator_MAIN(config.time_in_current_stance_right, config.stride_period_bertec_right,peak_torque, config.in_swing_bertec_right)
                 config.desired_spline_torque_right = desired_spline_torque
             else:
                 print("Error")
             
+            self.track_torque(time_in_current_stance, desired_spline_torque, in_swing, peak_torque)
+
             # Convert spline torque to it's corresponding current (mA)
             desired_spline_current = self.desired_torque_2_current(desired_spline_torque)
         
@@ -355,19 +457,21 @@ class ExoObject:
             
             if(self.side == "left"):
                 # 4-point spline generated current
-                desired_spline_current = self.assistance_generator.current_generator_stance_MAIN(config.time_in_current_stance_left, 
+                time_in_current_stance, in_swing = self.stance_timing()
+                desired_spline_current = self.assistance_generator.current_generator_stance_MAIN(time_in_current_stance, 
                                                                                                config.stride_period_bertec_left, 
                                                                                                config.stance_time_left, 
                                                                                                peak_current, 
-                                                                                               config.in_swing_bertec_left)
+                                                                                               in_swing)
                 config.desired_spline_torque_left = desired_spline_current
                 curr_ank_angle = config.ankle_angle_left
             elif(self.side == "right"):
-                desired_spline_current = self.assistance_generator.current_generator_stance_MAIN(config.time_in_current_stance_right, 
+                time_in_current_stance, in_swing = self.stance_timing()
+                desired_spline_current = self.assistance_generator.current_generator_stance_MAIN(time_in_current_stance, 
                                                                                                 config.stride_period_bertec_right, 
                                                                                                 config.stance_time_right, 
                                                                                                 peak_current, 
-                                                                                                config.in_swing_bertec_right)
+                                                                                                in_swing)
 
                 config.desired_spline_torque_right = desired_spline_current
                 curr_ank_angle = config.ankle_angle_right
@@ -388,4 +492,5 @@ class ExoObject:
             self.device.command_motor_current(0)
             config.EXIT_MAIN_LOOP_FLAG == True
         else:
-            self.device.command_motor_current(self.exo_left_or_right_sideMultiplier * vetted_current)
\ No newline at end of file
+            self.device.command_motor_current(self.exo_left_or_right_sideMultiplier * vetted_current)
+            self.mark_gui_command_applied(gui_torque_seq)
\ No newline at end of file
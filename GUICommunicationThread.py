@@ -4,7 +4,13 @@ import gui2controller2_pb2
 import gui2controller2_pb2_grpc
 from concurrent import futures
 from typing import Type
+from collections import deque
+from time import strftime
+import queue
 import time
+import csv
+
+import numpy as np
 
 import config
 from utils import MovingAverageFilter
@@ -14,53 +20,237 @@ class GUI_thread(threading.Thread):
 
         super().__init__(name = name)
         self.quit_event = quit_event
+        
+        ## Log of every CommandStream command and when it took effect (press -> apply latency distribution)
+        fname_construction = 'Sub{0}_{1}_{2}_{3}_gui_commands.csv'.format(
+            str(config.subject_ID), 
+            str(config.trial_type), 
+            str(config.trial_presentation), 
+            strftime("%m%d%Y")
+        )
+        self.command_log_filename = '/home/pi/Exoboot-Controller-VAS/Experimental_Logs/' + str(fname_construction)
     
     class CommunicationService(gui2controller2_pb2_grpc.CommunicationServiceServicer):
         def __init__(self, GUI_thread):
             self.GUI_thread = GUI_thread
+            self.command_lock = threading.Lock()
             
-        def GUI_Messenger(self, request, context):
-            # Printing out the request from the client        
-            requested_torque = request.logging_data[0]              # Current Torque Experienced(Nm)
-            requested_slider_btn = request.logging_data[1]          # Adjusted Slider Btn
-            requested_slider_value = request.logging_data[2]        # Adjusted Slider Value($)
-            requested_confirm_btn_pressed = request.logging_data[3] # Confirm Button Pressed
+            # Time to handle each GUI message (parsing and config writes), over the last 100 messages
+            self.handling_time = MovingAverageFilter(initial_value=0, size=100)
+            self.num_messages = 0
             
-            print("New commanded torque is:", config.GUI_commanded_torque)
+            # Typed commands seen per tablet session (gui_command.session): seq -> AppliedCommand, so a command re-sent
+            # after a reconnect (or a unary retry) is applied once. Every seq is kept: a re-send can come after newer seqs
+            # (a few hundred bytes per command for the session)
+            self.sessions = {}
+            self.num_duplicates = 0
+        
+        def record_handling_time(self, start_time):
+            """Call with command_lock held, at the end of handling a GUI message"""
+            self.handling_time.update(time.perf_counter() - start_time)
+            self.num_messages += 1
+            config.gui_message_handling_time = self.handling_time.average()
+            config.gui_message_handling_time_max = self.handling_time.max()
+            config.gui_message_count = self.num_messages
+        
+        def apply_command(self, request, receive_time):
+            """
+            Writes a typed GUI command to config, once per (session, seq). Fields not set by this GUI event keep the same
+            'nan' values the old message logged.
             
-            if requested_torque == 'nan':
-                config.adjusted_slider_btn = str(requested_slider_btn)
-                config.adjusted_slider_value = float(requested_slider_value)
-                config.confirm_btn_pressed = requested_confirm_btn_pressed
-            else: 
-                config.GUI_commanded_torque = float(requested_torque)
-                print("New commanded torque is:", config.GUI_commanded_torque)
+            Returns:
+                the command's AppliedCommand (the first copy's for a re-sent command)
+            """
+            with self.command_lock:
+                start_time = time.perf_counter()
+                commands = self.sessions.setdefault(request.session, {})
+                if request.seq in commands:
+                    self.num_duplicates += 1
+                    return commands[request.seq]
+                
+                torque_seq = None
+                if request.HasField('torque'):
+                    config.GUI_commanded_torque = request.torque
+                    # after the torque: the control loop reads the seq first
+                    torque_seq = config.gui_torque_seq + 1
+                    config.gui_torque_seq = torque_seq
                 
-                config.adjusted_slider_btn = str(requested_slider_btn)
-                config.adjusted_slider_value = float(requested_slider_value)
-                config.confirm_btn_pressed = requested_confirm_btn_pressed
+                config.adjusted_slider_btn = request.slider_id if request.HasField('slider_id') else 'nan'
+                config.adjusted_slider_value = request.slider_value if request.HasField('slider_value') else float('nan')
+                config.confirm_btn_pressed = str(request.confirm)
+                config.gui_command_seq = request.seq
+                config.gui_command_client_time = request.client_time
+                command = commands[request.seq] = AppliedCommand(receive_time, torque_seq)
+                self.record_handling_time(start_time)
+            return command
+            
+        def GUI_Messenger(self, request, context):
+            with self.command_lock:
+                start_time = time.perf_counter()
+                requested_torque = request.logging_data[0]              # Current Torque Experienced(Nm)
+                requested_slider_btn = request.logging_data[1]          # Adjusted Slider Btn
+                requested_slider_value = request.logging_data[2]        # Adjusted Slider Value($)
+                requested_confirm_btn_pressed = request.logging_data[3] # Confirm Button Pressed
+                
+                if requested_torque == 'nan':
+                    config.adjusted_slider_btn = str(requested_slider_btn)
+                    config.adjusted_slider_value = float(requested_slider_value)
+                    config.confirm_btn_pressed = requested_confirm_btn_pressed
+                else: 
+                    config.GUI_commanded_torque = float(requested_torque)
+                    
+                    config.adjusted_slider_btn = str(requested_slider_btn)
+                    config.adjusted_slider_value = float(requested_slider_value)
+                    config.confirm_btn_pressed = requested_confirm_btn_pressed
+                self.record_handling_time(start_time)
+            
+            # Sending a Null response to GUI
+            return gui2controller2_pb2.Null()
+        
+        def GUI_Messenger_v2(self, request, context):
+            self.apply_command(request, time.time())
             
             # Sending a Null response to GUI
             return gui2controller2_pb2.Null()
+        
+        def CommandStream(self, request_iterator, context):
+            # Applies GUI commands as they arrive and acks each one with when it took effect: slider/confirm commands right
+            # away, torque commands once the control loop has commanded the motors with the new torque (ExoObject marks the tick),
+            # a later torque replaced them, or gui_apply_timeout passed.
+            # Commands re-sent after a reconnect aren't applied again; they are acked with the first copy's timings.
+            received = queue.Queue()
+            
+            def read_commands():
+                try:
+                    for request in request_iterator:
+                        received.put((request, self.apply_command(request, time.time())))
+                except Exception:
+                    pass        # tablet went away
+                received.put(None)
+            threading.Thread(target=read_commands, name='CommandStreamReader', daemon=True).start()
+            
+            pending = deque()   # torque commands waiting for the control loop
+            log = CommandLog(self.GUI_thread.command_log_filename)
+            tablet_closed = False
+            try:
+                while context.is_active() and self.GUI_thread.quit_event.is_set() and not (tablet_closed and not pending):
+                    try:
+                        item = received.get(timeout=0.005 if pending else 0.1)
+                        if item is None:
+                            tablet_closed = True
+                        elif item[1].acked:
+                            yield log.ack(item[0], item[1], item[1].apply_time, item[1].applied)
+                        elif item[1].torque_seq is None:
+                            yield log.ack(item[0], item[1], item[1].receive_time, True)
+                        else:
+                            pending.append(item)
+                    except queue.Empty:
+                        pass
+                    
+                    applied_seq, apply_time = config.gui_torque_applied
+                    while pending and (pending[0][1].acked or applied_seq >= pending[0][1].torque_seq or
+                                       time.time() - pending[0][1].receive_time > config.gui_apply_timeout):
+                        request, command = pending.popleft()
+                        if command.acked:
+                            yield log.ack(request, command, command.apply_time, command.applied)
+                        elif applied_seq == command.torque_seq:
+                            yield log.ack(request, command, apply_time, True)
+                        else:
+                            yield log.ack(request, command, 0.0, False)
+            finally:
+                log.close()
+        
+        def StreamTelemetry(self, request, context):
+            # Sends the latest GSE telemetry snapshot at the requested rate until the tablet disconnects.
+            # Only reads the snapshot, so a slow client just gets fewer frames.
+            rate = min(request.rate, config.telemetry_max_rate) if request.rate > 0 else 1.0
+            next_time = time.monotonic()
+            while context.is_active() and self.GUI_thread.quit_event.is_set():
+                if config.telemetry is not None:
+                    seq, values = config.telemetry.latest()
+                    if values is not None:
+                        yield gui2controller2_pb2.telemetry_frame(seq=seq, **values)
+                
+                next_time = max(next_time + 1/rate, time.monotonic())
+                time.sleep(max(next_time - time.monotonic(), 0))
     
     def starting_server(self):
-        print("Starting Server -- For receiving Peak Torques, $-Values, etc...")
-        server = grpc.server(futures.ThreadPoolExecutor(max_workers=10))
+        # One server for the whole session, sized for one tablet: the command and telemetry streams each hold a thread for
+        # their whole life (twice over while a reconnecting tablet's old streams wind down), plus threads for unary calls.
+        # Short unary calls queue for a free thread; only a runaway client hitting gui_server_max_rpcs gets refused.
+        server = grpc.server(futures.ThreadPoolExecutor(max_workers=config.gui_server_workers, thread_name_prefix='GUI_RPC'),
+                             maximum_concurrent_rpcs=config.gui_server_max_rpcs)
         gui2controller2_pb2_grpc.add_CommunicationServiceServicer_to_server(self.CommunicationService(self),server)
         server.add_insecure_port(config.server_ip)
         server.start()
-        server.wait_for_termination()        
+        print("Started Server -- For receiving Peak Torques, $-Values, etc...")
+        return server
 
     def run(self):
-        # Period Tracker
-        period_tracker = MovingAverageFilter(size=300)
-        prev_end_time = time.time()
-
+        server = self.starting_server()
+        
+        # Serve until the session ends
         while self.quit_event.is_set():
-            self.starting_server()
+            time.sleep(0.1)
+        
+        # Refuse new RPCs and give open ones (streams end on quit_event) a moment to finish
+        server.stop(grace=1.0).wait()
+
+
+class AppliedCommand:
+    """When a typed GUI command was received and, for torque commands, its gui_torque_seq"""
+    def __init__(self, receive_time, torque_seq):
+        self.receive_time = receive_time
+        self.torque_seq = torque_seq
+        self.acked = False      # acked (and logged) once; re-sent copies get the same ack
+        self.apply_time = 0.0
+        self.applied = False
+
+
+class CommandLog:
+    """
+    CSV log of CommandStream commands for one tablet connection, and the press -> apply latency summary printed when it ends.
+    Press -> apply is on the controller clock, using the tablet's own clock offset estimate sent with each command.
+    """
+    def __init__(self, filename):
+        self.press_to_apply = []
+        try:
+            self.file = open(filename, 'a')
+            self.writer = csv.writer(self.file, lineterminator='\n', quotechar='|')
+            if self.file.tell() == 0:
+                self.writer.writerow(['seq', 'torque', 'client_time', 'clock_offset', 'receive_time', 'apply_time',
+                                      'applied', 'press_to_apply'])
+        except OSError as e:
+            print("Could not open the GUI command log:", e)
+            self.file = None
+
+    def ack(self, request, command, apply_time, applied):
+        """
+        Args:
+            request: the gui_command
+            command: its AppliedCommand
+            apply_time: controller time the command took effect (0 if not applied)
+            applied: the command took effect
+        """
+        ack_time = time.time()
+        receive_time = command.receive_time
+        if not command.acked:
+            command.acked, command.apply_time, command.applied = True, apply_time, applied
+            press_to_apply = float('nan')
+            if applied and request.HasField('torque') and request.clock_offset != 0:
+                press_to_apply = apply_time - (request.client_time + request.clock_offset)
+                self.press_to_apply.append(press_to_apply)
+            if self.file is not None:
+                self.writer.writerow([request.seq, request.torque if request.HasField('torque') else 'nan', request.client_time,
+                                      request.clock_offset, receive_time, apply_time, applied, press_to_apply])
+                self.file.flush()
+        return gui2controller2_pb2.command_ack(seq=request.seq, applied=applied, receive_time=receive_time,
+                                               apply_time=apply_time, ack_time=ack_time)
 
-            # Update Period Tracker and config
-            end_time = time.time()
-            period_tracker.update(end_time - prev_end_time)
-            prev_end_time = end_time
-            config.gui_communication_thread_frequency = 1/period_tracker.average()
\ No newline at end of file
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+        if self.press_to_apply:
+            latency = np.array(self.press_to_apply) * 1000
+            print("GUI press -> apply latency over {} torque commands (ms): median {:.1f}, p95 {:.1f}, max {:.1f}".format(
+                len(latency), np.median(latency), np.percentile(latency, 95), latency.max()))
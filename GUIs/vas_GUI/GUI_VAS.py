@@ -20,10 +20,8 @@ import csv
 from functools import partial
 import random
 
-import gui2controller2_pb2
-import gui2controller2_pb2_grpc
 import config
-import grpc
+from grpc_sender import GrpcSender
 
 # Define the GUI class
 class GuiVas(BoxLayout):
@@ -69,6 +67,14 @@ class GuiVas(BoxLayout):
         self.rand_colors = ['#34308F','#590f2c']
         self.current_color_index = 0
         
+        # One gRPC channel to the controller for the whole session, messages sent from a background thread
+        if config.grpc_needed:
+            self.sender = GrpcSender(config.server_ip, queue_size=config.grpc_queue_size, timeout=config.grpc_timeout,
+                                     retries=config.grpc_retries, message_version=config.grpc_message_version,
+                                     transport=config.grpc_transport,
+                                     latency_log=f"Sub{config.sub_num}_trial{config.curr_trial_num}_{time.strftime('%m%d%Y')}_command_latency.csv")
+            self.sender.start()
+        
         
     def serverlogger(self, slider_index=None, btn_instance=None, curr_torque:float=0.0):
         """Log the data/current torque selection and send to the Server/Rpi file"""
@@ -83,45 +89,24 @@ class GuiVas(BoxLayout):
             #  If a slider has not been moved, but only a button has been pressed (including confirm btn), log the appropriate button's data
             if slider_selected == None: 
                 if curr_torque != 0.0:  # if the torque value is provided via btn press 
-                    temp_logging_data = [str(curr_torque), str('nan'), str('nan'), str(config.bool_confirm_button_pressed)]
-                    # Send the torque value to the server via gRPC
-                    if config.grpc_needed:
-                        with grpc.insecure_channel(config.server_ip, options=(('grpc.enable_http_proxy',0), )) as channel:
-                            try:
-                                stub = gui2controller2_pb2_grpc.CommunicationServiceStub(channel)
-                                response = stub.GUI_Messenger(gui2controller2_pb2.data_stream(logging_data=temp_logging_data))
-                                
-                            except grpc.RpcError as e:
-                                print("Error",e)
-                    
+                    message = dict(torque=curr_torque, confirm=config.bool_confirm_button_pressed)
                     self.prev_btn_instance = btn_instance 
                 else:   # if the torque value is not provided (i.e. confirm btn is pressed)
-                    temp_logging_data = [str('nan'), str('nan'), str('nan'), str(config.bool_confirm_button_pressed)]
-                    # Send the torque value to the server via gRPC
-                    if config.grpc_needed:
-                        with grpc.insecure_channel(config.server_ip, options=(('grpc.enable_http_proxy',0), )) as channel:
-                            try:
-                                stub = gui2controller2_pb2_grpc.CommunicationServiceStub(channel)
-                                response = stub.GUI_Messenger(gui2controller2_pb2.data_stream(logging_data=temp_logging_data))
-                                
-                            except grpc.RpcError as e:
-                                print("Error",e)
+                    message = dict(confirm=config.bool_confirm_button_pressed)
                 
             # otherwise, if a slider has been moved, log the appropriate slider's data
             else:
-                temp_logging_data = [str('nan'), str(slider_selected),str(round(self.button_slider_values[chr(65+slider_index)], 2)), str(config.bool_confirm_button_pressed)]
-                # Send the torque value to the server via gRPC
-                if config.grpc_needed:
-                    with grpc.insecure_channel(config.server_ip, options=(('grpc.enable_http_proxy',0), )) as channel:
-                        try:
-                            stub = gui2controller2_pb2_grpc.CommunicationServiceStub(channel)
-                            response = stub.GUI_Messenger(gui2controller2_pb2.data_stream(logging_data=temp_logging_data))
-                        
-                        
-                        except grpc.RpcError as e:
-                            print("Error",e)
-                
+                message = dict(slider_id=slider_selected, slider_value=round(self.button_slider_values[chr(65+slider_index)], 2),
+                               confirm=config.bool_confirm_button_pressed)
                 self.prev_btn_instance = btn_instance 
+            
+            # Queue the message for the sender thread (sent in order, off the UI thread)
+            # Slider drags only send the latest value of each slider per coalescing window, buttons/confirm go right away
+            if config.grpc_needed:
+                if slider_selected != None:
+                    self.sender.send_coalesced(slider_selected, config.slider_coalesce_window, **message)
+                else:
+                    self.sender.send(**message)
          
             # reset the confirm button press after logging
             config.bool_confirm_button_pressed = False
@@ -157,6 +142,13 @@ class GuiVas(BoxLayout):
         self.serverlogger(slider_index=slider_index)
 
 
+    def on_slider_release(self, additional_variable, instance_slider: Slider, touch):
+        """Slider release event method: send the final value of the slider without waiting for its coalescing window"""
+        if touch.grab_current is instance_slider and config.grpc_needed:
+            slider_index = self.ids.slider_layout.children.index(instance_slider.parent)
+            self.sender.flush(chr(65+slider_index))
+
+
     def press(self, instance_btn: Button):
         """Button press response method"""
         print(f"You pressed the button: {instance_btn.text}")
@@ -306,6 +298,7 @@ class GuiVas(BoxLayout):
             self.last_pressed_button = i
             additional_variable = i
             slider.bind(value=partial(self.on_slider_value, additional_variable))
+            slider.bind(on_touch_up=partial(self.on_slider_release, additional_variable))
 
             # Create the cursor label and initially set the opacity to 0
             cursor_label = Label(text=f"${round(slider.value, 2)}", size_hint=(None, None), color=slider_colors[count-1],opacity=1)
@@ -325,7 +318,13 @@ class VAS_GUIApp(App):
 
     def build(self):
         Builder.load_file("GUI_VAS.kv")
-        return GuiVas()
+        self.gui = GuiVas()
+        return self.gui
+
+    def on_stop(self):
+        # Send anything still queued and close the gRPC channel
+        if config.grpc_needed:
+            self.gui.sender.stop()
 
 
 if __name__ == "__main__":
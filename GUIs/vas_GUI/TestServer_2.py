@@ -6,6 +6,7 @@ from concurrent import futures
 import config
 import os
 import csv
+import time
 
 class CommunicationService(gui2controller2_pb2_grpc.CommunicationServiceServicer):
     
@@ -40,6 +41,34 @@ class CommunicationService(gui2controller2_pb2_grpc.CommunicationServiceServicer
         
         # Sending the Null response(to close the communication loop)
         return gui2controller2_pb2.Null()
+    
+    def GUI_Messenger_v2(self, request, context):
+        self.log_command(request)
+        return gui2controller2_pb2.Null()
+    
+    def CommandStream(self, request_iterator, context):
+        # Acks every command as applied when it arrives (no control loop here)
+        for request in request_iterator:
+            receive_time = time.time()
+            self.log_command(request)
+            yield gui2controller2_pb2.command_ack(seq=request.seq, applied=True, receive_time=receive_time,
+                                                  apply_time=receive_time, ack_time=time.time())
+    
+    def log_command(self, request):
+        # Typed message: unset fields are the ones the GUI event didn't change
+        if request.HasField('torque'):
+            config.gui_commanded_torque = request.torque
+            
+        filename = 'Vickrey_VAS_GUI\vas_GUI\test_log.csv'
+        data_array = [config.gui_commanded_torque, 
+                    request.slider_id if request.HasField('slider_id') else 'nan', 
+                    request.slider_value if request.HasField('slider_value') else float('nan'), 
+                    request.confirm,
+                    request.seq,
+                    request.client_time]
+        
+        print("data array:", data_array)
+        self.logging(filename, data_array)
         
     def logging(self, filename, datapoint_array):
         with open(filename, 'a') as f:
@@ -7,6 +7,12 @@ server_ip = f"{'0.0.0.0'}:" f"{'50051'}"   # IP address when just testing on sam
 client_ip = f"{'0.0.0.0'}:" f"{'50051'}"   # IP address when just testing on same machine
 gui_commanded_torque: float = 0.0          # For TestServer_2.py 
 grpc_needed:bool = True                      # SET TO FALSE IF DOING GUI TESTING W/O COMMANDING EXO
+grpc_queue_size:int = 100                    # Max messages waiting to be sent to the controller (when full, slider values are dropped first)
+grpc_timeout:float = 1.0                     # Deadline of each send attempt (s)
+grpc_retries:int = 3                         # Extra attempts after a failed send
+grpc_message_version:int = 2                 # 2: typed GUI_Messenger_v2 message, 1: old string GUI_Messenger (controllers not yet updated)
+grpc_transport:str = 'stream'                # 'stream': one acked CommandStream (logs press -> apply latency; falls back to 'unary' if the controller doesn't serve it), 'unary': one call per message
+slider_coalesce_window:float = 0.05          # Slider drags send only the latest value of each slider per window (s), final value on release
 
 ###### INITIALIZING RELEVANT VARS  ######
 bool_confirm_button_pressed: bool = False
@@ -0,0 +1,473 @@
+# Description:
+# Background gRPC sender for the VAS GUI.
+# Keeps one channel/stub to the controller for the whole GUI session and sends messages from its own thread,
+# so button presses and slider drags never wait on the network on the Kivy UI thread.
+# Messages are queued (bounded) and sent in order. Failed sends are retried with backoff, and the round-trip
+# time of every delivered message is recorded.
+#
+# Slider updates are coalesced: send_coalesced() keeps only the latest value per slider and queues it when the
+# slider's window runs out (or on flush(), e.g. when the slider is released). Immediate messages (buttons, confirm)
+# first queue any pending slider values, so the controller sees everything in the order it happened.
+#
+# Messages go out as the typed gui_command (GUI_Messenger_v2, with a tablet timestamp and sequence number) or,
+# for controllers that don't serve it yet, as the old repeated-string data_stream (GUI_Messenger).
+#
+# With transport='stream', typed messages go over one long-lived CommandStream instead of one unary call each.
+# Controllers that don't serve CommandStream (UNIMPLEMENTED) get one unary call per message instead.
+# The controller acks every command with when it arrived and when it took effect (first control tick commanding a
+# new torque). Unacked commands are re-sent after a reconnect; the controller applies each (session, seq) only once.
+# From the ack timestamps the sender estimates the controller - tablet clock offset (NTP style, from the recent ack
+# with the least network delay), logs the press -> apply latency of every torque command, and sends its offset
+# estimate along so the controller can log it too.
+
+import threading
+import queue
+import time
+import csv
+import random
+from collections import deque
+
+import numpy as np
+import grpc
+
+import gui2controller2_pb2
+import gui2controller2_pb2_grpc
+
+# Errors worth retrying (controller not reachable yet, busy, or connection dropped)
+RETRY_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+class GrpcSender(threading.Thread):
+    """
+    Args:
+        server_ip: controller address ("ip:port")
+        queue_size: max messages waiting to be sent; when full the oldest waiting slider value is dropped (torque and
+            confirm messages are never dropped: one that finds no slider value to make room for is refused and reported)
+        timeout: deadline of each send attempt (s)
+        retries: extra attempts after a failed send
+        backoff: wait before the first retry, doubled on each retry (s)
+        rtt_history: number of round-trip times kept for the stats
+        message_version: 2 for the typed GUI_Messenger_v2, 1 for the old GUI_Messenger
+        transport: 'stream' for the acked CommandStream (typed messages only), 'unary' for one call per message
+        latency_log: CSV file for the per-command ack timings (stream only), None to not log
+    """
+    def __init__(self, server_ip:str, queue_size:int = 100, timeout:float = 1.0, retries:int = 3, backoff:float = 0.05,
+                 rtt_history:int = 1000, message_version:int = 2, transport:str = 'stream', latency_log:str = None,
+                 name='GrpcSender'):
+        super().__init__(name=name, daemon=True)
+        self.message_version = message_version
+        self.use_stream = transport == 'stream' and message_version == 2
+        self.seq = 0                             # sequence number of the next v2 message
+        self.session = random.getrandbits(63)    # identifies this sender's seqs to the controller (applies each seq once)
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        # One channel for the session. grpc reconnects it on its own if the controller restarts
+        # (short reconnect backoff so a restarted controller is picked up quickly).
+        self.channel = grpc.insecure_channel(server_ip, options=(('grpc.enable_http_proxy', 0),
+                                                                 ('grpc.initial_reconnect_backoff_ms', 200),
+                                                                 ('grpc.max_reconnect_backoff_ms', 1000)))
+        self.stub = gui2controller2_pb2_grpc.CommunicationServiceStub(self.channel)
+        self.rpc = self.stub.GUI_Messenger_v2 if message_version == 2 else self.stub.GUI_Messenger
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.quit_event = threading.Event()
+
+        # coalesced messages waiting for their window to run out: key -> [deadline, request]
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+        self.num_coalesced = 0                   # slider updates replaced by a newer value before being sent
+
+        self.rtt = deque(maxlen=rtt_history)     # round-trip time of delivered messages (s)
+        self.num_sent = 0
+        self.num_retried = 0
+        self.num_failed = 0                      # given up after all retries
+        self.num_dropped = 0                     # slider values dropped from a full queue
+        self.num_refused = 0                     # torque/confirm messages refused by a full queue (reported)
+        self.connected = True                    # last send succeeded (only the first failure of a streak is printed)
+
+        # CommandStream state
+        self.stream = None
+        self.unacked = {}                        # seq -> [request, tablet send time], re-sent after a reconnect
+        self.unacked_lock = threading.Lock()
+        self.stream_generation = 0               # current CommandStream; older streams' request iterators stop taking commands
+        self.resend = deque()                    # unacked seqs the current stream sends before the queue
+        self.dequeue_lock = threading.Lock()     # one stream iterator at a time takes from resend/the queue
+        self.num_superseded = 0                  # unacked slider values given up on for a newer value of the same slider
+        self.unacked_over = False                # more unacked torque/confirm commands than queue_size (reported once)
+        self.offset_samples = deque(maxlen=32)   # (network delay, clock offset) of recent acks
+        self.clock_offset = 0.0                  # controller clock - tablet clock (s), 0 until the first ack
+        self.press_to_apply = []                 # tablet press -> controller apply latency of applied torque commands (s)
+        self.num_not_applied = 0
+        self.latency_log = latency_log
+        self.latency_file = None
+
+    def make_request(self, torque:float = None, slider_id:str = None, slider_value:float = None, confirm:bool = False):
+        """
+        Builds the message of one GUI event. None means the field isn't part of the event.
+
+        Args:
+            torque: commanded peak torque (Nm) of a torque button press
+            slider_id: adjusted slider ('A', 'B', ...)
+            slider_value: adjusted slider value ($)
+            confirm: confirm button pressed
+        """
+        if self.message_version == 2:
+            # seq is assigned when the message is queued
+            return gui2controller2_pb2.gui_command(torque=torque, slider_id=slider_id, slider_value=slider_value,
+                                                   confirm=confirm, client_time=time.time(), clock_offset=self.clock_offset,
+                                                   session=self.session)
+
+        logging_data = [str('nan') if torque is None else str(torque),
+                        str('nan') if slider_id is None else str(slider_id),
+                        str('nan') if slider_value is None else str(slider_value),
+                        str(confirm)]
+        return gui2controller2_pb2.data_stream(logging_data=logging_data)
+
+    def send(self, **fields) -> bool:
+        """
+        Queues a message (fields as in make_request) right away, after any pending coalesced messages. Never blocks.
+
+        Returns:
+            False if the queue was full of torque/confirm messages and refused it (the press didn't go out)
+        """
+        request = self.make_request(**fields)
+        with self.pending_lock:
+            self.queue_pending(due_before=None)
+            return self.put(request)
+
+    def send_coalesced(self, key, window:float, **fields) -> None:
+        """
+        Queues a message at the end of a window, replaced by any newer message with the same key sent in the meantime.
+        Never blocks.
+
+        Args:
+            key: what is being coalesced (e.g. the slider letter)
+            window: time from the first update of a burst until the latest value is sent (s)
+            fields: message contents, as in make_request
+        """
+        request = self.make_request(**fields)
+        with self.pending_lock:
+            if key in self.pending:
+                self.pending[key][1] = request
+                self.num_coalesced += 1
+            else:
+                self.pending[key] = [time.monotonic() + window, request]
+
+    def flush(self, key=None) -> None:
+        """Queues the pending coalesced message of key now (all keys if None), e.g. on slider release"""
+        with self.pending_lock:
+            if key is None:
+                self.queue_pending(due_before=None)
+            elif key in self.pending:
+                self.put(self.pending.pop(key)[1])
+
+    def queue_pending(self, due_before:float = None) -> float:
+        """
+        Moves pending coalesced messages due before due_before (all if None) to the send queue, oldest deadline first.
+        Call with pending_lock held.
+
+        Returns:
+            time until the next pending deadline (s), None if nothing is left pending
+        """
+        for key, (deadline, request) in sorted(self.pending.items(), key=lambda item: item[1][0]):
+            if due_before is None or deadline <= due_before:
+                self.put(request)
+                del self.pending[key]
+        if not self.pending:
+            return None
+        return min(deadline for deadline, _ in self.pending.values()) - (due_before or time.monotonic())
+
+    def put(self, request) -> bool:
+        """
+        Adds a message to the send queue. Call with pending_lock held.
+        A full queue makes room by dropping its oldest slider value, preferring one a newer queued value of the same
+        slider replaces. If it holds only torque/confirm messages, a new slider value is dropped and a new
+        torque/confirm message is refused (blocking wouldn't help: the sender thread needs pending_lock to empty the queue).
+
+        Returns:
+            whether the message was queued
+        """
+        if self.message_version == 2:
+            request.seq = self.seq
+            self.seq += 1
+        while True:
+            try:
+                self.queue.put_nowait(request)
+                return True
+            except queue.Full:
+                if self.drop_queued_slider():
+                    self.num_dropped += 1
+                elif self.slider_key(request) is not None:
+                    self.num_dropped += 1
+                    return False
+                else:
+                    self.num_refused += 1
+                    print("gRPC send queue full of torque/confirm messages, message not sent:", self.describe(request))
+                    return False
+
+    def drop_queued_slider(self) -> bool:
+        """Removes the oldest queued slider value, preferring a superseded one. Returns False if none is queued."""
+        with self.queue.mutex:
+            waiting = self.queue.queue
+            keys = [self.slider_key(request) for request in waiting]
+            sliders = [i for i, key in enumerate(keys) if key is not None]
+            if not sliders:
+                return False
+            superseded = [i for i in sliders if keys[i] in keys[i + 1:]]
+            del waiting[superseded[0] if superseded else sliders[0]]
+            self.queue.not_full.notify()
+        return True
+
+    def slider_key(self, request):
+        """The slider a message only moves (a newer value of that slider replaces it), None for torque/confirm messages"""
+        if self.message_version == 2:
+            if request.HasField('slider_id') and not request.HasField('torque') and not request.confirm:
+                return request.slider_id
+            return None
+        torque, slider_id, _, confirm = request.logging_data
+        return slider_id if torque == 'nan' and slider_id != 'nan' and confirm == 'False' else None
+
+    def describe(self, request) -> str:
+        if self.message_version == 2:
+            return "seq {} torque {} confirm {}".format(request.seq, request.torque if request.HasField('torque') else 'nan',
+                                                        request.confirm)
+        return str(list(request.logging_data))
+
+    def next_request(self):
+        """Next message to send, waiting at most until the next coalescing deadline (or 0.1 s). None if there is none yet."""
+        with self.pending_lock:
+            next_due = self.queue_pending(due_before=time.monotonic())
+        try:
+            return self.queue.get(timeout=0.1 if next_due is None else min(max(next_due, 0.001), 0.1))
+        except queue.Empty:
+            return None
+
+    def run(self):
+        if self.use_stream:
+            self.run_stream()
+        if not self.use_stream:
+            self.run_unary()
+        self.channel.close()
+        if self.latency_file is not None:
+            self.latency_file.close()
+
+    def run_unary(self):
+        while not self.quit_event.is_set():
+            request = self.next_request()
+            if request is not None:
+                self.deliver(request)
+
+        with self.pending_lock:
+            self.queue_pending(due_before=None)
+
+        # flush what is left (best effort, no retries, stop at the first failure) before closing the channel
+        while True:
+            try:
+                request = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if not self.deliver(request, retries=0):
+                break
+
+    def run_stream(self):
+        wait = self.backoff
+        while not self.quit_event.is_set():
+            # unacked commands of a broken stream go first, in order
+            with self.unacked_lock:
+                self.stream_generation += 1
+                generation = self.stream_generation
+                self.resend = deque(sorted(self.unacked))
+            self.stream = self.stub.CommandStream(self.stream_requests(generation), wait_for_ready=True)
+            try:
+                for ack in self.stream:
+                    self.on_ack(ack)
+                    wait = self.backoff
+                # the controller closed the stream: after stop() once everything is acked, otherwise reconnect
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.UNIMPLEMENTED:
+                    self.fall_back_to_unary()
+                    return
+                if self.quit_event.is_set():
+                    break
+                if self.connected:
+                    print("gRPC command stream lost:", e.code(), e.details())
+                self.connected = False
+            self.num_retried += len(self.unacked)
+            self.quit_event.wait(wait)
+            wait = min(2 * wait, 1.0)
+
+    def fall_back_to_unary(self):
+        """The controller doesn't serve CommandStream (not yet updated, or a test server): send one call per message"""
+        print("Controller has no gRPC command stream, sending one call per message (no apply acks)")
+        self.use_stream = False
+        with self.dequeue_lock:
+            with self.unacked_lock:
+                self.stream_generation += 1     # the stream's iterator stops taking commands
+                unsent = [self.unacked[seq][0] for seq in sorted(self.unacked)]
+                self.unacked.clear()
+                self.resend.clear()
+        for request in unsent:
+            self.deliver(request)
+
+    def stream_requests(self, generation):
+        """
+        Request iterator of one CommandStream (consumed by grpc). Ends once everything is sent after stop(), or once a
+        newer stream has replaced it.
+        """
+        while True:
+            request = self.next_stream_request(generation)
+            if request is None:
+                return
+            yield request
+
+    def next_stream_request(self, generation):
+        """
+        Next command for the stream of this generation: its resend list first, then the send queue. None ends the stream.
+        grpc keeps pulling from a broken stream's iterator for a while, so the generation is checked before taking a
+        command and again (with unacked_lock, like the new stream's resend snapshot) when adding it to unacked.
+        A command taken just as the stream was replaced goes on the new stream's resend list instead.
+        """
+        with self.dequeue_lock:
+            while True:
+                with self.unacked_lock:
+                    if generation != self.stream_generation:
+                        return None
+                    while self.resend:
+                        entry = self.unacked.get(self.resend.popleft())
+                        if entry is not None:       # not acked or superseded in the meantime
+                            entry[1] = time.time()
+                            return entry[0]
+
+                if self.quit_event.is_set():
+                    with self.pending_lock:
+                        self.queue_pending(due_before=None)
+                    try:
+                        request = self.queue.get_nowait()
+                    except queue.Empty:
+                        return None
+                else:
+                    request = self.next_request()
+                    if request is None:
+                        continue
+
+                with self.unacked_lock:
+                    self.unacked[request.seq] = [request, time.time()]
+                    if len(self.unacked) > self.queue.maxsize:
+                        self.drop_superseded()
+                    if generation == self.stream_generation:
+                        return request
+                    self.resend.append(request.seq)
+                    return None
+
+    def drop_superseded(self) -> None:
+        """
+        Controller isn't acking: gives up on the oldest unacked slider value that a newer unacked value of the same slider
+        replaces. Torque and confirm commands are kept (and re-sent) until acked. Call with unacked_lock held.
+        """
+        latest = {}         # slider -> seq of its newest unacked value
+        for seq in sorted(self.unacked):
+            key = self.slider_key(self.unacked[seq][0])
+            if key is not None:
+                latest[key] = seq
+        for seq in sorted(self.unacked):
+            key = self.slider_key(self.unacked[seq][0])
+            if key is not None and latest[key] != seq:
+                del self.unacked[seq]
+                self.num_superseded += 1
+                return
+        if not self.unacked_over:
+            print("gRPC command stream: {} commands waiting for an ack, none of them superseded".format(len(self.unacked)))
+            self.unacked_over = True
+
+    def on_ack(self, ack):
+        arrival = time.time()
+        with self.unacked_lock:
+            entry = self.unacked.pop(ack.seq, None)
+            if len(self.unacked) <= self.queue.maxsize:
+                self.unacked_over = False
+        if entry is None:
+            return          # ack of a command that was re-sent (already acked) or superseded
+        request, send_time = entry
+
+        # NTP style: network round trip without the controller's hold time, and the clock offset.
+        # The offset from the least delayed recent ack is the least affected by asymmetric network delays.
+        delay = (arrival - send_time) - (ack.ack_time - ack.receive_time)
+        self.offset_samples.append((delay, ((ack.receive_time - send_time) + (ack.ack_time - arrival)) / 2))
+        self.clock_offset = min(self.offset_samples)[1]
+        self.rtt.append(delay)
+        self.num_sent += 1
+        self.connected = True
+
+        press_to_apply = float('nan')
+        if not ack.applied:
+            self.num_not_applied += 1
+        elif request.HasField('torque'):
+            press_to_apply = ack.apply_time - self.clock_offset - request.client_time
+            self.press_to_apply.append(press_to_apply)
+        self.log_ack(request, send_time, arrival, ack, delay, press_to_apply)
+
+    def log_ack(self, request, send_time, arrival, ack, delay, press_to_apply):
+        if self.latency_log is None:
+            return
+        if self.latency_file is None:
+            self.latency_file = open(self.latency_log, 'a')
+            self.latency_writer = csv.writer(self.latency_file, lineterminator='\n', quotechar='|')
+            if self.latency_file.tell() == 0:
+                self.latency_writer.writerow(['seq', 'torque', 'client_time', 'send_time', 'ack_arrival_time', 'receive_time',
+                                              'apply_time', 'applied', 'clock_offset', 'network_rtt', 'press_to_apply'])
+        self.latency_writer.writerow([request.seq, request.torque if request.HasField('torque') else 'nan', request.client_time,
+                                      send_time, arrival, ack.receive_time, ack.apply_time, ack.applied, self.clock_offset,
+                                      delay, press_to_apply])
+        self.latency_file.flush()
+
+    def deliver(self, request, retries:int = None) -> bool:
+        retries = self.retries if retries is None else retries
+        wait = self.backoff
+        for attempt in range(retries + 1):
+            start = time.perf_counter()
+            try:
+                # wait_for_ready: wait (up to the timeout) for the channel to connect instead of failing right away
+                self.rpc(request, timeout=self.timeout, wait_for_ready=True)
+            except grpc.RpcError as e:
+                if e.code() not in RETRY_CODES or attempt == retries:
+                    self.num_failed += 1
+                    if self.connected:
+                        print("gRPC send failed:", e.code(), e.details())
+                    self.connected = False
+                    return False
+                self.num_retried += 1
+                if self.quit_event.wait(wait):
+                    wait = 0       # shutting down: try the remaining attempts right away
+                wait *= 2
+                continue
+            self.rtt.append(time.perf_counter() - start)
+            self.num_sent += 1
+            self.connected = True
+            return True
+
+    def stats(self) -> dict:
+        """Round-trip time stats of the last rtt_history delivered messages (ms), press -> apply latency (ms) and message counts"""
+        rtt = np.array(self.rtt) * 1000
+        summary = {'sent': self.num_sent, 'retried': self.num_retried, 'failed': self.num_failed, 'dropped': self.num_dropped,
+                   'refused': self.num_refused, 'coalesced': self.num_coalesced}
+        if len(rtt) > 0:
+            summary.update({'rtt_mean': float(rtt.mean()), 'rtt_p50': float(np.percentile(rtt, 50)),
+                            'rtt_p95': float(np.percentile(rtt, 95)), 'rtt_max': float(rtt.max())})
+        if self.use_stream:
+            summary.update({'not_applied': self.num_not_applied, 'superseded': self.num_superseded,
+                            'unacked': len(self.unacked)})
+        if self.press_to_apply:
+            latency = np.array(self.press_to_apply) * 1000
+            summary.update({'press_to_apply_p50': float(np.percentile(latency, 50)),
+                            'press_to_apply_p95': float(np.percentile(latency, 95)), 'press_to_apply_max': float(latency.max())})
+        return summary
+
+    def stop(self, timeout:float = 2.0) -> None:
+        """Sends what is still queued, closes the channel and prints the stats"""
+        self.quit_event.set()
+        self.join(timeout)
+        if self.is_alive() and self.stream is not None:
+            self.stream.cancel()        # controller unreachable or not acking
+            self.join(0.5)
+        print("gRPC sender stats:", {k: round(v, 2) if isinstance(v, float) else v for k, v in self.stats().items()})
@@ -0,0 +1,79 @@
+# Description:
+# Tablet side of the controller telemetry stream (StreamTelemetry).
+# TelemetryClient keeps the stream open from a background thread, reconnecting if the controller restarts, and keeps the
+# latest frame (and optionally calls back on every frame, from its own thread).
+# Run this file on the tablet/laptop to watch loop health, temperatures and delivered torque during a session:
+#   python telemetry_client.py [rate_hz]
+
+import sys
+import threading
+import time
+
+import grpc
+
+import gui2controller2_pb2
+import gui2controller2_pb2_grpc
+import config
+
+class TelemetryClient(threading.Thread):
+    """
+    Args:
+        channel: grpc channel to the controller (e.g. the GUI's GrpcSender.channel)
+        rate: requested frames per second
+        on_frame: optional callback(frame), called from this thread for every frame
+        reconnect_wait: wait before reopening a broken stream (s)
+    """
+    def __init__(self, channel, rate:float = 2.0, on_frame=None, reconnect_wait:float = 1.0, name='TelemetryClient'):
+        super().__init__(name=name, daemon=True)
+        self.stub = gui2controller2_pb2_grpc.CommunicationServiceStub(channel)
+        self.rate = rate
+        self.on_frame = on_frame
+        self.reconnect_wait = reconnect_wait
+
+        self.quit_event = threading.Event()
+        self.stream = None
+        self.latest = None                # last received telemetry_frame
+        self.latest_receive_time = 0.0    # time.time() when it arrived
+        self.num_frames = 0
+
+    def run(self):
+        while not self.quit_event.is_set():
+            try:
+                self.stream = self.stub.StreamTelemetry(gui2controller2_pb2.telemetry_request(rate=self.rate), wait_for_ready=True)
+                for frame in self.stream:
+                    self.latest = frame
+                    self.latest_receive_time = time.time()
+                    self.num_frames += 1
+                    if self.on_frame is not None:
+                        self.on_frame(frame)
+            except grpc.RpcError as e:
+                if self.quit_event.is_set():
+                    break
+                print("Telemetry stream lost:", e.code(), e.details())
+            self.quit_event.wait(self.reconnect_wait)
+
+    def stop(self) -> None:
+        self.quit_event.set()
+        if self.stream is not None:
+            self.stream.cancel()
+        self.join(1.0)
+
+def print_frame(frame):
+    print("{:>7d}  torque {:5.1f} Nm | peak L {:5.1f} R {:5.1f} Nm | rms err L {:4.1f} R {:4.1f} Nm | temp L {:4.1f} R {:4.1f} C | "
+          "Hz main {:5.0f} gse {:5.0f} bertec {:5.0f} | GUI msg {:5.2f} ms".format(
+              frame.seq, frame.commanded_torque, frame.peak_torque_left, frame.peak_torque_right,
+              frame.torque_rms_error_left, frame.torque_rms_error_right, frame.temperature_left, frame.temperature_right,
+              frame.vas_main_frequency, frame.gse_thread_frequency, frame.bertec_thread_frequency,
+              frame.gui_message_handling_time * 1000))
+
+if __name__ == '__main__':
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    channel = grpc.insecure_channel(config.server_ip, options=(('grpc.enable_http_proxy', 0), ))
+    client = TelemetryClient(channel, rate=rate, on_frame=print_frame)
+    client.start()
+    try:
+        while client.is_alive():
+            client.join(0.5)
+    except KeyboardInterrupt:
+        client.stop()
+    channel.close()
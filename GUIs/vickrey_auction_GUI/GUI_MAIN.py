@@ -18,6 +18,7 @@ import auction_pb2_grpc as pb2_grpc
 from constants import *
 from auction_schedules import *
 from statemachine import VA_StateMachine
+from grpc_outbox import GrpcOutbox
 
 # Button Callbacks
 def numpad_cb(instance):
@@ -145,6 +146,10 @@ class CountDownTimer(Label):
     def on_dur(self, instance, value):
         self.text = '{:.2f}'.format(value)
 
+# Runs grpc completion callbacks on the Kivy UI thread
+def run_on_ui_thread(callback, *args):
+    Clock.schedule_once(lambda dt: callback(*args))
+
 # GRPC object
 class CallerGRPC:
     def __init__(self):
@@ -152,6 +157,9 @@ class CallerGRPC:
         self.stub = pb2_grpc.auctionStub(self.channel)
         self.testconnection()
 
+        # Everything sent during the auction goes through the outbox, off the UI thread
+        self.outbox = GrpcOutbox(self.stub, dispatch=run_on_ui_thread)
+
     def testconnection(self):
         # Send testmsg to AuctionHouse
         msg = pb2.testmsg(msg="Hello there")
@@ -163,25 +171,28 @@ class CallerGRPC:
         else:
             raise ConnectionError("AuctionHouse connection unsuccessful.")
 
-    def call(self, t, subject_bid, user_win_flag, current_payout, total_winnings):
+    def call(self, t, subject_bid, user_win_flag, current_payout, total_winnings, callback=None):
+        # Sent in the background; callback(ok, response or error) runs on the UI thread once it's done
         resultmsg = pb2.result(t=t,
                          subject_bid=subject_bid,
                          user_win_flag=user_win_flag,
                          current_payout=current_payout,
                          total_winnings=total_winnings
                          )
-        response = self.stub.call(resultmsg)
-        return response
+        self.outbox.submit('call', resultmsg, persist=True, callback=callback)
     
-    def question(self, t, enjoyment, rpe):
+    def question(self, t, enjoyment, rpe, callback=None):
         surveymsg = pb2.survey(t=t, enjoyment=enjoyment, rpe=rpe)
-        response = self.stub.question(surveymsg)
-        return response
+        self.outbox.submit('question', surveymsg, persist=True, callback=callback)
     
-    def treadmill_message(self, state):
+    def treadmill_message(self, state, callback=None):
+        # Not persisted: a treadmill instruction is only useful during the session
         treadmillmsg = pb2.treadmill(state=state)
-        response = self.stub.treadmill_message(treadmillmsg)
-        return response
+        self.outbox.submit('treadmill_message', treadmillmsg, callback=callback)
+
+    def stop(self):
+        self.outbox.stop()
+        self.channel.close()
 
 
 # Combines kivy screen manager, statemachine, and GRPC into app
@@ -256,5 +267,9 @@ class CallerGUI(App):
 
         return sm
 
+    def on_stop(self):
+        # Auction results the auction house hasn't received stay in the outbox for the next start
+        self.root.callergrpc.stop()
+
 if __name__ == "__main__":
     CallerGUI().run()
@@ -0,0 +1,177 @@
+# Asyncio (grpc.aio) version of the auction house (see auctionhouse_MAIN.py)
+# All RPCs run on one event loop, so log rows are queued in the order they arrive and never interleave.
+# A single writer task owns the CSV files: it buffers rows and writes them every LOG_FLUSH_INTERVAL seconds,
+# once LOG_FLUSH_ROWS rows are waiting, and when the session ends. File I/O runs off the event loop,
+# so a slow disk never delays a receipt to the tablet.
+# Handling time of every RPC is recorded and reported every LATENCY_REPORT_INTERVAL seconds and at the end.
+
+import asyncio
+import csv
+import time
+from collections import defaultdict
+from functools import wraps
+
+import numpy as np
+import grpc
+import auction_pb2 as pb2
+import auction_pb2_grpc as pb2_grpc
+
+from constants import *
+
+def timed(rpc):
+    # Records the handling time of an RPC method in self.rpc_times[method name]
+    @wraps(rpc)
+    async def wrapper(self, request, context):
+        start = time.perf_counter()
+        try:
+            return await rpc(self, request, context)
+        finally:
+            self.rpc_times[rpc.__name__].append(time.perf_counter() - start)
+    return wrapper
+
+
+class BufferedCSVWriter:
+    # Single writer task for all the session's CSV files
+    def __init__(self, headers:dict, flush_interval:float = LOG_FLUSH_INTERVAL, flush_rows:int = LOG_FLUSH_ROWS):
+        """
+        Args:
+            headers: filename -> header row (written when the session starts, like auctionhouse_MAIN)
+            flush_interval: max time a row waits in the buffer (s)
+            flush_rows: rows waiting (all files) that trigger an early write
+        """
+        self.headers = headers
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.queue = asyncio.Queue()
+        self.buffers = defaultdict(list)
+        self.num_buffered = 0
+        self.task = None
+
+    def start(self):
+        for filename, header in self.headers.items():
+            self.buffers[filename].append(header)
+        self.num_buffered = len(self.headers)
+        self.task = asyncio.create_task(self.run())
+
+    def write(self, filename, row):
+        # Called from RPC handlers: never waits
+        self.queue.put_nowait((filename, row))
+
+    async def run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                filename, row = await asyncio.wait_for(self.queue.get(), timeout=max(deadline - time.monotonic(), 0))
+                self.buffers[filename].append(row)
+                self.num_buffered += 1
+            except asyncio.TimeoutError:
+                pass
+            if self.num_buffered >= self.flush_rows or time.monotonic() >= deadline:
+                await self.flush()
+                deadline = time.monotonic() + self.flush_interval
+
+    async def flush(self):
+        buffers, self.buffers, self.num_buffered = self.buffers, defaultdict(list), 0
+        if buffers:
+            await asyncio.to_thread(self.write_rows, buffers)
+
+    @staticmethod
+    def write_rows(buffers):
+        for filename, rows in buffers.items():
+            with open(filename, 'a', newline='') as f:
+                csv.writer(f).writerows(rows)
+
+    async def close(self):
+        # Session end: stop the task, then write everything still queued or buffered
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        while not self.queue.empty():
+            filename, row = self.queue.get_nowait()
+            self.buffers[filename].append(row)
+        await self.flush()
+
+
+class AuctionHouse(pb2_grpc.auctionServicer):
+    # Logs user bids and displays win/loss for experimenter
+    def __init__(self, subject_name):
+        self.subject_name = subject_name
+        self.bid = 0
+
+        self.auctionfilename = "{}_auction.csv".format(self.subject_name)
+        self.surveyfilename = "{}_survey.csv".format(self.subject_name)
+
+        self.auctionheader = ["t", "subject_bid", "user_win_flag", "current_payout", "total_winnings"]
+        self.surveyheader = ["t", "enjoyment", "rpe"]
+
+        self.log = BufferedCSVWriter({self.auctionfilename: self.auctionheader, self.surveyfilename: self.surveyheader})
+        self.rpc_times = defaultdict(list)
+
+    @timed
+    async def testconnection(self, request, context):
+        print("Testing Connection: {}".format(request.msg))
+        return pb2.receipt(received=True)
+
+    @timed
+    async def call(self, resultmsg, context):
+        datalist = [resultmsg.t, resultmsg.subject_bid, resultmsg.user_win_flag, resultmsg.current_payout, resultmsg.total_winnings]
+        print("Received auction results: {}, {}, {}, {}, {}".format(*datalist))
+        self.log.write(self.auctionfilename, datalist)
+        return pb2.receipt(received=True)
+
+    @timed
+    async def question(self, surveymsg, context):
+        datalist = [surveymsg.t, surveymsg.enjoyment, surveymsg.rpe]
+        print("Received survey results: {}, {}, {}".format(*datalist))
+        self.log.write(self.surveyfilename, datalist)
+        return pb2.receipt(received=True)
+
+    @timed
+    async def treadmill_message(self, treadmillmsg, context):
+        if treadmillmsg.state:
+            print("\nBEGIN/START THE TREADMILL NOW\n")
+        else:
+            print("\nCEASE/STOP THE TREADMILL NOW\n")
+        return pb2.receipt(received=True)
+
+    def report_rpc_times(self):
+        for name, times in sorted(self.rpc_times.items()):
+            ms = np.array(times) * 1000
+            print("RPC {:<18} n {:>5}  median {:6.2f} ms  p95 {:6.2f} ms  max {:6.2f} ms".format(
+                name, len(ms), np.median(ms), np.percentile(ms, 95), ms.max()))
+
+    async def report_rpc_times_periodically(self, interval:float = LATENCY_REPORT_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            self.report_rpc_times()
+
+
+async def start_auction(subject_name):
+    auctionhouse = AuctionHouse(subject_name)
+    auctionhouse.log.start()
+    reporter = asyncio.create_task(auctionhouse.report_rpc_times_periodically())
+
+    server = grpc.aio.server()
+    pb2_grpc.add_auctionServicer_to_server(auctionhouse, server)
+    server.add_insecure_port(CLIENT_IP)
+    await server.start()
+    print("\nStarting auctions\n")
+    try:
+        await server.wait_for_termination()
+    finally:
+        # Ctrl-C / session end: finish open RPCs, then write out every buffered row
+        await server.stop(grace=1.0)
+        reporter.cancel()
+        await auctionhouse.log.close()
+        auctionhouse.report_rpc_times()
+
+if __name__ == "__main__":
+    subject_name = input("Subject name: ")
+    try:
+        print("Starting Auction House")
+        asyncio.run(start_auction(subject_name))
+    except KeyboardInterrupt:
+        print("Exiting")
@@ -9,6 +9,19 @@ SERVER_IP = f"{'35.3.150.116'}:" f"{'50051'}"    # IP address of local machine
 
 CLIENT_IP = "[::]:50051"   # IP address of the tablet
 
+# GUI -> auction house messages (grpc_outbox)
+GRPC_TIMEOUT = 2.0                      # deadline of each send attempt (s)
+GRPC_RETRIES = 3                        # attempts per message
+GRPC_RETRY_WAIT = 0.5                   # wait before the first retry, doubled after each (s)
+OUTBOX_FILE = "auction_outbox.jsonl"    # auction results/survey answers not yet received by the auction house
+OUTBOX_MAX_FAILURES = 3                 # rounds a message may be refused (non-retryable error) before it is set aside
+OUTBOX_DEAD_LETTER_FILE = "auction_outbox_dead.jsonl"   # messages set aside, with the auction house's last error
+
+# Auction house (auctionhouse_aio) logging
+LOG_FLUSH_INTERVAL = 1.0        # max time a CSV row waits before it is written (s)
+LOG_FLUSH_ROWS = 20             # buffered rows that trigger an early write
+LATENCY_REPORT_INTERVAL = 60    # time between RPC latency reports (s)
+
 # Auction timings in seconds
 AUCTION_START = 0/squeeze
 AUCTION_CLOSE = 120/squeeze
@@ -0,0 +1,202 @@
+# Description:
+# Background gRPC outbox for the auction GUI.
+# Auction results, survey answers and treadmill messages are sent from one worker thread, so a slow or unreachable
+# auction house never stalls the Kivy UI thread mid-auction. Messages go out in the order they were submitted.
+# Each send has a timeout and is retried with backoff.
+#
+# Results and survey answers (persist=True) are appended to an outbox file before they are sent and marked
+# sent once the auction house has them. Anything still unsent is retried ahead of the next message and
+# when the GUI starts again, so no auction data is lost if the auction house drops out. Treadmill messages
+# (not persisted) don't wait behind undelivered results. A message the auction house keeps refusing
+# (an error retrying won't fix) is moved to a dead-letter file after max_failures rounds, so it can't hold up the rest.
+#
+# The UI only sees the outcome, through a completion callback(ok, response or error) run by `dispatch`
+# (e.g. on the Kivy clock).
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import grpc
+from google.protobuf import json_format
+
+import auction_pb2 as pb2
+
+from constants import *
+
+# Errors worth retrying (auction house not reachable yet, busy, or connection dropped)
+RETRY_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.RESOURCE_EXHAUSTED)
+
+# RPC name -> request message type
+REQUEST_TYPES = {'call': pb2.result, 'question': pb2.survey, 'treadmill_message': pb2.treadmill}
+
+class GrpcOutbox:
+    """
+    Args:
+        stub: auctionStub to send with
+        filename: outbox file (JSON lines)
+        timeout: deadline of each send attempt (s)
+        retries: attempts per message before it is left in the outbox for later
+        retry_wait: wait before the first retry (s), doubled on each further retry
+        max_failures: rounds a message may fail with a non-retryable error before it goes to the dead-letter file
+        dead_letter_filename: file (JSON lines) for messages the auction house keeps refusing
+        dispatch: dispatch(callback, *args) runs completion callbacks, defaults to calling them on the worker thread
+    """
+    def __init__(self, stub, filename:str = OUTBOX_FILE, timeout:float = GRPC_TIMEOUT, retries:int = GRPC_RETRIES,
+                 retry_wait:float = GRPC_RETRY_WAIT, max_failures:int = OUTBOX_MAX_FAILURES,
+                 dead_letter_filename:str = OUTBOX_DEAD_LETTER_FILE, dispatch=None):
+        self.stub = stub
+        self.filename = filename
+        self.timeout = timeout
+        self.retries = retries
+        self.retry_wait = retry_wait
+        self.max_failures = max_failures
+        self.dead_letter_filename = dead_letter_filename
+        self.dispatch = dispatch if dispatch is not None else (lambda callback, *args: callback(*args))
+
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='AuctionOutbox')
+        self.lock = threading.Lock()
+        self.unsent = OrderedDict()     # id -> [rpc name, request, persist, callback, non-retryable failures]; in send order
+        self.next_id = 0
+        self.stopped = False
+
+        self.load()
+        if self.unsent:
+            print("{} unsent message(s) from a previous session in {}".format(len(self.unsent), self.filename))
+            self.executor.submit(self.send_unsent)
+
+    def load(self):
+        # Keep the unsent messages of earlier sessions and rewrite the file with just those
+        entries = OrderedDict()
+        try:
+            with open(self.filename) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    if entry.get('sent'):
+                        entries.pop(entry['id'], None)
+                    else:
+                        entries[entry['id']] = entry
+        except FileNotFoundError:
+            pass
+
+        lines = []
+        for entry in entries.values():
+            request = json_format.ParseDict(entry['request'], REQUEST_TYPES[entry['rpc']]())
+            self.unsent[self.next_id] = [entry['rpc'], request, True, None, 0]
+            lines.append(self.entry_line(self.next_id, entry['rpc'], request))
+            self.next_id += 1
+        with open(self.filename, 'w') as f:
+            f.writelines(lines)
+
+    @staticmethod
+    def entry_line(id, rpc, request):
+        request = json_format.MessageToDict(request, preserving_proto_field_name=True)
+        return json.dumps({'id': id, 'rpc': rpc, 'request': request}) + '\n'
+
+    def append_line(self, line):
+        with open(self.filename, 'a') as f:
+            f.write(line)
+
+    def submit(self, rpc:str, request, persist:bool = False, callback=None) -> None:
+        """
+        Queues a message and returns right away.
+
+        Args:
+            rpc: auction service method name ('call', 'question' or 'treadmill_message')
+            request: request message
+            persist: keep the message in the outbox file until it is delivered
+            callback: optional callback(ok, response or grpc.RpcError), run through dispatch once the message is
+                delivered or could not be (a persisted message then stays in the outbox and is retried with the next one,
+                others are dropped)
+        """
+        with self.lock:
+            if self.stopped:
+                return
+            id = self.next_id
+            self.next_id += 1
+            if persist:
+                self.append_line(self.entry_line(id, rpc, request))
+            self.unsent[id] = [rpc, request, persist, callback, 0]
+        self.executor.submit(self.send_unsent)
+
+    def send_unsent(self):
+        # Worker thread: sends everything unsent, oldest first. Once a persisted message can't be delivered the later
+        # persisted ones fail this round without trying, so the auction house never gets results out of order.
+        # Treadmill messages are still tried.
+        with self.lock:
+            items = list(self.unsent.items())
+        error = None
+        for id, (rpc, request, persist, callback, failures) in items:
+            with self.lock:
+                if id not in self.unsent or self.stopped:
+                    continue
+            if error is None or not persist:
+                ok, result = self.send(rpc, request)
+                if not ok:
+                    print("Could not send {} to the auction house: {}".format(
+                        rpc, result.code() if isinstance(result, grpc.RpcError) else result))
+                    if persist:
+                        error = result
+                        if not self.retryable(result):
+                            failures += 1
+            else:
+                ok, result = False, error
+            with self.lock:
+                if ok or not persist:
+                    del self.unsent[id]
+                elif failures >= self.max_failures:
+                    # The auction house keeps refusing it: set it aside so later messages can go out
+                    del self.unsent[id]
+                    self.append_dead_letter(id, rpc, request, result)
+                    error = None
+                else:
+                    # Report the failure once; the message stays in the outbox and is retried later
+                    self.unsent[id] = [rpc, request, persist, None, failures]
+                if persist and id not in self.unsent:
+                    self.append_line(json.dumps({'id': id, 'sent': True}) + '\n')
+            if callback is not None:
+                self.dispatch(callback, ok, result)
+
+    @staticmethod
+    def retryable(error) -> bool:
+        return isinstance(error, grpc.RpcError) and error.code() in RETRY_CODES
+
+    def append_dead_letter(self, id, rpc, request, error):
+        print("Moving {} {} to {} after {} refusals".format(rpc, id, self.dead_letter_filename, self.max_failures))
+        entry = json.loads(self.entry_line(id, rpc, request))
+        entry['error'] = "{}: {}".format(error.code(), error.details()) if isinstance(error, grpc.RpcError) else str(error)
+        entry['time'] = time.time()
+        with open(self.dead_letter_filename, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    def send(self, rpc, request):
+        """
+        Returns:
+            True and the response, or False and the last error
+        """
+        wait = self.retry_wait
+        for attempt in range(self.retries):
+            try:
+                return True, getattr(self.stub, rpc)(request, timeout=self.timeout)
+            except grpc.RpcError as e:
+                error = e
+                if e.code() not in RETRY_CODES or attempt == self.retries - 1 or self.stopped:
+                    break
+            time.sleep(wait)
+            wait *= 2
+        return False, error
+
+    def num_unsent(self) -> int:
+        with self.lock:
+            return len(self.unsent)
+
+    def stop(self) -> None:
+        # Unsent persisted messages stay in the outbox file for the next session
+        with self.lock:
+            self.stopped = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
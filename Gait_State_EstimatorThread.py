@@ -17,7 +17,12 @@ from time import strftime
 from flexsea.device import Device
 
 from SoftRTloop import FlexibleTimer
-from utils import MovingAverageFilter
+from utils import MovingAverageFilter, DeviceClock, WindowMean
+from gait_phase import GaitPhaseEstimator
+from heel_strike_fusion import FusedHeelStrikeDetector
+from sensor_history import SensorHistory
+from savgol_filter import SavitzkyGolayFilter
+from telemetry import TelemetrySnapshot
 
 class Gait_State_Estimator(threading.Thread):
     def __init__(self, side_1, device_1, side_2, device_2, quit_event=Type[threading.Event],name='GSE'):
@@ -36,18 +41,35 @@ class Gait_State_Estimator(threading.Thread):
             self.motor_sign_right = -1
 
         self.quit_event = quit_event
+
+        # Sensor frame timestamps: device state_time mapped onto the host monotonic clock
+        # All period/phase calculations use these instead of calling time.time()
+        self.clock_left = DeviceClock()
+        self.clock_right = DeviceClock()
+        self.frame_time_left = 0
+        self.frame_time_right = 0
+
+        # Continuous gait phase (adaptive oscillator on ankle angle, anchored at heel strike)
+        self.phase_estimator_left = GaitPhaseEstimator()
+        self.phase_estimator_right = GaitPhaseEstimator()
+        self.prev_HS_bool_left = False
+        self.prev_HS_bool_right = False
+
+        # Fused IMU + Bertec heel strike detection (Bertec heel strike times are on the time.time() clock)
+        self.fused_detector_left = FusedHeelStrikeDetector()
+        self.fused_detector_right = FusedHeelStrikeDetector()
+        self.wall_clock_offset = time.time() - time.monotonic()
        
         # Temp variables
-        self.prev_accel_y_left = 0
         self.prev_time_left = 0
-        self.prev_accel_y_right = 0
         self.prev_time_right = 0
         self.prev_accel_x_left = 0
         self.prev_accel_x_right = 0
 
         # Stride time
-        self.stride_time_left = [1, 1]
-        self.stride_time_right = [1, 1]
+        # Recent accepted stride periods (mean of the last 5)
+        self.stride_time_left = WindowMean([1, 1], size=5)
+        self.stride_time_right = WindowMean([1, 1], size=5)
 
         self.start_time_left = 0
         self.stride_time_left_temp = 0
@@ -61,8 +83,8 @@ class Gait_State_Estimator(threading.Thread):
         self.right_prev_hs = False
         
         # Stance time
-        self.stance_time_left = [1, 1]
-        self.stance_time_right = [1, 1]
+        self.stance_time_left = WindowMean([1, 1], size=5)
+        self.stance_time_right = WindowMean([1, 1], size=5)
         self.stance_time_left_temp = 0
         self.stance_time_right_temp = 0
 
@@ -78,11 +100,27 @@ class Gait_State_Estimator(threading.Thread):
         # instantiate soft real-time loop
         loopFreq = 300 #425 # Hz
         self.softRTloop = FlexibleTimer(target_freq=loopFreq) 
+
+        # Last 10 s of sensor frames, shared with the other threads through config
+        self.history_left = SensorHistory(size=10 * loopFreq)
+        self.history_right = SensorHistory(size=10 * loopFreq)
+        config.sensor_history_left = self.history_left
+        config.sensor_history_right = self.history_right
+
+        # Smoothed values and derivatives of every history channel (50 ms window)
+        self.savgol_left = SavitzkyGolayFilter(self.history_left, window=15, order=2)
+        self.savgol_right = SavitzkyGolayFilter(self.history_right, window=15, order=2)
+
+        # Latest values for the tablet telemetry stream (read by the GUI thread at the client's rate)
+        self.telemetry = TelemetrySnapshot()
+        config.telemetry = self.telemetry
         
     def read_exo_sensors(self):
             data_left = self.device_left.read()
             ##### Time #####
             config.state_time_left = data_left['state_time'] / 1000 #converting to seconds
+            self.frame_time_left = self.clock_left.update(config.state_time_left)
+            config.frame_time_left = self.frame_time_left
             
             ##### Temperature #####
             config.temperature_left = data_left['temperature']
@@ -116,11 +154,19 @@ class Gait_State_Estimator(threading.Thread):
             act_mot_torque_left = (config.motor_current_left * config.Kt / 1000 / self.motor_sign_left)  # in Nm
             config.act_ank_torque_left = act_mot_torque_left * config.N_left * config.efficiency
 
+            self.history_left.push(self.frame_time_left, (config.ankle_angle_left, config.ankle_velocity_left,
+                                   config.accel_x_left, config.accel_y_left, config.accel_z_left,
+                                   config.gyro_x_left, config.gyro_y_left, config.gyro_z_left,
+                                   config.motor_angle_left, config.motor_velocity_left, config.motor_current_left,
+                                   config.act_ank_torque_left))
+
             """Read Right exo"""
             data_right = self.device_right.read()
 
             ##### Time #####
             config.state_time_right = data_right['state_time'] *(1/1000) #converting to seconds
+            self.frame_time_right = self.clock_right.update(config.state_time_right)
+            config.frame_time_right = self.frame_time_right
             
             ##### Temperature #####
             config.temperature_right = data_right['temperature']
@@ -153,29 +199,90 @@ class Gait_State_Estimator(threading.Thread):
             act_mot_torque_right = (config.motor_current_right * config.Kt / 1000 / self.motor_sign_right)  # in Nm
             config.act_ank_torque_right = act_mot_torque_right * config.N_right * config.efficiency
 
+            self.history_right.push(self.frame_time_right, (config.ankle_angle_right, config.ankle_velocity_right,
+                                    config.accel_x_right, config.accel_y_right, config.accel_z_right,
+                                    config.gyro_x_right, config.gyro_y_right, config.gyro_z_right,
+                                    config.motor_angle_right, config.motor_velocity_right, config.motor_current_right,
+                                    config.act_ank_torque_right))
+
+    def sensor_derivatives(self):
+        # Left side
+        self.savgol_left.update()
+        config.ankle_velocity_sg_left = self.savgol_left.derivative('ankle_angle')
+        config.motor_velocity_sg_left = self.savgol_left.derivative('motor_angle')
+        config.accel_y_jerk_left = self.savgol_left.derivative('accel_y')
+
+        # Right side
+        self.savgol_right.update()
+        config.ankle_velocity_sg_right = self.savgol_right.derivative('ankle_angle')
+        config.motor_velocity_sg_right = self.savgol_right.derivative('motor_angle')
+        config.accel_y_jerk_right = self.savgol_right.derivative('accel_y')
+
     def gait_estimator(self):
             # Left side
-            if(abs(config.accel_y_left - self.prev_accel_y_left) >= 1.2 and ((time.time() - self.prev_time_left)>= 0.45)):
+            prev_accel_y_left, accel_y_left = self.history_left.window(2, 'accel_y')
+            if(abs(accel_y_left - prev_accel_y_left) >= 1.2 and ((self.frame_time_left - self.prev_time_left)>= 0.45)):
                 config.heel_strike_left = 10
                 config.in_swing_start_left = False
                 config.swing_val_left = 10
-                self.prev_time_left = time.time()
+                self.prev_time_left = self.frame_time_left
                 # print("Heel Strike Left")
             else:
                 config.heel_strike_left = 0
-            self.prev_accel_y_left = config.accel_y_left
 
             # Right side
-            if(abs(config.accel_y_right - self.prev_accel_y_right) >= 1.2 and ((time.time() - self.prev_time_right)>= 0.45)):
+            prev_accel_y_right, accel_y_right = self.history_right.window(2, 'accel_y')
+            if(abs(accel_y_right - prev_accel_y_right) >= 1.2 and ((self.frame_time_right - self.prev_time_right)>= 0.45)):
                 config.heel_strike_right = 10
                 config.in_swing_start_right = False
                 config.swing_val_right = 10
-                self.prev_time_right = time.time()
+                self.prev_time_right = self.frame_time_right
                 # print("Heel Strike Right")
             else:
                 config.heel_strike_right = 0
-            self.prev_accel_y_right = config.accel_y_right
             
+    def gait_phase(self):
+        # Heel strike anchor from the force plates when streaming, otherwise from the IMU detector
+        if config.bertec_fp_streaming:
+            heel_strike_left = config.HS_bool_left and not self.prev_HS_bool_left
+            heel_strike_right = config.HS_bool_right and not self.prev_HS_bool_right
+            self.prev_HS_bool_left = config.HS_bool_left
+            self.prev_HS_bool_right = config.HS_bool_right
+        else:
+            heel_strike_left = config.heel_strike_left == 10
+            heel_strike_right = config.heel_strike_right == 10
+
+        # Left side
+        config.gait_phase_left, config.gait_phase_rate_left = self.phase_estimator_left.update(config.ankle_angle_left, self.frame_time_left, heel_strike_left)
+        config.gait_phase_locked_left = self.phase_estimator_left.is_locked()
+
+        # Right side
+        config.gait_phase_right, config.gait_phase_rate_right = self.phase_estimator_right.update(config.ankle_angle_right, self.frame_time_right, heel_strike_right)
+        config.gait_phase_locked_right = self.phase_estimator_right.is_locked()
+
+    def fused_heel_strike(self):
+        # Refresh the monotonic -> wall clock offset only on IMU heel strikes (clock steps are rare)
+        if config.heel_strike_left == 10 or config.heel_strike_right == 10:
+            self.wall_clock_offset = time.time() - time.monotonic()
+
+        # Left side
+        bertec_contact = config.HS_bool_left if config.bertec_fp_streaming else None
+        in_stance, config.fused_HS_time_left = self.fused_detector_left.update(self.frame_time_left + self.wall_clock_offset,
+                                                                                config.heel_strike_left == 10, config.in_swing_start_left,
+                                                                                bertec_contact, config.bertec_HS_time_left)
+        config.fused_in_swing_left = not in_stance
+        config.fused_swing_val_left = 100 if config.fused_in_swing_left else 10
+        config.HS_latency_diff_left = self.fused_detector_left.latency_diff
+
+        # Right side
+        bertec_contact = config.HS_bool_right if config.bertec_fp_streaming else None
+        in_stance, config.fused_HS_time_right = self.fused_detector_right.update(self.frame_time_right + self.wall_clock_offset,
+                                                                                  config.heel_strike_right == 10, config.in_swing_start_right,
+                                                                                  bertec_contact, config.bertec_HS_time_right)
+        config.fused_in_swing_right = not in_stance
+        config.fused_swing_val_right = 100 if config.fused_in_swing_right else 10
+        config.HS_latency_diff_right = self.fused_detector_right.latency_diff
+
     def in_swing_flag(self):
         # Left Side
         if (config.accel_y_left <= 0.8) and (config.ankle_angle_left - config.ankle_offset_left > 10) and (config.gyro_z_left >= -20):
@@ -191,33 +298,33 @@ class Gait_State_Estimator(threading.Thread):
         # compute time spent in stance phase - between heel strike and toe off - in a similar way to stride time
         if (side == 'left'):
             if (config.heel_strike_left == 10 and config.in_swing_start_left == False):
-                self.start_time_stance_left = time.time()
+                self.start_time_stance_left = self.frame_time_left
                 
                 if((0.6*config.stance_time_left) <= self.stance_time_left_temp <= (1.2*config.stance_time_left)):
                     self.stance_time_left.append(self.stance_time_left_temp)
-                    config.stance_time_left = np.mean(self.stance_time_left[-5:])
+                    config.stance_time_left = self.stance_time_left.mean()
                     
             elif (config.heel_strike_left == 0 and config.in_swing_start_left == True):
-                self.stance_time_left_temp = time.time() - self.start_time_stance_left
+                self.stance_time_left_temp = self.frame_time_left - self.start_time_stance_left
                 
             else:
-                self.time_in_current_stance_left = time.time() - self.start_time_stance_left
+                self.time_in_current_stance_left = self.frame_time_left - self.start_time_stance_left
                 
             config.time_in_current_stance_left = self.time_in_current_stance_left
 
         elif(side == 'right'):
             if (config.heel_strike_right == 10 and config.in_swing_start_right == False):
                 # stop timer and log time if heel strike is detected and we are not in swing
-                self.stance_time_right_temp = time.time()
+                self.stance_time_right_temp = self.frame_time_right
                 if((0.6*config.stance_time_right) <= self.stance_time_right_temp <= (1.2*config.stance_time_right)):
                     self.stance_time_right.append(self.stance_time_right_temp)
-                    config.stance_time_right = np.mean(self.stance_time_right[-5:])
+                    config.stance_time_right = self.stance_time_right.mean()
                     
                 elif (config.heel_strike_right == 0 and config.in_swing_start_right == True):
-                    self.start_time_stance_right = time.time() - self.start_time_stance_left
+                    self.start_time_stance_right = self.frame_time_right - self.start_time_stance_left
                     
                 else:
-                    self.time_in_current_stance_right = time.time() - self.start_time_stance_right
+                    self.time_in_current_stance_right = self.frame_time_right - self.start_time_stance_right
                     
                 config.time_in_current_stance_right = self.time_in_current_stance_right
            
@@ -225,36 +332,36 @@ class Gait_State_Estimator(threading.Thread):
     def stride_time(self):
         # Left side
         if(config.heel_strike_left == 10 and self.left_prev_hs == True):
-            self.stride_time_left_temp = time.time() - self.start_time_left
+            self.stride_time_left_temp = self.frame_time_left - self.start_time_left
             # prev thresh: 0.45 & 1.8
             if((0.6*config.stride_time_left) <= self.stride_time_left_temp <= (1.2*config.stride_time_left)):
                 self.stride_time_left.append(self.stride_time_left_temp)
-                config.stride_time_left = np.mean(self.stride_time_left[-5:])
-            self.start_time_left = time.time()
+                config.stride_time_left = self.stride_time_left.mean()
+            self.start_time_left = self.frame_time_left
             
         elif(config.heel_strike_left == 10 and self.left_prev_hs == False):
             # First time heel strike is detected
-            self.start_time_left = time.time()
+            self.start_time_left = self.frame_time_left
             self.left_prev_hs = True
             
-        self.time_in_current_stride_left = time.time() - self.start_time_left
+        self.time_in_current_stride_left = self.frame_time_left - self.start_time_left
         config.time_in_current_stride_left = self.time_in_current_stride_left
 
         # Right side
         if(config.heel_strike_right == 10 and self.right_prev_hs == True):
-            self.stride_time_right_temp = time.time() - self.start_time_right
+            self.stride_time_right_temp = self.frame_time_right - self.start_time_right
             # print(self.stride_time_right_temp)
             if((0.6*config.stride_time_right) <= self.stride_time_right_temp <= (1.2*config.stride_time_right)):
                 self.stride_time_right.append(self.stride_time_right_temp)
-                config.stride_time_right = np.mean(self.stride_time_right[-5:])
-            self.start_time_right = time.time()
+                config.stride_time_right = self.stride_time_right.mean()
+            self.start_time_right = self.frame_time_right
             
         elif(config.heel_strike_right == 10 and self.right_prev_hs == False):
             # First time heel strike is detected
-            self.start_time_right = time.time()
+            self.start_time_right = self.frame_time_right
             self.right_prev_hs = True
             
-        self.time_in_current_stride_right = time.time() - self.start_time_right
+        self.time_in_current_stride_right = self.frame_time_right - self.start_time_right
         config.time_in_current_stride_right = self.time_in_current_stride_right
     
     def logging(self, filename, datapoint_array): #Adding VSO/ VSPA style of logging
@@ -302,7 +409,12 @@ class Gait_State_Estimator(threading.Thread):
                          'bertec_HS_left', 'bertec_HS_right', 'all_bertec_left', 'all_bertec_right', 'bertec_stance_t_left', 'bertec_stance_t_right',
                          'stride_t_bertec_left', 'stride_t_bertec_right', 'bertec_in_swing_left', 'bertec_in_swing_right',
                          'desired_torque_left', 'desired_torque_right',
-                         'vas_main_frequency', 'gui_communication_thread_frequency', 'gse_thread_frequency', 'bertec_thread_frequency'
+                         'vas_main_frequency', 'gui_message_handling_time', 'gse_thread_frequency', 'bertec_thread_frequency',
+                         'gait_phase_left', 'gait_phase_right', 'gait_phase_rate_left', 'gait_phase_rate_right',
+                         'pipeline_delay_left', 'pipeline_delay_right',
+                         'fused_swing_left', 'fused_swing_right', 'HS_latency_diff_left', 'HS_latency_diff_right',
+                         'ankle_velocity_sg_left', 'ankle_velocity_sg_right', 'accel_y_jerk_left', 'accel_y_jerk_right',
+                         'GUI command seq'
                          ])
         
         # Period Tracker
@@ -313,9 +425,12 @@ class Gait_State_Estimator(threading.Thread):
                 
                 # Running the GSE
                 self.read_exo_sensors()
+                self.sensor_derivatives()
                 self.gait_estimator()
                 self.stride_time()
+                self.gait_phase()
                 self.in_swing_flag()
+                self.fused_heel_strike()
                 # self.IMU_stance_time()
                 
                 # logging to csv
@@ -332,7 +447,12 @@ class Gait_State_Estimator(threading.Thread):
                     config.bertec_HS_left,config.bertec_HS_right, config.z_forces_left, config.z_forces_right, config.time_in_current_stance_left, config.time_in_current_stance_right,
                     config.stride_period_bertec_left, config.stride_period_bertec_right,config.swing_val_bertec_left,config.swing_val_bertec_right,
                     config.desired_spline_torque_left,config.desired_spline_torque_right,
-                    config.vas_main_frequency, config.gui_communication_thread_frequency, config.gse_thread_frequency, config.bertec_thread_frequency
+                    config.vas_main_frequency, config.gui_message_handling_time, config.gse_thread_frequency, config.bertec_thread_frequency,
+                    config.gait_phase_left, config.gait_phase_right, config.gait_phase_rate_left, config.gait_phase_rate_right,
+                    config.pipeline_delay_left, config.pipeline_delay_right,
+                    config.fused_swing_val_left, config.fused_swing_val_right, config.HS_latency_diff_left, config.HS_latency_diff_right,
+                    config.ankle_velocity_sg_left, config.ankle_velocity_sg_right, config.accel_y_jerk_left, config.accel_y_jerk_right,
+                    config.gui_command_seq
                     ])
 
                 # plotting with RTPlot
@@ -348,6 +468,11 @@ class Gait_State_Estimator(threading.Thread):
                 prev_end_time = end_time
                 config.gse_thread_frequency = 1/period_tracker.average()
 
+                # Telemetry snapshot for the tablet
+                self.telemetry.publish((end_time, config.GUI_commanded_torque, config.peak_torque_measured_left, config.peak_torque_measured_right,
+                    config.torque_rms_error_left, config.torque_rms_error_right, config.temperature_left, config.temperature_right,
+                    config.vas_main_frequency, config.gse_thread_frequency, config.gui_message_handling_time, config.bertec_thread_frequency))
+
                 # soft real-time loop
                 self.softRTloop.pause()
             # except Exception as e:
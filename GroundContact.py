@@ -1,6 +1,6 @@
 import time
 import numpy as np
-from utils import MovingAverageFilterPlus
+from utils import MovingAverageFilterPlus, hysteresis, hold_last
 
 # class to determine ground contact 
 hs_threshold = 50
@@ -18,6 +18,8 @@ class GroundContact:
         self.contact = False
         self.TO_time = time.time()
         self.HS_time = time.time()
+        self.hs_threshold = hs_threshold
+        self.to_threshold = to_threshold
         
         self.movmean_window_sz = 10
         self.stance_period = 0.92   # initial guess of stance time (@ 0.8m/s & 1.0)
@@ -27,52 +29,110 @@ class GroundContact:
 
         self.time_in_current_stance = 0
     
-    def update(self, force):
+    def update(self, force, timestamp=None):
+        """timestamp: time of the force sample (s, local clock). Defaults to the arrival time."""
+        now = time.time() if timestamp is None else timestamp
         newContact = self.contact
         if self.contact: # if no state change, i.e. we are in contact 
             # compute current time in stance
-            self.time_in_current_stance = time.time() - self.HS_time 
+            self.time_in_current_stance = now - self.HS_time 
             
-            if force < to_threshold: #there is no contact if the force is less than 20 N 
+            if force < self.to_threshold: #there is no contact if the force is less than 20 N 
                 newContact = False  
         else:
-            if force >= hs_threshold: #there is a heel strike if force is greater than 50 N 
+            if force >= self.hs_threshold: #there is a heel strike if force is greater than 50 N 
                 newContact = True            
         
         # if newContact has changed to true, means heel-strike, otherwise toe-off
         if newContact != self.contact:  # Detects a state change
             if newContact == True: # in this case we have a heel strike 
-                temp_stride_period_bertec = time.time() - self.HS_time
-                
-                # make sure stride_period is appropriate before appending to averaging list:
-                if((0.8*self.stride_period_bertec) <= temp_stride_period_bertec <= (1.20*self.stride_period_bertec)):
-                    self.stride_periods.append(temp_stride_period_bertec)
-                
-                # Moving average window:
-                if len(self.stride_periods) > self.movmean_window_sz:
-                    self.stride_periods.pop(0) 
-    
-                if len(self.stride_periods) >= self.movmean_window_sz:
-                    self.stride_period_bertec = np.mean(self.stride_periods)
-                    
-                self.HS_time = time.time()
-                
+                self.heel_strike(now)
             else: # in this case we have a toe off, so compute stance time
-                self.TO_time = time.time()
-                time_diff = self.TO_time - self.HS_time
-                
-                # make sure stance period is appropriate before appending to averaging list:
-                if((0.8*self.stance_period) <= time_diff <= (1.20*self.stance_period)):
-                    self.time_diffs.append(time_diff)
-
-                # Moving average window:
-                if len(self.time_diffs) > self.movmean_window_sz:
-                    self.time_diffs.pop(0) 
-    
-                if len(self.time_diffs) >= self.movmean_window_sz:
-                    self.stance_period = np.mean(self.time_diffs)
+                self.toe_off(now)
         
         self.contact = newContact   # reset gait state to current gait state
                 
         return self.stance_period, newContact, self.time_in_current_stance, self.stride_period_bertec
-    
\ No newline at end of file
+
+    def heel_strike(self, now):
+        temp_stride_period_bertec = now - self.HS_time
+        
+        # make sure stride_period is appropriate before appending to averaging list:
+        if((0.8*self.stride_period_bertec) <= temp_stride_period_bertec <= (1.20*self.stride_period_bertec)):
+            self.stride_periods.append(temp_stride_period_bertec)
+        
+        # Moving average window:
+        if len(self.stride_periods) > self.movmean_window_sz:
+            self.stride_periods.pop(0) 
+
+        if len(self.stride_periods) >= self.movmean_window_sz:
+            self.stride_period_bertec = np.mean(self.stride_periods)
+            
+        self.HS_time = now
+
+    def toe_off(self, now):
+        self.TO_time = now
+        time_diff = self.TO_time - self.HS_time
+        
+        # make sure stance period is appropriate before appending to averaging list:
+        if((0.8*self.stance_period) <= time_diff <= (1.20*self.stance_period)):
+            self.time_diffs.append(time_diff)
+
+        # Moving average window:
+        if len(self.time_diffs) > self.movmean_window_sz:
+            self.time_diffs.pop(0) 
+
+        if len(self.time_diffs) >= self.movmean_window_sz:
+            self.stance_period = np.mean(self.time_diffs)
+
+    def update_many(self, forces, timestamps):
+        """
+        Offline equivalent of calling update(force, timestamp) on every sample, for replaying recorded force data.
+        Contact thresholding is vectorized; only the heel strike/toe off events run through the period averaging.
+
+        Args:
+            forces: vertical force samples (N)
+            timestamps: sample times (s)
+
+        Returns:
+            HS_indices, TO_indices (np.ndarray): sample indices of heel strikes and toe offs
+            stance_periods, contact, time_in_current_stance, stride_periods (np.ndarray): per-sample values update() would have returned
+        """
+        forces = np.asarray(forces, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=float)
+        n = len(forces)
+
+        contact = hysteresis(forces >= self.hs_threshold, forces < self.to_threshold, self.contact)
+        prev_contact = np.concatenate(([self.contact], contact[:-1]))
+        HS_indices = np.flatnonzero(contact & ~prev_contact)
+        TO_indices = np.flatnonzero(~contact & prev_contact)
+
+        # Period averaging only changes at events, run them in order and hold the results in between
+        is_event = np.zeros(n, dtype=bool)
+        is_event[HS_indices] = True
+        is_event[TO_indices] = True
+        initial_stance_period, initial_stride_period, initial_HS_time = self.stance_period, self.stride_period_bertec, self.HS_time
+        event_stance_periods = np.empty(n)
+        event_stride_periods = np.empty(n)
+        event_HS_times = np.empty(n)
+        for i in np.flatnonzero(is_event):
+            now = float(timestamps[i])
+            if contact[i]:
+                self.heel_strike(now)
+            else:
+                self.toe_off(now)
+            event_stance_periods[i] = self.stance_period
+            event_stride_periods[i] = self.stride_period_bertec
+            event_HS_times[i] = self.HS_time
+        stance_periods = hold_last(event_stance_periods, is_event, initial_stance_period)
+        stride_periods = hold_last(event_stride_periods, is_event, initial_stride_period)
+
+        # time in stance is updated on samples that start in contact and held otherwise
+        last_HS_time = hold_last(event_HS_times, is_event, initial_HS_time)
+        time_in_current_stance = hold_last(timestamps - last_HS_time, prev_contact, self.time_in_current_stance)
+
+        if n:
+            self.contact = bool(contact[-1])
+            self.time_in_current_stance = time_in_current_stance[-1]
+
+        return HS_indices, TO_indices, stance_periods, contact, time_in_current_stance, stride_periods
@@ -2,7 +2,7 @@ import time
 import numpy as np
 
 from config import HS_THRESHOLD, TO_THRESHOLD
-from utils import MovingAverageFilterPlus
+from utils import MovingAverageFilterPlus, hysteresis, hold_last
 
 class GroundContact: 
     def __init__(self):
@@ -10,59 +10,143 @@ class GroundContact:
         self.TO_time = time.time()
         self.HS_time = time.time()
         self.time_in_stride = 0
+        self.hs_threshold = HS_THRESHOLD
+        self.to_threshold = TO_THRESHOLD
 
         # Track stride/stance periods
         self.stance_period_filter = MovingAverageFilterPlus(cold_start=True, size=10)  # cold_start=True start with empty buffer
         self.stride_period_filter = MovingAverageFilterPlus(cold_start=True, size=10)
     
-    def update(self, force):
+    def update(self, force, timestamp=None):
+        """timestamp: time of the force sample (s, local clock). Defaults to the arrival time."""
+        now = time.time() if timestamp is None else timestamp
+
         # Swing to stance transisition
-        if force > HS_THRESHOLD and not self.inStance:
-            new_HS_time = time.time()
-            self.time_in_stride = 0
-            self.inStance = True
+        if force > self.hs_threshold and not self.inStance:
+            self.heel_strike(now)
 
-            self.HS_time = new_HS_time
+        # In stance
+        elif force > self.hs_threshold and self.inStance:
+            self.time_in_stride = now - self.HS_time
 
-            stride_period = self.TO_time - self.HS_time
-            prev_stride_average = self.stride_period_filter.trimmed_average() # Historical estimate
+        # Stance to swing transition
+        elif force < self.to_threshold and self.inStance:
+            self.toe_off(now)
 
-            # Add all periods if filter is cold (empty)
-            if not self.stride_period_filter.iswarm():
-                self.stride_period_filter.update(stride_period)
+        # In swing
+        else:
+            self.time_in_stride = -1.0
 
-            # Don't add period greater than +/-50% of previous stride period:
-            elif abs(stride_period - prev_stride_average) / prev_stride_average > 1.0:
-                self.stride_period_filter.update(stride_period)
+        return self.stance_period_filter.trimmed_average(), self.inStance, self.time_in_stride, self.stride_period_filter.trimmed_average()
 
-            self.HS_time = new_HS_time
+    def heel_strike(self, now):
+        new_HS_time = now
+        self.time_in_stride = 0
+        self.inStance = True
 
-        # In stance
-        elif force > HS_THRESHOLD and self.inStance:
-            self.time_in_stride = time.time() - self.HS_time
+        self.HS_time = new_HS_time
 
-        # Stance to swing transition
-        elif force < TO_THRESHOLD and self.inStance:
-            self.TO_time = time.time()
-            self.time_in_stride = -1.0
-            self.inStance = False
+        stride_period = self.TO_time - self.HS_time
+        prev_stride_average = self.stride_period_filter.trimmed_average() # Historical estimate
 
-            stance_period = self.TO_time - self.HS_time
-            prev_stance_average = self.stance_period_filter.trimmed_average() # Historical estimate
+        # Add all periods if filter is cold (empty)
+        if not self.stride_period_filter.iswarm():
+            self.stride_period_filter.update(stride_period)
 
-            # Add all periods if filter is cold (empty)
-            if not self.stride_period_filter.iswarm():
-                self.stride_period_filter.update(stance_period)
+        # Don't add period greater than +/-50% of previous stride period:
+        elif abs(stride_period - prev_stride_average) / prev_stride_average > 1.0:
+            self.stride_period_filter.update(stride_period)
 
-            # Don't add period greater than +/-50% of previous stride period:
-            elif abs(stance_period - prev_stance_average) / prev_stance_average > 1.0:
-                self.stance_period_filter.update(stance_period)
+        self.HS_time = new_HS_time
 
-        # In swing
-        else:
-            self.time_in_stride = -1.0
+    def toe_off(self, now):
+        self.TO_time = now
+        self.time_in_stride = -1.0
+        self.inStance = False
 
-        return self.stance_period_filter.trimmed_average(), self.inStance, self.time_in_stride, self.stride_period_filter.trimmed_average()
+        stance_period = self.TO_time - self.HS_time
+        prev_stance_average = self.stance_period_filter.trimmed_average() # Historical estimate
+
+        # Add all periods if filter is cold (empty)
+        if not self.stride_period_filter.iswarm():
+            self.stride_period_filter.update(stance_period)
+
+        # Don't add period greater than +/-50% of previous stride period:
+        elif abs(stance_period - prev_stance_average) / prev_stance_average > 1.0:
+            self.stance_period_filter.update(stance_period)
+
+    def update_many(self, forces, timestamps):
+        """
+        Offline equivalent of calling update(force, timestamp) on every sample, for replaying recorded force data.
+        Stance thresholding is vectorized; only the heel strike/toe off events run through the period filters.
+
+        Args:
+            forces: vertical force samples (N)
+            timestamps: sample times (s)
+
+        Returns:
+            HS_indices, TO_indices (np.ndarray): sample indices of heel strikes and toe offs
+            stance_periods, inStance, time_in_stride, stride_periods (np.ndarray): per-sample values update() would have returned
+        """
+        forces = np.asarray(forces, dtype=float)
+        timestamps = np.asarray(timestamps, dtype=float)
+        n = len(forces)
+        outputs = [np.empty(n), np.empty(n, dtype=bool), np.empty(n), np.empty(n)]
+        initial_inStance = self.inStance
+
+        # The period filters count trimmed_average() calls while cold, so run the first samples through update()
+        start = 0
+        while start < n and not (self.stance_period_filter.warm.mybool and self.stride_period_filter.warm.mybool):
+            for output, value in zip(outputs, self.update(float(forces[start]), float(timestamps[start]))):
+                output[start] = value
+            start += 1
+
+        forces = forces[start:]
+        timestamps = timestamps[start:]
+        prev_inStance = self.inStance
+        inStance = hysteresis(forces > self.hs_threshold, forces < self.to_threshold, prev_inStance)
+        was_inStance = np.concatenate(([prev_inStance], inStance[:-1]))
+        is_HS = inStance & ~was_inStance
+        is_TO = ~inStance & was_inStance
+
+        # Period filters only change at events, run them in order and hold the results in between
+        is_event = is_HS | is_TO
+        initial_stance_period = self.stance_period_filter.trimmed_average()
+        initial_stride_period = self.stride_period_filter.trimmed_average()
+        initial_HS_time = self.HS_time
+        event_stance_periods = np.empty(len(forces))
+        event_stride_periods = np.empty(len(forces))
+        event_HS_times = np.empty(len(forces))
+        for i in np.flatnonzero(is_event):
+            now = float(timestamps[i])
+            if inStance[i]:
+                self.heel_strike(now)
+            else:
+                self.toe_off(now)
+            event_stance_periods[i] = self.stance_period_filter.trimmed_average()
+            event_stride_periods[i] = self.stride_period_filter.trimmed_average()
+            event_HS_times[i] = self.HS_time
+        last_HS_time = hold_last(event_HS_times, is_event, initial_HS_time)
+
+        # 0 at heel strike, time since heel strike while above the heel strike threshold in stance, -1 otherwise
+        time_in_stride = np.where(was_inStance & (forces > self.hs_threshold), timestamps - last_HS_time, -1.0)
+        time_in_stride[is_HS] = 0
+
+        outputs[0][start:] = hold_last(event_stance_periods, is_event, initial_stance_period)
+        outputs[1][start:] = inStance
+        outputs[2][start:] = time_in_stride
+        outputs[3][start:] = hold_last(event_stride_periods, is_event, initial_stride_period)
+
+        if len(forces):
+            self.inStance = bool(inStance[-1])
+            self.time_in_stride = time_in_stride[-1]
+
+        stance_periods, inStance, time_in_stride, stride_periods = outputs
+        was_inStance = np.concatenate(([initial_inStance], inStance[:-1]))
+        HS_indices = np.flatnonzero(inStance & ~was_inStance)
+        TO_indices = np.flatnonzero(~inStance & was_inStance)
+
+        return HS_indices, TO_indices, stance_periods, inStance, time_in_stride, stride_periods
 
 
 # class GroundContact: 
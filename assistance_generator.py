@@ -9,6 +9,8 @@
 #
 # (4) Generates a biomimetic torque by scaling the biological ankle moment to the peak commanded torque
 #
+# (5) Generates torque using the four point spline method driven directly by continuous gait phase (% stride)
+#
 # Author: Nundini Rawal
 # Date: 06/14/2024
 
@@ -29,6 +31,8 @@ class AssistanceGenerator:
         self.bias_current = bias_current
         self.prev_commanded_rising = -1
         self.prev_commanded_falling = -1
+        self.prev_phase_spline_rising = None    # (peak torque, nodes) the phase splines were built for
+        self.prev_phase_spline_falling = None
         
         # Extract the biological ankle torque
         if config.in_torque_FSM_mode == False:
@@ -260,6 +264,57 @@ class AssistanceGenerator:
             
         return output_torque
     
+    def torque_generator_phase_MAIN(self, gait_phase:float, peak_torque:float=2, in_swing:bool=False)->float:
+        """Generate torque curve based on continuous gait phase (e.g. from the GSE adaptive oscillator), so the spline
+        timing follows speed changes within a stride instead of a moving-average stance period.
+        
+        args:
+            gait_phase: fraction of stride since heel strike [0, 1)
+            peak_torque: peak torque commanded by user via GUI
+            in_swing: boolean flag for swing phase
+        
+        returns:
+            torque: torque value at current gait phase
+        """
+        # with a unit stride period the spline nodes are in fractions of a stride
+        phase_nodes = self.convert_percent_thresholds_to_time(1.0)
+        phase_onset = phase_nodes[0]
+        phase_peak = phase_nodes[1]
+        phase_dropoff = phase_nodes[2]
+        
+        if peak_torque < self.holding_torque:
+            peak_torque = self.holding_torque
+               
+        if (in_swing):
+            output_torque = self.holding_torque
+        else:
+            if (gait_phase > phase_onset) and (gait_phase <= phase_peak):
+                # Only regen spline object when torque or timing is changed, otherwise just eval using same object
+                if self.prev_phase_spline_rising != (peak_torque, phase_onset, phase_peak):
+                    torques = [self.holding_torque, float(peak_torque)]
+                    self.phase_rising_spline = CubicSpline([phase_onset, phase_peak], torques, bc_type='clamped')
+                    self.prev_phase_spline_rising = (peak_torque, phase_onset, phase_peak)
+                    
+                output_torque = self.phase_rising_spline(gait_phase)
+
+            elif (gait_phase > phase_peak) and (gait_phase <= phase_dropoff):
+                if self.prev_phase_spline_falling != (peak_torque, phase_peak, phase_dropoff):
+                    torques = [float(peak_torque), self.holding_torque]
+                    self.phase_falling_spline = CubicSpline([phase_peak, phase_dropoff], torques, bc_type='clamped')
+                    self.prev_phase_spline_falling = (peak_torque, phase_peak, phase_dropoff)
+                
+                output_torque = self.phase_falling_spline(gait_phase)
+                
+            else:
+                # before onset or after dropoff
+                output_torque = self.holding_torque
+                
+            # Catch any instances of output torque being less than holding torque as a safety
+            if output_torque < self.holding_torque:
+                output_torque = self.holding_torque
+            
+        return output_torque
+    
     def biomimetic_torque_generator_MAIN(self, time_in_current_stride:float, stride_period:float, peak_torque:float, in_swing_flag:bool)->float:
         """Generate biomimetic torque for current % stride by scaling biological ankle moment. 
         Torque is held at holding torque when in_swing_flag is tripped, otherwise actuate according to scaled profile
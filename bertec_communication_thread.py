@@ -6,6 +6,7 @@ import sys
 import time
 sys.path.insert(0, '/home/pi/Exoboot-Controller-VAS/Bertec_Streaming')
 from ZMQ_PubSub import Subscriber 
+from clock_sync import ClockOffsetEstimator
 from GroundContact import GroundContact 
 import config
 
@@ -17,6 +18,9 @@ class Bertec(threading.Thread):
         self.sub_bertec_right = Subscriber(publisher_ip=config.Vicon_ip_address,topic_filter='fz_right',timeout_ms=5)
         self.sub_bertec_left = Subscriber(publisher_ip=config.Vicon_ip_address,topic_filter='fz_left',timeout_ms=5)
 
+        # Maps Vicon PC timestamps into the Pi clock so stance/stride periods don't pick up network jitter
+        self.clock_sync = ClockOffsetEstimator(publisher_ip=config.Vicon_ip_address, port=config.Vicon_clock_sync_port)
+
         self.right_stance_detector = GroundContact()            
         self.left_stance_detector = GroundContact()
         self.prev_z_right = 0
@@ -26,29 +30,61 @@ class Bertec(threading.Thread):
 
         self.period_tracker = MovingAverageFilter(size = 500)
         
+    def sample_times(self, frame_time, sample_period, n_samples):
+        """Pi-clock timestamps of the sub-samples in a frame (oldest first). None (arrival time) until the clocks are synced."""
+        if not self.clock_sync.is_synced():
+            return [None] * n_samples
+        newest = self.clock_sync.to_local(frame_time)
+        return [newest - sample_period * (n_samples - 1 - i) for i in range(n_samples)]
+
+    @staticmethod
+    def detector_state(detector):
+        """Same values GroundContact.update returns, as of the last sample it was given"""
+        return detector.stance_period, detector.contact, detector.time_in_current_stance, detector.stride_period_bertec
+
     def run(self):
         prev_end_time = time.time()
         while self.quit_event.is_set():
             try:
-                topic_right, z_forces_right, timestep_valid_right = self.sub_bertec_right.get_message()
-                topic_left, z_forces_left, timestep_valid_left = self.sub_bertec_left.get_message()
+                self.clock_sync.update()
+                config.bertec_clock_offset = self.clock_sync.offset
+                
+                # Each message carries every force plate sub-sample of one Vicon frame (oldest first)
+                topic_right, frame_time_right, sample_period_right, z_frame_right, timestep_valid_right = self.sub_bertec_right.get_frame()
+                topic_left, frame_time_left, sample_period_left, z_frame_left, timestep_valid_left = self.sub_bertec_left.get_frame()
 
                 # Catching empty messages from ZmQ Bertec Streaming
-                if z_forces_right == '':
-                    z_forces_right = self.prev_z_right  
+                # (no new frame: keep the previous force and leave the stance detectors as of the newest sample,
+                # the controller adds the sample's age when it looks ahead)
+                if z_frame_right:
+                    times_right = self.sample_times(frame_time_right, sample_period_right, len(z_frame_right))
+                    z_forces_right = z_frame_right[-1]
+                else:
+                    times_right = []
+                    z_forces_right = self.prev_z_right
+                if z_frame_left:
+                    times_left = self.sample_times(frame_time_left, sample_period_left, len(z_frame_left))
+                    z_forces_left = z_frame_left[-1]
                 else:
-                    z_forces_right = float(z_forces_right)
-                if z_forces_left == '':
-                    z_forces_left = self.prev_z_left 
-                else: 
-                    z_forces_left = float(z_forces_left)
+                    times_left = []
+                    z_forces_left = self.prev_z_left
+
+                # Pi-clock time of the newest force sample (used by the controller to measure the pipeline delay)
+                if timestep_valid_right and times_right:
+                    config.bertec_sample_time_right = time.time() if times_right[-1] is None else times_right[-1]
+                if timestep_valid_left and times_left:
+                    config.bertec_sample_time_left = time.time() if times_left[-1] is None else times_left[-1]
                 
                 config.z_forces_right = z_forces_right
                 config.z_forces_left = z_forces_left
                 
-                # Heel Strike + Toe-off Detection and stance time computation 
-                stance_time_right, HS_bool_right, time_in_current_stance_right, stride_period_bertec_right = self.right_stance_detector.update(z_forces_right)
-                stance_time_left, HS_bool_left, time_in_current_stance_left, stride_period_bertec_left = self.left_stance_detector.update(z_forces_left)
+                # Heel Strike + Toe-off Detection and stance time computation (run on every sub-sample so no crossing is missed)
+                for z, t in zip(z_frame_right, times_right):
+                    self.right_stance_detector.update(z, t)
+                for z, t in zip(z_frame_left, times_left):
+                    self.left_stance_detector.update(z, t)
+                stance_time_right, HS_bool_right, time_in_current_stance_right, stride_period_bertec_right = self.detector_state(self.right_stance_detector)
+                stance_time_left, HS_bool_left, time_in_current_stance_left, stride_period_bertec_left = self.detector_state(self.left_stance_detector)
                 
                 # Set config variables with stance times, time in current stance and stride time using Bertec data
                 config.stance_time_left = stance_time_left
@@ -59,6 +95,8 @@ class Bertec(threading.Thread):
                 config.time_in_current_stance_right = time_in_current_stance_right
                 config.HS_bool_right = HS_bool_right
                 config.HS_bool_left = HS_bool_left
+                config.bertec_HS_time_right = self.right_stance_detector.HS_time
+                config.bertec_HS_time_left = self.left_stance_detector.HS_time
                 
                 # right HS: 
                 if HS_bool_right:
@@ -0,0 +1,118 @@
+# Description:
+# Benchmarks the Pi-side Bertec pipeline against Bertec_Streaming/replay_forcedata.py on one machine.
+# Receives the replayed frames the same way bertec_communication_thread does and reports
+#   (1) receive latency (arrival time - sample time of the newest sub-sample in each frame)
+#   (2) ground contact accuracy: heel strike count and stride interval mean/std, for GroundContact fed
+#       source timestamps vs arrival timestamps, compared with the same recording processed offline.
+#
+# Usage (two terminals, same arguments for the recording and speed):
+#   python Bertec_Streaming/replay_forcedata.py <recording> --speed 2 --jitter 0.003
+#   python bertec_replay_benchmark.py <recording> --speed 2
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+thisdir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(thisdir, 'Bertec_Streaming'))
+
+from ZMQ_PubSub import Subscriber
+from clock_sync import ClockOffsetEstimator
+from replay_forcedata import load_recording, resample_uniform, filter_recording
+from GroundContact import GroundContact
+
+class HeelStrikeRecorder:
+    """Wraps a GroundContact and records the time of every heel strike it detects"""
+    def __init__(self):
+        self.detector = GroundContact()
+        self.HS_times = []
+
+    def update(self, force, timestamp=None):
+        was_in_contact = self.detector.contact
+        self.detector.update(force, timestamp)
+        if self.detector.contact and not was_in_contact:
+            self.HS_times.append(self.detector.HS_time)
+
+    def stride_intervals(self):
+        return np.diff(self.HS_times)
+
+def reference_heel_strikes(recording, speed, sample_period=None, filter_cutoff=None, filter_order=1):
+    """Heel strikes of the recording processed offline (no network), on the replayed time scale"""
+    t, fz_left, fz_right = load_recording(recording)
+    t, fz_left, fz_right, sample_period = resample_uniform(t, fz_left, fz_right, sample_period)
+    if filter_cutoff is not None:
+        fz_left, fz_right = filter_recording(fz_left, fz_right, sample_period, filter_cutoff, filter_order)
+    left, right = HeelStrikeRecorder(), HeelStrikeRecorder()
+    for t_i, f_left, f_right in zip(t / speed, fz_left, fz_right):
+        left.update(f_left, t_i)
+        right.update(f_right, t_i)
+    return left, right
+
+def print_latency(latencies):
+    latencies = 1000 * np.array(latencies)
+    print("Latency (ms): mean {:.2f}, p50 {:.2f}, p95 {:.2f}, p99 {:.2f}, max {:.2f}".format(
+        np.mean(latencies), *np.percentile(latencies, [50, 95, 99]), np.max(latencies)))
+
+def print_strides(name, recorder):
+    intervals = recorder.stride_intervals()
+    if len(intervals) == 0:
+        print("  {:<10} {:>4} heel strikes".format(name, len(recorder.HS_times)))
+        return
+    print("  {:<10} {:>4} heel strikes, stride interval mean {:.4f} s, std {:.2f} ms".format(
+        name, len(recorder.HS_times), np.mean(intervals), 1000 * np.std(intervals)))
+
+def run_benchmark(recording, speed, publisher_ip='localhost', sample_period=None, filter_cutoff=None, filter_order=1, idle_timeout=2.0):
+    sub_right = Subscriber(publisher_ip=publisher_ip, topic_filter='fz_right', timeout_ms=5)
+    sub_left = Subscriber(publisher_ip=publisher_ip, topic_filter='fz_left', timeout_ms=5)
+    clock_sync = ClockOffsetEstimator(publisher_ip=publisher_ip)
+
+    source = {'left': HeelStrikeRecorder(), 'right': HeelStrikeRecorder()}
+    arrival = {'left': HeelStrikeRecorder(), 'right': HeelStrikeRecorder()}
+    latencies = []
+    frames = 0
+
+    print("Waiting for replay...")
+    last_frame_time = None
+    while last_frame_time is None or time.time() - last_frame_time < idle_timeout:
+        clock_sync.update()
+        for side, sub in (('right', sub_right), ('left', sub_left)):
+            topic, frame_time, frame_sample_period, z_frame, received = sub.get_frame()
+            if not z_frame or not clock_sync.is_synced():
+                continue
+            arrival_time = time.time()
+            last_frame_time = arrival_time
+            frames += 1
+
+            newest = clock_sync.to_local(frame_time)
+            latencies.append(arrival_time - newest)
+            n = len(z_frame)
+            for i, z in enumerate(z_frame):
+                source[side].update(z, newest - frame_sample_period * (n - 1 - i))
+                arrival[side].update(z, arrival_time)
+
+    ref_left, ref_right = reference_heel_strikes(recording, speed, sample_period, filter_cutoff, filter_order)
+    reference = {'left': ref_left, 'right': ref_right}
+
+    print("\nFrames received: {}, clock offset {:.3f} ms (round trip {:.3f} ms)".format(
+        frames, 1000 * clock_sync.offset, 1000 * clock_sync.round_trip_delay))
+    print_latency(latencies)
+    for side in ('left', 'right'):
+        print("{}:".format(side.capitalize()))
+        print_strides('reference', reference[side])
+        print_strides('source ts', source[side])
+        print_strides('arrival ts', arrival[side])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the Bertec receive pipeline against replay_forcedata.py")
+    parser.add_argument('recording', help="the recording being replayed")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback speed used by the replay")
+    parser.add_argument('--sample-period', type=float, default=None, help="resampling period used by the replay (s)")
+    parser.add_argument('--filter-cutoff', type=float, default=None, help="filter cutoff used by the replay (Hz)")
+    parser.add_argument('--filter-order', type=int, default=1)
+    parser.add_argument('--publisher-ip', default='localhost')
+    args = parser.parse_args()
+
+    run_benchmark(args.recording, args.speed, args.publisher_ip, args.sample_period, args.filter_cutoff, args.filter_order)
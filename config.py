@@ -7,6 +7,7 @@ server_ip = f"{'35.3.134.250'}:" f"{'50051'}"   # IP address of the Controller (
 # client_ip = f"{'0.0.0.0'}:" f"{'50051'}"         # IP address of Tablet (or my laptop if debugging) running the GUI
 rtplot_ip = '35.3.80.31'    # ip address of server for real time ploting (monitor)
 Vicon_ip_address='141.212.77.30'    # Vicon ip to connect to Bertec Forceplates for streaming
+Vicon_clock_sync_port = "5557"      # port of the clock sync TimeServer running next to the Bertec publisher
 ##############################################################  
 
 # setting trial naming (components compiled into a full filename in GSE Thread)
@@ -19,11 +20,24 @@ GUI_commanded_torque: float = 0.0   # Current Torque Experienced (Nm)
 adjusted_slider_btn: str = 'nan'    # Adjusted Slider Btn
 adjusted_slider_value: float = 0.0  # Adjusted Slider Value($)
 confirm_btn_pressed: str = 'False'  # Confirm Button Pressed?
+gui_command_seq: int = 0            # Sequence number of the last typed (v2) GUI message
+gui_command_client_time: float = 0.0   # Tablet time of the last typed (v2) GUI message (s)
+gui_torque_seq: int = 0             # Controller count of GUI torque commands (GUI thread)
+gui_torque_applied = (0, 0.0)       # (gui_torque_seq, time.time()) of the first control tick that commanded that torque (ExoObject)
+gui_apply_timeout: float = 1.0      # Torque commands the control loop hasn't picked up within this time are acked as not applied (s)
+gui_server_stream_slots: int = 4    # Threads held by long-lived streams: CommandStream + StreamTelemetry, twice while a reconnecting tablet's old handlers finish
+gui_server_workers: int = gui_server_stream_slots + 4    # GUI gRPC server threads: the streams plus room for unary calls
+gui_server_max_rpcs: int = 4 * gui_server_workers       # RPCs beyond the free threads wait for one; only past this are they refused
+gui_message_handling_time: float = 0.0      # Mean time to handle a GUI message, last 100 messages (s)
+gui_message_handling_time_max: float = 0.0  # Max of the same window (s)
+gui_message_count: int = 0                  # GUI messages handled this session
 max_Vickrey_torque : float = 40.0   # Nm
 
 # TOGGLES:
 in_torque_FSM_mode: bool = True       # Toggle for 4pt FSM-based Torque Control or biomimetic Torque Control
 bertec_fp_streaming: bool = True      # Toggle for Bertec Forceplate Streaming or IMU-based Gait State Estimation
+phase_based_assistance: bool = False  # Toggle for driving the 4pt spline by continuous gait phase (once locked) instead of time in stance
+fused_heel_strike: bool = False       # Toggle for timing stance from the fused IMU + Bertec heel strike (first source wins, Bertec confirms)
 
 ## ~ Timing Parameters for the 4-Point Spline ~ ##
 
@@ -90,6 +104,10 @@ TO_THRESHOLD = 30
 state_time_left: float = 0.0
 temperature_left: float = 0.0
 
+# Exo sensor frame times: state_time mapped to the Pi's time.monotonic() clock (s), set by the GSE thread
+frame_time_left: float = 0.0
+frame_time_right: float = 0.0
+
 ankle_angle_left: float = 0.0
 ankle_angle_right: float = 0.0
 
@@ -151,6 +169,38 @@ time_in_current_stance_right: float = 0.0
 stance_time_left: float = 1.0
 stance_time_right: float = 1.0
 
+# Continuous gait phase (GSE adaptive oscillator)
+gait_phase_left: float = 0.0        # fraction of stride since heel strike
+gait_phase_right: float = 0.0
+gait_phase_rate_left: float = 0.0   # strides/s
+gait_phase_rate_right: float = 0.0
+gait_phase_locked_left: bool = False
+gait_phase_locked_right: bool = False
+
+# Rolling sensor history (sensor_history.SensorHistory per exo, created by the GSE thread)
+sensor_history_left = None
+sensor_history_right = None
+
+# Tablet telemetry (telemetry.TelemetrySnapshot created by the GSE thread, streamed by the GUI thread)
+telemetry = None
+telemetry_max_rate: float = 50.0    # Hz, upper limit on the frame rate a tablet can request
+
+# Savitzky-Golay derivatives of the sensor history (GSE thread)
+ankle_velocity_sg_left: float = 0.0     # deg/s
+ankle_velocity_sg_right: float = 0.0
+motor_velocity_sg_left: float = 0.0     # deg/s
+motor_velocity_sg_right: float = 0.0
+accel_y_jerk_left: float = 0.0          # g/s
+accel_y_jerk_right: float = 0.0
+
+# Torque tracking (ExoObject stride ensemble, updated after every stride)
+torque_rms_error_left: float = 0.0              # RMS desired - delivered torque over the last stride (Nm)
+torque_rms_error_right: float = 0.0
+torque_ensemble_rms_error_left: float = 0.0     # RMS difference of the ensemble mean curves since the last torque change (Nm)
+torque_ensemble_rms_error_right: float = 0.0
+peak_torque_measured_left: float = 0.0          # Peak delivered torque of the last stride (Nm)
+peak_torque_measured_right: float = 0.0
+
 # Four-point spline torque
 desired_spline_torque_left: float  = 0
 desired_spline_torque_right: float = 0
@@ -179,15 +229,35 @@ swing_val_bertec_right = 0
 stride_period_bertec_left = 0
 stride_period_bertec_right = 0
 
+bertec_clock_offset: float = 0.0    # Vicon PC clock - Pi clock (s)
+bertec_sample_time_left: float = 0.0    # Pi-clock time of the newest force sample processed (s)
+bertec_sample_time_right: float = 0.0
+
+# Latency compensation: spline evaluated at time_in_current_stance + measured pipeline delay
+max_lookahead: float = 0.0          # cap on the lookahead (s), 0 disables compensation (e.g. 0.06 once validated on hardware)
+actuation_delay: float = 0.005      # serial + motor current loop delay not covered by the measurement (s)
+pipeline_delay_left: float = 0.0    # measured force sample -> motor command delay, before the max_lookahead cap (s)
+pipeline_delay_right: float = 0.0
+bertec_HS_time_left: float = 0.0    # Pi-clock time of the latest Bertec heel strike (s)
+bertec_HS_time_right: float = 0.0
+
+# Fused IMU + Bertec heel strike (GSE thread)
+fused_HS_time_left: float = 0.0     # Pi-clock (time.time()) time of the latest fused heel strike (s)
+fused_HS_time_right: float = 0.0
+fused_in_swing_left: bool = True
+fused_in_swing_right: bool = True
+fused_swing_val_left: float = 100   # fused swing flag for the log, scaled like swing_val_left (100 swing, 10 stance)
+fused_swing_val_right: float = 100
+HS_latency_diff_left: float = 0.0   # latest IMU - Bertec heel strike time (s), negative when the IMU was first
+HS_latency_diff_right: float = 0.0
+
 time_in_current_stance_left = 0
 time_in_current_stance_right = 0
 
 # Thread Period Tracking
 vas_main_frequency: float = 400
-gui_communication_thread_frequency: float = 0
 gse_thread_frequency: float = 0
 bertec_thread_frequency: float = 0
 vas_main_period: float = 0
-gui_communication_thread_period: float = 0
 gse_thread_period: float = 0
 bertec_thread_period: float = 0 
@@ -0,0 +1,128 @@
+# Description:
+# Continuous gait phase estimation with an adaptive oscillator (Righetti/Ronsse style adaptive frequency oscillator
+# with a learned Fourier series of the input signal).
+# The oscillator locks onto a periodic gait signal (ankle angle) and corrects its phase and frequency on every sample,
+# so a change in walking speed is tracked within the stride instead of at the next heel strike.
+# Its phase is anchored to heel strike (0 % stride) with a running average of the oscillator phase at heel strikes.
+#
+# Each update is O(n_harmonics) with no history kept.
+
+import numpy as np
+
+TWO_PI = 2 * np.pi
+
+class AdaptiveOscillator:
+    """
+    Adaptive frequency oscillator that learns the frequency, phase and shape (Fourier series) of a periodic signal.
+
+    Args:
+        n_harmonics: harmonics in the learned signal model
+        initial_frequency: starting frequency guess (Hz)
+        nu_phase, nu_frequency: phase and frequency coupling gains
+        eta: learning rate of the Fourier coefficients
+        min_frequency, max_frequency: frequency limits (Hz)
+    """
+    def __init__(self, n_harmonics:int = 3, initial_frequency:float = 0.9, nu_phase:float = 10.0, nu_frequency:float = 10.0, eta:float = 2.0,
+                 min_frequency:float = 0.3, max_frequency:float = 2.0):
+        self.k = np.arange(1, n_harmonics + 1)
+        self.nu_phase = nu_phase
+        self.nu_frequency = nu_frequency
+        self.eta = eta
+        self.min_omega = TWO_PI * min_frequency
+        self.max_omega = TWO_PI * max_frequency
+
+        self.phase = 0.0                            # rad, wrapped to [0, 2pi)
+        self.omega = TWO_PI * initial_frequency     # rad/s
+        self.offset = 0.0                           # learned mean of the signal
+        self.cos_coeffs = np.zeros(n_harmonics)
+        self.sin_coeffs = np.zeros(n_harmonics)
+        self.initialized = False
+
+    def update(self, y:float, dt:float):
+        """
+        Folds in one sample of the periodic signal.
+
+        Args:
+            y: signal sample
+            dt: time since the previous sample (s)
+        Returns:
+            phase (rad), omega (rad/s)
+        """
+        if not self.initialized:
+            self.offset = y
+            self.initialized = True
+        if dt <= 0:
+            return self.phase, self.omega
+
+        cos_k = np.cos(self.k * self.phase)
+        sin_k = np.sin(self.k * self.phase)
+        estimate = self.offset + np.dot(self.cos_coeffs, cos_k) + np.dot(self.sin_coeffs, sin_k)
+        error = y - estimate
+
+        # couple through the fundamental, normalized by its amplitude so the gains don't depend on signal units
+        amplitude = max(np.hypot(self.cos_coeffs[0], self.sin_coeffs[0]), 1e-3)
+        coupling = error / amplitude * (self.sin_coeffs[0] * cos_k[0] - self.cos_coeffs[0] * sin_k[0]) / amplitude
+
+        self.phase = (self.phase + dt * (self.omega + self.nu_phase * coupling)) % TWO_PI
+        self.omega = min(max(self.omega + dt * self.nu_frequency * coupling, self.min_omega), self.max_omega)
+
+        self.offset += dt * self.eta * error
+        self.cos_coeffs += dt * self.eta * error * cos_k
+        self.sin_coeffs += dt * self.eta * error * sin_k
+
+        return self.phase, self.omega
+
+
+class GaitPhaseEstimator:
+    """
+    Gait phase (fraction of stride since heel strike) from an adaptive oscillator on ankle angle, anchored at heel strikes.
+
+    Args:
+        hs_gain: weight of each heel strike in the running average of the oscillator phase at heel strike
+        min_heel_strikes: heel strikes needed before the estimate is reported as locked
+        **oscillator_args: passed to AdaptiveOscillator
+    """
+    def __init__(self, hs_gain:float = 0.2, min_heel_strikes:int = 5, **oscillator_args):
+        self.oscillator = AdaptiveOscillator(**oscillator_args)
+        self.hs_gain = hs_gain
+        self.min_heel_strikes = min_heel_strikes
+
+        self.hs_phase = 0.0     # oscillator phase at heel strike (rad)
+        self.num_heel_strikes = 0
+        self.prev_time = None
+
+        self.phase = 0.0        # fraction of stride [0, 1)
+        self.phase_rate = 0.0   # strides/s
+
+    def is_locked(self) -> bool:
+        return self.num_heel_strikes >= self.min_heel_strikes
+
+    def update(self, ankle_angle:float, timestamp:float, heel_strike:bool = False):
+        """
+        Args:
+            ankle_angle: ankle angle sample (deg)
+            timestamp: sample time (s)
+            heel_strike: True on the sample a heel strike was detected
+        Returns:
+            phase (fraction of stride since heel strike), phase_rate (strides/s)
+        """
+        dt = 0.0 if self.prev_time is None else timestamp - self.prev_time
+        self.prev_time = timestamp
+        osc_phase, omega = self.oscillator.update(ankle_angle, dt)
+
+        if heel_strike:
+            if self.num_heel_strikes == 0:
+                self.hs_phase = osc_phase
+            else:
+                # circular running average
+                self.hs_phase = (self.hs_phase + self.hs_gain * self.wrap(osc_phase - self.hs_phase)) % TWO_PI
+            self.num_heel_strikes += 1
+
+        self.phase = ((osc_phase - self.hs_phase) % TWO_PI) / TWO_PI
+        self.phase_rate = omega / TWO_PI
+        return self.phase, self.phase_rate
+
+    @staticmethod
+    def wrap(angle):
+        """Wraps an angle to [-pi, pi)"""
+        return (angle + np.pi) % TWO_PI - np.pi
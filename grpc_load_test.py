@@ -0,0 +1,381 @@
+# Description:
+# Load test of the controller (CommunicationService) and auction gRPC services, using their generated stubs.
+# Client threads send a configurable mix of messages, as fast as possible or at a set rate each. They can
+# reconnect every N messages to mimic tablets dropping in and out. The test reports throughput and
+# latency percentiles per RPC.
+# Each service is loaded from its own worker process: the two protos can't share one process (both define a
+# top-level Null), and it keeps the clients' own Python work out of the measurements.
+# While it runs, the controller's vas_main_frequency is sampled through StreamTelemetry, before load (baseline)
+# and under load. This shows how much time the GUI server steals from the control loop (GIL included).
+#
+# By default both services run locally:
+#   - controller: a subprocess serving GUI_thread's CommunicationService next to a stand-in control loop
+#     (pure Python work every tick, period tracked like VAS_MAIN). It publishes vas_main_frequency as telemetry.
+#   - auction: GUIs/vickrey_auction_GUI/auctionhouse_aio.py in a subprocess, logging to a temporary directory
+# Point --controller / --auction at a real controller or auction house instead, or 'none' to skip one.
+#
+# Usage:
+#   python grpc_load_test.py [--duration 10] [--clients 4] [--rate 0] [--reconnect-every 0]
+#                            [--controller-mix slider=0.9,torque=0.08,confirm=0.02] [--message-version 2]
+#                            [--auction-mix call=0.45,question=0.45,treadmill=0.1]
+#                            [--controller local|ip:port|none] [--auction local|ip:port|none]
+
+import argparse
+import importlib
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import grpc
+
+thisdir = os.path.dirname(os.path.abspath(__file__))
+auctiondir = os.path.join(thisdir, 'GUIs', 'vickrey_auction_GUI')
+
+CHANNEL_OPTIONS = (('grpc.enable_http_proxy', 0), )
+LOCAL_CONTROLLER_PORT = 50052
+LOCAL_AUCTION_ADDRESS = 'localhost:50051'     # auctionhouse_aio serves on CLIENT_IP ([::]:50051)
+
+def import_stubs(service:str):
+    """Returns the (pb2, pb2_grpc) modules of 'controller' or 'auction'. Only one of them per process."""
+    if service == 'auction':
+        sys.path.append(auctiondir)
+        return importlib.import_module('auction_pb2'), importlib.import_module('auction_pb2_grpc')
+    return importlib.import_module('gui2controller2_pb2'), importlib.import_module('gui2controller2_pb2_grpc')
+
+def parse_mix(mix:str) -> dict:
+    """'a=0.9,b=0.1' -> {'a': 0.9, 'b': 0.1}, normalized to sum to 1"""
+    weights = {}
+    for item in mix.split(','):
+        name, weight = item.split('=')
+        weights[name.strip()] = float(weight)
+    total = sum(weights.values())
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class ControllerLoad:
+    # GUI -> controller messages, the same kinds of events the VAS GUI sends
+    def __init__(self, mix:dict, message_version:int = 2):
+        self.kinds = list(mix)
+        self.weights = list(mix.values())
+        self.message_version = message_version
+        pb2, pb2_grpc = import_stubs('controller')
+        self.stub_class = pb2_grpc.CommunicationServiceStub
+
+        from gui_message_benchmark import build_v1, build_v2
+        self.build_v1 = build_v1
+        self.build_v2 = build_v2
+
+    def next_call(self, stub, rng, seq, session):
+        """Returns (rpc name, callable sending one message)"""
+        kind = rng.choice(self.kinds, p=self.weights)
+        if kind == 'slider':
+            event = dict(slider_id=chr(65 + int(rng.integers(12))), slider_value=round(float(rng.uniform(-18.6, 3.4)), 2))
+        elif kind == 'torque':
+            event = dict(torque=round(float(rng.choice(np.arange(1, 13) * 40 / 12)), 3))
+        elif kind == 'confirm':
+            event = dict(confirm=True)
+        else:
+            raise ValueError("Unknown controller message kind: {}".format(kind))
+
+        if self.message_version == 1:
+            return 'GUI_Messenger', lambda **kwargs: stub.GUI_Messenger(self.build_v1(**event), **kwargs)
+        return 'GUI_Messenger_v2', lambda **kwargs: stub.GUI_Messenger_v2(self.build_v2(seq, session=session, **event), **kwargs)
+
+
+class AuctionLoad:
+    # Auction GUI -> auction house messages
+    def __init__(self, mix:dict):
+        self.kinds = list(mix)
+        self.weights = list(mix.values())
+        self.pb2, pb2_grpc = import_stubs('auction')
+        self.stub_class = pb2_grpc.auctionStub
+
+    def next_call(self, stub, rng, seq, session):
+        kind = rng.choice(self.kinds, p=self.weights)
+        if kind == 'call':
+            msg = self.pb2.result(t=seq, subject_bid=float(rng.uniform(0, 1)), user_win_flag=bool(rng.integers(2)),
+                                  current_payout=float(rng.uniform(0, 1)), total_winnings=float(seq))
+            return 'call', lambda **kwargs: stub.call(msg, **kwargs)
+        if kind == 'question':
+            msg = self.pb2.survey(t=seq, enjoyment=float(rng.integers(1, 8)), rpe=float(rng.integers(6, 21)))
+            return 'question', lambda **kwargs: stub.question(msg, **kwargs)
+        if kind == 'treadmill':
+            msg = self.pb2.treadmill(state=bool(rng.integers(2)))
+            return 'treadmill_message', lambda **kwargs: stub.treadmill_message(msg, **kwargs)
+        raise ValueError("Unknown auction message kind: {}".format(kind))
+
+
+class LoadClient(threading.Thread):
+    """
+    One client: its own channel, sending messages from load until stop_time (time.time()).
+
+    Args:
+        address: server address ("ip:port")
+        load: ControllerLoad or AuctionLoad
+        rate: messages per second (0: as fast as possible)
+        reconnect_every: open a new channel every this many messages (0: never)
+        timeout: deadline of each call (s)
+    """
+    def __init__(self, address:str, load, stop_time:float, rate:float = 0, reconnect_every:int = 0,
+                 timeout:float = 2.0, seed:int = 0, name='LoadClient'):
+        super().__init__(name=name, daemon=True)
+        self.address = address
+        self.load = load
+        self.stop_time = stop_time
+        self.rate = rate
+        self.reconnect_every = reconnect_every
+        self.timeout = timeout
+        self.rng = np.random.default_rng(seed)
+        self.session = random.getrandbits(63)   # like a GUI's GrpcSender: the controller dedupes seqs per session
+
+        self.latencies = defaultdict(list)     # rpc name -> latency of every successful call (s)
+        self.errors = defaultdict(int)         # (rpc name, status code) -> count
+        self.num_reconnects = 0
+
+    def run(self):
+        channel = grpc.insecure_channel(self.address, options=CHANNEL_OPTIONS)
+        stub = self.load.stub_class(channel)
+        next_time = time.perf_counter()
+        seq = 0
+        while time.time() < self.stop_time:
+            if self.reconnect_every and seq and seq % self.reconnect_every == 0:
+                channel.close()
+                channel = grpc.insecure_channel(self.address, options=CHANNEL_OPTIONS)
+                stub = self.load.stub_class(channel)
+                self.num_reconnects += 1
+
+            rpc, send = self.load.next_call(stub, self.rng, seq, self.session)
+            seq += 1
+            start = time.perf_counter()
+            try:
+                send(timeout=self.timeout, wait_for_ready=True)
+                self.latencies[rpc].append(time.perf_counter() - start)
+            except grpc.RpcError as e:
+                self.errors[(rpc, e.code().name)] += 1
+
+            if self.rate > 0:
+                next_time += 1 / self.rate
+                time.sleep(max(next_time - time.perf_counter(), 0))
+        channel.close()
+
+
+class FrequencySampler(threading.Thread):
+    # Samples the controller's vas_main_frequency from its telemetry stream
+    def __init__(self, address:str, rate:float = 10.0, name='FrequencySampler'):
+        super().__init__(name=name, daemon=True)
+        self.channel = grpc.insecure_channel(address, options=CHANNEL_OPTIONS)
+        self.pb2, pb2_grpc = import_stubs('controller')
+        self.stub = pb2_grpc.CommunicationServiceStub(self.channel)
+        self.rate = rate
+        self.samples = []       # (time.time(), vas_main_frequency)
+        self.stream = None
+
+    def run(self):
+        try:
+            self.stream = self.stub.StreamTelemetry(self.pb2.telemetry_request(rate=self.rate), wait_for_ready=True)
+            for frame in self.stream:
+                self.samples.append((time.time(), frame.vas_main_frequency))
+        except grpc.RpcError:
+            pass
+
+    def between(self, start:float, end:float) -> np.ndarray:
+        return np.array([freq for t, freq in self.samples if start <= t < end])
+
+    def stop(self):
+        if self.stream is not None:
+            self.stream.cancel()
+        self.channel.close()
+
+
+def serve_controller(port:int, loop_hz:float, loop_work:float) -> None:
+    """
+    Local stand-in controller: GUI_thread serving CommunicationService on port, next to a control loop that does
+    loop_work seconds of pure Python work every tick at up to loop_hz. Runs until stdin is closed.
+    """
+    import config
+    from GUICommunicationThread import GUI_thread
+    from telemetry import TelemetrySnapshot, TELEMETRY_FIELDS
+    from utils import MovingAverageFilter
+
+    config.server_ip = '[::]:{}'.format(port)
+    config.telemetry = TelemetrySnapshot()
+    quit_event = threading.Event()
+    quit_event.set()
+    gui_thread = GUI_thread(quit_event=quit_event)
+    gui_thread.start()
+
+    stdin_closed = threading.Event()
+    threading.Thread(target=lambda: (sys.stdin.read(), stdin_closed.set()), daemon=True).start()
+
+    # Same period tracking as VAS_MAIN
+    period_tracker = MovingAverageFilter(initial_value=1/loop_hz, size=300)
+    prev_end_time = time.time()
+    next_time = time.perf_counter()
+    while not stdin_closed.is_set():
+        work_end = time.perf_counter() + loop_work
+        x = 0.0
+        while time.perf_counter() < work_end:
+            x += 1.0
+        next_time = max(next_time + 1/loop_hz, time.perf_counter())
+        time.sleep(max(next_time - time.perf_counter(), 0))
+
+        end_time = time.time()
+        period_tracker.update(end_time - prev_end_time)
+        prev_end_time = end_time
+        config.vas_main_frequency = 1/period_tracker.average()
+
+        values = dict.fromkeys(TELEMETRY_FIELDS, 0.0)
+        values.update(controller_time=end_time, vas_main_frequency=config.vas_main_frequency,
+                      gui_message_handling_time=config.gui_message_handling_time)
+        config.telemetry.publish(tuple(values[field] for field in TELEMETRY_FIELDS))
+
+    quit_event.clear()
+    gui_thread.join()
+
+
+def wait_until_ready(address:str, timeout:float = 10.0) -> None:
+    with grpc.insecure_channel(address, options=CHANNEL_OPTIONS) as channel:
+        grpc.channel_ready_future(channel).result(timeout=timeout)
+
+
+def run_load_worker(service:str, address:str, args, start_at:float) -> dict:
+    """
+    Worker process: runs args.clients clients against one service from start_at (time.time()) for args.duration.
+
+    Returns:
+        latencies (rpc -> list of s), errors ([rpc, status code, count]), number of reconnects and clients, duration
+    """
+    if service == 'controller':
+        load = ControllerLoad(parse_mix(args.controller_mix), args.message_version)
+    else:
+        load = AuctionLoad(parse_mix(args.auction_mix))
+    clients = [LoadClient(address, load, start_at + args.duration, args.rate, args.reconnect_every, args.timeout, seed=i)
+               for i in range(args.clients)]
+
+    time.sleep(max(start_at - time.time(), 0))
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    duration = time.time() - start_at
+
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for client in clients:
+        for rpc, values in client.latencies.items():
+            latencies[rpc].extend(values)
+        for key, count in client.errors.items():
+            errors[key] += count
+    return {'latencies': latencies, 'errors': [[rpc, code, count] for (rpc, code), count in errors.items()],
+            'reconnects': sum(client.num_reconnects for client in clients), 'clients': len(clients), 'duration': duration}
+
+
+def report(title:str, result:dict) -> None:
+    print("{} ({} clients, {} reconnects)".format(title, result['clients'], result['reconnects']))
+    for rpc, values in sorted(result['latencies'].items()):
+        ms = np.array(values) * 1000
+        print("  {:<18} {:>7} ok {:>8.1f} msg/s | p50 {:7.2f}  p95 {:7.2f}  p99 {:7.2f}  max {:7.2f} ms".format(
+            rpc, len(ms), len(ms) / result['duration'], np.median(ms), np.percentile(ms, 95), np.percentile(ms, 99), ms.max()))
+    for rpc, code, count in sorted(result['errors']):
+        print("  {:<18} {:>7} failed ({})".format(rpc, count, code))
+
+
+def report_frequency(sampler:FrequencySampler, baseline:tuple, load:tuple) -> None:
+    print("Controller vas_main_frequency (Hz):")
+    for label, (start, end) in [('baseline', baseline), ('under load', load)]:
+        freq = sampler.between(start, end)
+        if len(freq):
+            print("  {:<11} median {:7.1f}  p5 {:7.1f}  min {:7.1f}  ({} samples)".format(
+                label, np.median(freq), np.percentile(freq, 5), freq.min(), len(freq)))
+        else:
+            print("  {:<11} no telemetry received".format(label))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the controller and auction gRPC services")
+    parser.add_argument('--duration', type=float, default=10.0, help="load duration (s)")
+    parser.add_argument('--baseline', type=float, default=3.0, help="controller frequency sampling before the load starts (s)")
+    parser.add_argument('--clients', type=int, default=4, help="concurrent clients per service")
+    parser.add_argument('--rate', type=float, default=0, help="messages per second per client (0: as fast as possible)")
+    parser.add_argument('--reconnect-every', type=int, default=0, help="each client reconnects every N messages (0: never)")
+    parser.add_argument('--timeout', type=float, default=2.0, help="deadline of each call (s)")
+    parser.add_argument('--controller', default='local', help="controller address, 'local' or 'none'")
+    parser.add_argument('--controller-mix', default='slider=0.9,torque=0.08,confirm=0.02', help="kind=weight,... of slider/torque/confirm")
+    parser.add_argument('--message-version', type=int, default=2, choices=[1, 2], help="GUI_Messenger (1) or GUI_Messenger_v2 (2)")
+    parser.add_argument('--auction', default='local', help="auction house address, 'local' or 'none'")
+    parser.add_argument('--auction-mix', default='call=0.45,question=0.45,treadmill=0.1', help="kind=weight,... of call/question/treadmill")
+    parser.add_argument('--loop-hz', type=float, default=400.0, help="local stand-in control loop rate")
+    parser.add_argument('--loop-work', type=float, default=0.0015, help="local stand-in control loop Python work per tick (s)")
+    # internal: subprocess roles
+    parser.add_argument('--serve-controller', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--load-worker', nargs=3, metavar=('SERVICE', 'ADDRESS', 'START_AT'), default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_controller is not None:
+        serve_controller(args.serve_controller, args.loop_hz, args.loop_work)
+        sys.exit()
+    if args.load_worker is not None:
+        service, address, start_at = args.load_worker
+        print(json.dumps(run_load_worker(service, address, args, float(start_at))))
+        sys.exit()
+
+    servers = []
+    try:
+        controller = args.controller
+        if controller == 'local':
+            servers.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve-controller', str(LOCAL_CONTROLLER_PORT),
+                                             '--loop-hz', str(args.loop_hz), '--loop-work', str(args.loop_work)],
+                                            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, cwd=thisdir))
+            controller = 'localhost:{}'.format(LOCAL_CONTROLLER_PORT)
+        auction = args.auction
+        if auction == 'local':
+            # auctionhouse_aio stops (and writes its logs) on Ctrl-C
+            logdir = tempfile.mkdtemp(prefix='grpc_load_test_')
+            print("Local auction house logs in", logdir)
+            server = subprocess.Popen([sys.executable, os.path.join(auctiondir, 'auctionhouse_aio.py')], stdin=subprocess.PIPE,
+                                      stdout=subprocess.DEVNULL, cwd=logdir, text=True)
+            server.stdin.write('loadtest\n')
+            server.stdin.flush()
+            servers.append(server)
+            auction = LOCAL_AUCTION_ADDRESS
+
+        targets = [(service, address) for service, address in [('controller', controller), ('auction', auction)] if address != 'none']
+        for service, address in targets:
+            wait_until_ready(address)
+
+        sampler = None
+        if controller != 'none':
+            sampler = FrequencySampler(controller)
+            sampler.start()
+        baseline_start = time.time()
+
+        # Workers start loading together, once they are up and the baseline is done
+        start_at = baseline_start + (args.baseline if sampler is not None else 0) + 1.0
+        workers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), *sys.argv[1:],
+                                     '--load-worker', service, address, repr(start_at)], stdout=subprocess.PIPE, cwd=thisdir, text=True)
+                   for service, address in targets]
+        results = [json.loads(worker.communicate()[0]) for worker in workers]
+        load_end = time.time()
+
+        for (service, address), result in zip(targets, results):
+            report("{} {}".format(service.capitalize(), address), result)
+        if sampler is not None:
+            sampler.stop()
+            report_frequency(sampler, (baseline_start, start_at - 1.0), (start_at, load_end))
+    finally:
+        for server in servers:
+            server.stdin.close()
+            if server.args[1].endswith('auctionhouse_aio.py'):
+                server.send_signal(signal.SIGINT)
+            try:
+                server.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                server.kill()
@@ -14,7 +14,7 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15gui2controller2.proto\"\x06\n\x04Null\"#\n\x0b\x64\x61ta_stream\x12\x14\n\x0clogging_data\x18\x01 \x03(\t2>\n\x14\x43ommunicationService\x12&\n\rGUI_Messenger\x12\x0c.data_stream\x1a\x05.Null\"\x00\x62\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x15gui2controller2.proto\"\x06\n\x04Null\"#\n\x0b\x64\x61ta_stream\x12\x14\n\x0clogging_data\x18\x01 \x03(\t\"\xd9\x01\n\x0bgui_command\x12\x13\n\x06torque\x18\x01 \x01(\x01H\x00\x88\x01\x01\x12\x16\n\tslider_id\x18\x02 \x01(\tH\x01\x88\x01\x01\x12\x19\n\x0cslider_value\x18\x03 \x01(\x01H\x02\x88\x01\x01\x12\x0f\n\x07\x63onfirm\x18\x04 \x01(\x08\x12\x13\n\x0b\x63lient_time\x18\x05 \x01(\x01\x12\x0b\n\x03seq\x18\x06 \x01(\x04\x12\x14\n\x0c\x63lock_offset\x18\x07 \x01(\x01\x12\x0f\n\x07session\x18\x08 \x01(\x04\x42\t\n\x07_torqueB\x0c\n\n_slider_idB\x0f\n\r_slider_value\"g\n\x0b\x63ommand_ack\x12\x0b\n\x03seq\x18\x01 \x01(\x04\x12\x0f\n\x07\x61pplied\x18\x02 \x01(\x08\x12\x14\n\x0creceive_time\x18\x03 \x01(\x01\x12\x12\n\napply_time\x18\x04 \x01(\x01\x12\x10\n\x08\x61\x63k_time\x18\x05 \x01(\x01\"!\n\x11telemetry_request\x12\x0c\n\x04rate\x18\x01 \x01(\x02\"\xf8\x02\n\x0ftelemetry_frame\x12\x0b\n\x03seq\x18\x01 \x01(\x04\x12\x17\n\x0f\x63ontroller_time\x18\x02 \x01(\x01\x12\x18\n\x10\x63ommanded_torque\x18\x03 \x01(\x01\x12\x18\n\x10peak_torque_left\x18\x04 \x01(\x01\x12\x19\n\x11peak_torque_right\x18\x05 \x01(\x01\x12\x1d\n\x15torque_rms_error_left\x18\x06 \x01(\x01\x12\x1e\n\x16torque_rms_error_right\x18\x07 \x01(\x01\x12\x18\n\x10temperature_left\x18\x08 \x01(\x01\x12\x19\n\x11temperature_right\x18\t \x01(\x01\x12\x1a\n\x12vas_main_frequency\x18\n \x01(\x01\x12\x1c\n\x14gse_thread_frequency\x18\x0b \x01(\x01\x12!\n\x19gui_message_handling_time\x18\x0c \x01(\x01\x12\x1f\n\x17\x62\x65rtec_thread_frequency\x18\r \x01(\x01\x32\xd9\x01\n\x14\x43ommunicationService\x12&\n\rGUI_Messenger\x12\x0c.data_stream\x1a\x05.Null\"\x00\x12)\n\x10GUI_Messenger_v2\x12\x0c.gui_command\x1a\x05.Null\"\x00\x12;\n\x0fStreamTelemetry\x12\x12.telemetry_request\x1a\x10.telemetry_frame\"\x00\x30\x01\x12\x31\n\rCommandStream\x12\x0c.gui_command\x1a\x0c.command_ack\"\x00(\x01\x30\x01\x62\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
@@ -25,6 +25,14 @@ if _descriptor._USE_C_DESCRIPTORS == False:
   _globals['_NULL']._serialized_end=31
   _globals['_DATA_STREAM']._serialized_start=33
   _globals['_DATA_STREAM']._serialized_end=68
-  _globals['_COMMUNICATIONSERVICE']._serialized_start=70
-  _globals['_COMMUNICATIONSERVICE']._serialized_end=132
+  _globals['_GUI_COMMAND']._serialized_start=71
+  _globals['_GUI_COMMAND']._serialized_end=288
+  _globals['_COMMAND_ACK']._serialized_start=290
+  _globals['_COMMAND_ACK']._serialized_end=393
+  _globals['_TELEMETRY_REQUEST']._serialized_start=395
+  _globals['_TELEMETRY_REQUEST']._serialized_end=428
+  _globals['_TELEMETRY_FRAME']._serialized_start=431
+  _globals['_TELEMETRY_FRAME']._serialized_end=807
+  _globals['_COMMUNICATIONSERVICE']._serialized_start=810
+  _globals['_COMMUNICATIONSERVICE']._serialized_end=1027
 # @@protoc_insertion_point(module_scope)
@@ -14,3 +14,73 @@ class data_stream(_message.Message):
     LOGGING_DATA_FIELD_NUMBER: _ClassVar[int]
     logging_data: _containers.RepeatedScalarFieldContainer[str]
     def __init__(self, logging_data: _Optional[_Iterable[str]] = ...) -> None: ...
+
+class gui_command(_message.Message):
+    __slots__ = ("torque", "slider_id", "slider_value", "confirm", "client_time", "seq", "clock_offset", "session")
+    TORQUE_FIELD_NUMBER: _ClassVar[int]
+    SLIDER_ID_FIELD_NUMBER: _ClassVar[int]
+    SLIDER_VALUE_FIELD_NUMBER: _ClassVar[int]
+    CONFIRM_FIELD_NUMBER: _ClassVar[int]
+    CLIENT_TIME_FIELD_NUMBER: _ClassVar[int]
+    SEQ_FIELD_NUMBER: _ClassVar[int]
+    CLOCK_OFFSET_FIELD_NUMBER: _ClassVar[int]
+    SESSION_FIELD_NUMBER: _ClassVar[int]
+    torque: float
+    slider_id: str
+    slider_value: float
+    confirm: bool
+    client_time: float
+    seq: int
+    clock_offset: float
+    session: int
+    def __init__(self, torque: _Optional[float] = ..., slider_id: _Optional[str] = ..., slider_value: _Optional[float] = ..., confirm: bool = ..., client_time: _Optional[float] = ..., seq: _Optional[int] = ..., clock_offset: _Optional[float] = ..., session: _Optional[int] = ...) -> None: ...
+
+class command_ack(_message.Message):
+    __slots__ = ("seq", "applied", "receive_time", "apply_time", "ack_time")
+    SEQ_FIELD_NUMBER: _ClassVar[int]
+    APPLIED_FIELD_NUMBER: _ClassVar[int]
+    RECEIVE_TIME_FIELD_NUMBER: _ClassVar[int]
+    APPLY_TIME_FIELD_NUMBER: _ClassVar[int]
+    ACK_TIME_FIELD_NUMBER: _ClassVar[int]
+    seq: int
+    applied: bool
+    receive_time: float
+    apply_time: float
+    ack_time: float
+    def __init__(self, seq: _Optional[int] = ..., applied: bool = ..., receive_time: _Optional[float] = ..., apply_time: _Optional[float] = ..., ack_time: _Optional[float] = ...) -> None: ...
+
+class telemetry_request(_message.Message):
+    __slots__ = ("rate",)
+    RATE_FIELD_NUMBER: _ClassVar[int]
+    rate: float
+    def __init__(self, rate: _Optional[float] = ...) -> None: ...
+
+class telemetry_frame(_message.Message):
+    __slots__ = ("seq", "controller_time", "commanded_torque", "peak_torque_left", "peak_torque_right", "torque_rms_error_left", "torque_rms_error_right", "temperature_left", "temperature_right", "vas_main_frequency", "gse_thread_frequency", "gui_message_handling_time", "bertec_thread_frequency")
+    SEQ_FIELD_NUMBER: _ClassVar[int]
+    CONTROLLER_TIME_FIELD_NUMBER: _ClassVar[int]
+    COMMANDED_TORQUE_FIELD_NUMBER: _ClassVar[int]
+    PEAK_TORQUE_LEFT_FIELD_NUMBER: _ClassVar[int]
+    PEAK_TORQUE_RIGHT_FIELD_NUMBER: _ClassVar[int]
+    TORQUE_RMS_ERROR_LEFT_FIELD_NUMBER: _ClassVar[int]
+    TORQUE_RMS_ERROR_RIGHT_FIELD_NUMBER: _ClassVar[int]
+    TEMPERATURE_LEFT_FIELD_NUMBER: _ClassVar[int]
+    TEMPERATURE_RIGHT_FIELD_NUMBER: _ClassVar[int]
+    VAS_MAIN_FREQUENCY_FIELD_NUMBER: _ClassVar[int]
+    GSE_THREAD_FREQUENCY_FIELD_NUMBER: _ClassVar[int]
+    GUI_MESSAGE_HANDLING_TIME_FIELD_NUMBER: _ClassVar[int]
+    BERTEC_THREAD_FREQUENCY_FIELD_NUMBER: _ClassVar[int]
+    seq: int
+    controller_time: float
+    commanded_torque: float
+    peak_torque_left: float
+    peak_torque_right: float
+    torque_rms_error_left: float
+    torque_rms_error_right: float
+    temperature_left: float
+    temperature_right: float
+    vas_main_frequency: float
+    gse_thread_frequency: float
+    gui_message_handling_time: float
+    bertec_thread_frequency: float
+    def __init__(self, seq: _Optional[int] = ..., controller_time: _Optional[float] = ..., commanded_torque: _Optional[float] = ..., peak_torque_left: _Optional[float] = ..., peak_torque_right: _Optional[float] = ..., torque_rms_error_left: _Optional[float] = ..., torque_rms_error_right: _Optional[float] = ..., temperature_left: _Optional[float] = ..., temperature_right: _Optional[float] = ..., vas_main_frequency: _Optional[float] = ..., gse_thread_frequency: _Optional[float] = ..., gui_message_handling_time: _Optional[float] = ..., bertec_thread_frequency: _Optional[float] = ...) -> None: ...
@@ -23,6 +23,21 @@ class CommunicationServiceStub(object):
                 request_serializer=gui2controller2__pb2.data_stream.SerializeToString,
                 response_deserializer=gui2controller2__pb2.Null.FromString,
                 )
+        self.GUI_Messenger_v2 = channel.unary_unary(
+                '/CommunicationService/GUI_Messenger_v2',
+                request_serializer=gui2controller2__pb2.gui_command.SerializeToString,
+                response_deserializer=gui2controller2__pb2.Null.FromString,
+                )
+        self.StreamTelemetry = channel.unary_stream(
+                '/CommunicationService/StreamTelemetry',
+                request_serializer=gui2controller2__pb2.telemetry_request.SerializeToString,
+                response_deserializer=gui2controller2__pb2.telemetry_frame.FromString,
+                )
+        self.CommandStream = channel.stream_stream(
+                '/CommunicationService/CommandStream',
+                request_serializer=gui2controller2__pb2.gui_command.SerializeToString,
+                response_deserializer=gui2controller2__pb2.command_ack.FromString,
+                )
 
 
 class CommunicationServiceServicer(object):
@@ -38,6 +53,24 @@ class CommunicationServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GUI_Messenger_v2(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def StreamTelemetry(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def CommandStream(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_CommunicationServiceServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -46,6 +79,21 @@ def add_CommunicationServiceServicer_to_server(servicer, server):
                     request_deserializer=gui2controller2__pb2.data_stream.FromString,
                     response_serializer=gui2controller2__pb2.Null.SerializeToString,
             ),
+            'GUI_Messenger_v2': grpc.unary_unary_rpc_method_handler(
+                    servicer.GUI_Messenger_v2,
+                    request_deserializer=gui2controller2__pb2.gui_command.FromString,
+                    response_serializer=gui2controller2__pb2.Null.SerializeToString,
+            ),
+            'StreamTelemetry': grpc.unary_stream_rpc_method_handler(
+                    servicer.StreamTelemetry,
+                    request_deserializer=gui2controller2__pb2.telemetry_request.FromString,
+                    response_serializer=gui2controller2__pb2.telemetry_frame.SerializeToString,
+            ),
+            'CommandStream': grpc.stream_stream_rpc_method_handler(
+                    servicer.CommandStream,
+                    request_deserializer=gui2controller2__pb2.gui_command.FromString,
+                    response_serializer=gui2controller2__pb2.command_ack.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'CommunicationService', rpc_method_handlers)
@@ -76,3 +124,54 @@ class CommunicationService(object):
             gui2controller2__pb2.Null.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def GUI_Messenger_v2(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/CommunicationService/GUI_Messenger_v2',
+            gui2controller2__pb2.gui_command.SerializeToString,
+            gui2controller2__pb2.Null.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def StreamTelemetry(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/CommunicationService/StreamTelemetry',
+            gui2controller2__pb2.telemetry_request.SerializeToString,
+            gui2controller2__pb2.telemetry_frame.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def CommandStream(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_stream(request_iterator, target, '/CommunicationService/CommandStream',
+            gui2controller2__pb2.gui_command.SerializeToString,
+            gui2controller2__pb2.command_ack.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
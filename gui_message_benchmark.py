@@ -0,0 +1,103 @@
+# Description:
+# Benchmark of the old (repeated string data_stream, GUI_Messenger) and typed (gui_command, GUI_Messenger_v2)
+# GUI -> controller messages.
+# For the same mix of GUI events it times, per message:
+#   - tablet side: building and serializing the message
+#   - controller side: parsing the bytes and running the GUI thread handler (config writes included)
+# and reports the serialized size. With --rpc it also times round trips through a local gRPC server.
+#
+# Usage: python gui_message_benchmark.py [--messages 20000] [--rpc]
+
+import argparse
+import time
+from concurrent import futures
+
+import numpy as np
+import grpc
+
+import gui2controller2_pb2
+import gui2controller2_pb2_grpc
+from GUICommunicationThread import GUI_thread
+
+def make_events(num_messages:int, seed:int = 0) -> list:
+    """Mix of GUI events like a VAS session: mostly slider updates, some torque buttons and confirms"""
+    rng = np.random.default_rng(seed)
+    events = []
+    for kind in rng.choice(['slider', 'torque', 'confirm'], size=num_messages, p=[0.9, 0.08, 0.02]):
+        if kind == 'slider':
+            events.append(dict(slider_id=chr(65 + int(rng.integers(12))), slider_value=round(float(rng.uniform(-18.6, 3.4)), 2)))
+        elif kind == 'torque':
+            events.append(dict(torque=round(float(rng.choice(np.arange(1, 13) * 40 / 12)), 3)))
+        else:
+            events.append(dict(confirm=True))
+    return events
+
+def build_v1(torque=None, slider_id=None, slider_value=None, confirm=False):
+    # same strings the GUI puts in logging_data
+    return gui2controller2_pb2.data_stream(logging_data=[str('nan') if torque is None else str(torque),
+                                                         str('nan') if slider_id is None else str(slider_id),
+                                                         str('nan') if slider_value is None else str(slider_value),
+                                                         str(confirm)])
+
+def build_v2(seq, torque=None, slider_id=None, slider_value=None, confirm=False, session=0):
+    # seq must be new within session: the controller applies each (session, seq) once
+    return gui2controller2_pb2.gui_command(torque=torque, slider_id=slider_id, slider_value=slider_value, confirm=confirm,
+                                           client_time=time.time(), seq=seq, session=session)
+
+def time_per_message(function, items) -> float:
+    """Runs function over items and returns the mean time per item (us)"""
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+def benchmark_local(events:list) -> dict:
+    service = GUI_thread.CommunicationService(None)
+    results = {}
+    for version, build, parse, handle in [
+            (1, lambda i: build_v1(**events[i]).SerializeToString(), gui2controller2_pb2.data_stream.FromString, service.GUI_Messenger),
+            (2, lambda i: build_v2(i, **events[i]).SerializeToString(), gui2controller2_pb2.gui_command.FromString, service.GUI_Messenger_v2)]:
+        payloads = [build(i) for i in range(len(events))]
+        results[version] = {
+            'build + serialize (us)': time_per_message(build, range(len(events))),
+            'parse + handle (us)': time_per_message(lambda payload: handle(parse(payload), None), payloads),
+            'size (bytes)': np.mean([len(payload) for payload in payloads]),
+        }
+    return results
+
+def benchmark_rpc(events:list, address:str = '127.0.0.1:50099') -> dict:
+    server = grpc.server(futures.ThreadPoolExecutor(max_workers=1))
+    gui2controller2_pb2_grpc.add_CommunicationServiceServicer_to_server(GUI_thread.CommunicationService(None), server)
+    server.add_insecure_port(address)
+    server.start()
+
+    results = {}
+    with grpc.insecure_channel(address, options=(('grpc.enable_http_proxy', 0), )) as channel:
+        stub = gui2controller2_pb2_grpc.CommunicationServiceStub(channel)
+        grpc.channel_ready_future(channel).result(timeout=5)
+        for version, call in [(1, lambda i: stub.GUI_Messenger(build_v1(**events[i]))),
+                              (2, lambda i: stub.GUI_Messenger_v2(build_v2(i, **events[i])))]:
+            rtt = np.zeros(len(events))
+            for i in range(len(events)):
+                start = time.perf_counter()
+                call(i)
+                rtt[i] = time.perf_counter() - start
+            results[version] = {'rtt mean (us)': rtt.mean() * 1e6, 'rtt p95 (us)': np.percentile(rtt, 95) * 1e6}
+    server.stop(0)
+    return results
+
+def print_results(title:str, results:dict) -> None:
+    print(title)
+    for metric in results[1]:
+        print("  {:<24} v1 {:>9.2f}   v2 {:>9.2f}".format(metric, results[1][metric], results[2][metric]))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the old and typed GUI -> controller messages")
+    parser.add_argument('--messages', type=int, default=20000, help="GUI events per message version")
+    parser.add_argument('--rpc', action='store_true', help="also time round trips through a local gRPC server")
+    args = parser.parse_args()
+
+    events = make_events(args.messages)
+    print_results("Serialization and handling ({} messages):".format(args.messages), benchmark_local(events))
+    if args.rpc:
+        print_results("Local RPC round trip:", benchmark_rpc(events[:min(args.messages, 2000)]))
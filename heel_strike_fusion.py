@@ -0,0 +1,114 @@
+# Description:
+# Fuses the IMU (accel jerk) and Bertec force plate heel strike detectors.
+# Heel strike fires on whichever source sees it first. The IMU is usually first (no Vicon/network delay), so an IMU
+# heel strike starts stance immediately and waits for the force plate to confirm it within confirm_window.
+# A confirmed stance starts at the earlier of the two heel strikes (the IMU can fire a little after initial contact).
+# Unconfirmed IMU heel strikes are rejected and stance is reverted. Toe off comes from the force plate.
+# Every stride detected by both sources logs the IMU - Bertec heel strike time difference.
+#
+# Without force plate data (bertec_contact=None) it falls back to the IMU alone, with toe off from the IMU swing flag.
+
+from utils import MovingAverageFilter
+
+class FusedHeelStrikeDetector:
+    """
+    Args:
+        confirm_window: max time between the IMU and Bertec heel strikes of the same stride (s)
+        confirm_timeout: time after an IMU heel strike to wait for the force plate (covers its streaming delay) before rejecting (s)
+    """
+    def __init__(self, confirm_window:float = 0.15, confirm_timeout:float = 0.25):
+        self.confirm_window = confirm_window
+        self.confirm_timeout = confirm_timeout
+
+        self.in_stance = False
+        self.HS_time = 0.0
+        self.prev_HS_time = 0.0
+        self.source = 'none'              # source that fired the current stance: 'imu' or 'bertec'
+        self.awaiting_bertec = False      # IMU fired, waiting for force plate confirmation
+        self.awaiting_imu = False         # force plate fired first, waiting for the IMU for the latency log
+        self.prev_bertec_contact = False
+
+        # IMU heel strike time - Bertec heel strike time, per stride (negative: IMU first)
+        self.latency_diff = 0.0
+        self.latency_diff_filter = MovingAverageFilter(initial_value=0, size=20)
+        self.num_confirmed = 0
+        self.num_rejected = 0
+
+    def update(self, now:float, imu_HS:bool, imu_swing:bool = False, bertec_contact:bool = None, bertec_HS_time:float = None):
+        """
+        Call once per GSE tick. All times on the same clock.
+
+        Args:
+            now: time of this tick (time of the IMU sample)
+            imu_HS: IMU heel strike detected this tick
+            imu_swing: IMU swing flag (toe off when running without force plates)
+            bertec_contact: force plate contact state, None when force plates aren't streaming
+            bertec_HS_time: time of the latest force plate heel strike
+        Returns:
+            in_stance, HS_time
+        """
+        if bertec_contact is None:
+            return self.update_imu_only(now, imu_HS, imu_swing)
+
+        bertec_HS = bertec_contact and not self.prev_bertec_contact
+        bertec_TO = self.prev_bertec_contact and not bertec_contact
+        self.prev_bertec_contact = bertec_contact
+
+        if imu_HS:
+            if self.awaiting_imu and now - self.HS_time <= self.confirm_window:
+                # force plate was first
+                self.log_latency_diff(now - self.HS_time)
+                self.awaiting_imu = False
+            elif not self.in_stance:
+                self.start_stance(now, 'imu')
+                self.awaiting_bertec = True
+
+        if bertec_HS:
+            if self.awaiting_bertec and abs(self.HS_time - bertec_HS_time) <= self.confirm_window:
+                # IMU fired first, force plate confirms it. Stance starts at whichever saw the contact earlier
+                self.log_latency_diff(self.HS_time - bertec_HS_time)
+                self.HS_time = min(self.HS_time, bertec_HS_time)
+                self.awaiting_bertec = False
+                self.num_confirmed += 1
+            else:
+                if self.awaiting_bertec:
+                    self.reject()
+                self.start_stance(bertec_HS_time, 'bertec')
+                self.awaiting_imu = True
+
+        if bertec_TO:
+            if self.awaiting_bertec:
+                # IMU fired while the foot was still loaded from the previous stance
+                self.reject()
+            self.in_stance = False
+
+        if self.awaiting_bertec and now - self.HS_time > self.confirm_timeout:
+            self.reject()
+        if self.awaiting_imu and now - self.HS_time > self.confirm_window:
+            self.awaiting_imu = False   # IMU missed this stride, nothing to compare
+
+        return self.in_stance, self.HS_time
+
+    def update_imu_only(self, now, imu_HS, imu_swing):
+        if imu_HS:
+            self.start_stance(now, 'imu')
+        elif imu_swing:
+            self.in_stance = False
+        return self.in_stance, self.HS_time
+
+    def start_stance(self, HS_time, source):
+        self.prev_HS_time = self.HS_time
+        self.HS_time = HS_time
+        self.source = source
+        self.in_stance = True
+
+    def reject(self):
+        """Reverts an IMU heel strike the force plate didn't confirm"""
+        self.HS_time = self.prev_HS_time
+        self.in_stance = False
+        self.awaiting_bertec = False
+        self.num_rejected += 1
+
+    def log_latency_diff(self, latency_diff):
+        self.latency_diff = latency_diff
+        self.latency_diff_filter.update(latency_diff)
@@ -0,0 +1,54 @@
+# Description:
+# Real-time Savitzky-Golay smoothing and differentiation over the shared sensor history (sensor_history.SensorHistory).
+# Fits a polynomial to the last window frames of every channel and evaluates it (and its derivatives) at the newest frame,
+# so there is no lag beyond the sensor history itself.
+# The coefficient table is computed once; each tick is a single (derivatives x window) @ (window x channels) product.
+#
+# Requires scipy
+
+import numpy as np
+from scipy.signal import savgol_coeffs
+
+class SavitzkyGolayFilter:
+    """
+    Args:
+        history: SensorHistory to read from
+        window: frames in the fit (odd or even, > order)
+        order: polynomial order
+        max_deriv: highest derivative computed (1: velocity/jerk, 2: acceleration)
+    """
+    def __init__(self, history, window:int = 15, order:int = 2, max_deriv:int = 1):
+        if window <= order:
+            raise ValueError("window ({}) must be larger than order ({})".format(window, order))
+        self.history = history
+        self.window = window
+        self.order = order
+        self.max_deriv = max_deriv
+
+        # row d: d-th derivative at the newest frame, per unit sample spacing (scaled by 1/dt**d each tick)
+        self.coeffs = np.array([savgol_coeffs(window, order, deriv=d, pos=window - 1, use='dot') for d in range(max_deriv + 1)])
+        self.deriv_orders = np.arange(max_deriv + 1)
+
+        # latest results: row d is the d-th derivative of every history channel
+        self.values = np.zeros((max_deriv + 1, len(history.channels)))
+
+    def update(self) -> np.ndarray:
+        """Recomputes all channels from the newest window of the history. Call once per tick after the history is pushed."""
+        if self.history.available() < self.window:
+            return self.values
+
+        times = self.history.window_times(self.window)
+        dt = (times[-1] - times[0]) / (self.window - 1)
+        if dt <= 0:
+            return self.values
+
+        np.dot(self.coeffs, self.history.window(self.window).T, out=self.values)
+        self.values /= (dt ** self.deriv_orders)[:, None]
+        return self.values
+
+    def smoothed(self, channel:str) -> float:
+        return self.values[0, self.history.index[channel]]
+
+    def derivative(self, channel:str, deriv:int = 1) -> float:
+        """deriv-th time derivative of a channel (per second): velocity for angles, jerk for accelerations"""
+        return self.values[deriv, self.history.index[channel]]
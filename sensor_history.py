@@ -0,0 +1,74 @@
+# Description:
+# Shared rolling history of exo sensor frames.
+# The GSE thread pushes every sensor frame; estimators, derivative filters and diagnostics read the last N samples
+# as NumPy views (no copying, no per-tick allocation).
+#
+# Storage is preallocated and every sample is written twice, at pntr and pntr + size, so the last n samples are
+# always one contiguous slice. A window view keeps showing the same samples for the next size - n pushes, so a
+# reader on another thread sees a consistent window as long as it finishes within that many GSE ticks.
+
+import numpy as np
+
+# Channels recorded for each exo, in storage order
+SENSOR_CHANNELS = ['ankle_angle', 'ankle_velocity', 'accel_x', 'accel_y', 'accel_z', 'gyro_x', 'gyro_y', 'gyro_z',
+                   'motor_angle', 'motor_velocity', 'motor_current', 'act_ank_torque']
+
+class SensorHistory:
+    """
+    Preallocated per-channel ring buffer of sensor frames.
+
+    Args:
+        channels: channel names, in the order values are pushed
+        size: number of frames kept (e.g. seconds * GSE frequency)
+    """
+    def __init__(self, channels:list = SENSOR_CHANNELS, size:int = 3000):
+        self.channels = list(channels)
+        self.index = {name: i for i, name in enumerate(self.channels)}
+        self.size = size
+
+        self.data = np.zeros((len(self.channels), 2 * size))
+        self.times = np.zeros(2 * size)
+        self.pntr = 0           # slot of the next frame
+        self.count = 0          # frames pushed so far
+
+    def push(self, timestamp:float, values) -> None:
+        """Adds one frame. values are in channel order."""
+        self.data[:, self.pntr] = values
+        self.data[:, self.pntr + self.size] = values
+        self.times[self.pntr] = timestamp
+        self.times[self.pntr + self.size] = timestamp
+        self.pntr = (self.pntr + 1) % self.size
+        self.count += 1
+
+    def available(self) -> int:
+        """Number of valid frames (up to size)"""
+        return min(self.count, self.size)
+
+    def window_slice(self, n:int) -> slice:
+        """Storage columns of the last n frames (oldest first)"""
+        if not 0 < n <= self.size:
+            raise ValueError("window of {} frames doesn't fit in a history of {}".format(n, self.size))
+        end = self.pntr + self.size
+        return slice(end - n, end)
+
+    def window(self, n:int, channel:str = None) -> np.ndarray:
+        """
+        View of the last n frames, oldest first. Frames before the first push read as 0.
+
+        Args:
+            n: number of frames
+            channel: channel name, or None for all channels
+        Returns:
+            (n,) view of one channel, or (channels, n) view of all channels
+        """
+        columns = self.window_slice(n)
+        if channel is None:
+            return self.data[:, columns]
+        return self.data[self.index[channel], columns]
+
+    def window_times(self, n:int) -> np.ndarray:
+        """View of the timestamps of the last n frames, oldest first"""
+        return self.times[self.window_slice(n)]
+
+    def latest(self, channel:str) -> float:
+        return self.data[self.index[channel], self.pntr + self.size - 1]
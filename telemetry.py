@@ -0,0 +1,28 @@
+# Description:
+# Latest-value telemetry snapshot for the tablet (StreamTelemetry RPC).
+# The GSE thread publishes one snapshot per tick: a tuple of TELEMETRY_FIELDS swapped in with a single assignment,
+# so publishing never waits on readers. Each telemetry stream reads the latest snapshot at its own (client chosen) rate,
+# so slow or stalled tablet clients never reach the control or GSE loops.
+
+# Snapshot fields, in order (same names as the telemetry_frame message fields)
+TELEMETRY_FIELDS = ['controller_time', 'commanded_torque', 'peak_torque_left', 'peak_torque_right',
+                    'torque_rms_error_left', 'torque_rms_error_right', 'temperature_left', 'temperature_right',
+                    'vas_main_frequency', 'gse_thread_frequency', 'gui_message_handling_time', 'bertec_thread_frequency']
+
+class TelemetrySnapshot:
+    def __init__(self):
+        self.snapshot = (0, None)       # (seq, values in TELEMETRY_FIELDS order); replaced as a whole on publish
+
+    def publish(self, values:tuple) -> None:
+        """Replaces the snapshot. values are in TELEMETRY_FIELDS order. Call from one thread only."""
+        self.snapshot = (self.snapshot[0] + 1, values)
+
+    def latest(self):
+        """
+        Returns:
+            seq (0 before the first publish), dict of the latest values (None before the first publish)
+        """
+        seq, values = self.snapshot
+        if values is None:
+            return seq, None
+        return seq, dict(zip(TELEMETRY_FIELDS, values))
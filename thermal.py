@@ -4,8 +4,9 @@
 
 # Taken from OSL Library
 
-from typing import Any, Callable, List, Optional
+from typing import Any, Callable, List, Optional, Tuple
 import numpy as np
+from scipy.linalg import expm
 
 
 class ThermalModel:
@@ -162,4 +163,141 @@ class ThermalModel:
         if scale >= 1.0:
             return 1.0
 
-        return np.sqrt(scale)  # this is how much the torque should be scaled
\ No newline at end of file
+        return np.sqrt(scale)  # this is how much the torque should be scaled
+
+
+class ThermalBatchSimulator:
+    """
+    Simulates the ThermalModel winding/case dynamics for many motor current profiles at once, e.g. every VAS torque
+    level over a whole session, to predict thermal headroom before running a protocol.
+
+    Uses the exact (zero-order hold) discretization instead of forward Euler, so accuracy doesn't depend on dt.
+    The temperature-dependent resistance I^2 R_0 (1 + α (T_w - T_0)) is linear in T_w, so for a current held over
+    a step the dynamics are linear:
+        d[T_w, T_c]/dt = A(I) [T_w, T_c] + u(I)
+        A(I) = [[(I^2 R_0 α - 1/R_WC)/C_w,  1/(R_WC C_w)],
+                [1/(R_WC C_c),             -(1/R_WC + 1/R_CA)/C_c]]
+        u(I) = [I^2 R_0 (1 - α T_0)/C_w,  T_a/(R_CA C_c)]
+    Each step is therefore x_k+1 = A_d x_k + b_d, with [[A_d, b_d], [0, 1]] = expm([[A, u], [0, 0]] dt).
+    The resistance is re-evaluated continuously within each step, not just at its start.
+    A_d and b_d are computed once per distinct current (profiles are quantized to current_resolution).
+
+    Torque scaling near the limits (update_and_get_scale) is not applied: results are the unlimited temperatures.
+
+    Args:
+        model (ThermalModel): parameters and ambient temperature to simulate. Defaults to ThermalModel().
+        dt (float): Time step of the current profiles in seconds. Defaults to 1/200.
+        current_resolution (float): Currents are rounded to this many mA. Defaults to 1.
+    """
+
+    def __init__(
+        self,
+        model: Optional[ThermalModel] = None,
+        dt: float = 1 / 200,
+        current_resolution: float = 1.0,
+    ) -> None:
+        self.model = model if model is not None else ThermalModel()
+        self.dt = dt
+        self.current_resolution = current_resolution
+
+    def step_maps(self, motor_current: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact one-step maps for currents held over dt.
+
+        Args:
+            motor_current (np.ndarray): Motor currents in mA, any shape.
+
+        Returns:
+            A_d (shape + (2, 2)) and b_d (shape + (2,)), such that [T_w, T_c] -> A_d [T_w, T_c] + b_d
+        """
+        m = self.model
+        I2 = (np.asarray(motor_current, dtype=float) * 1e-3) ** 2
+        M = np.zeros(I2.shape + (3, 3))
+        M[..., 0, 0] = (I2 * m.R_ϕ_0 * m.α - 1 / m.R_WC) / m.C_w
+        M[..., 0, 1] = 1 / (m.R_WC * m.C_w)
+        M[..., 1, 0] = 1 / (m.R_WC * m.C_c)
+        M[..., 1, 1] = -(1 / m.R_WC + 1 / m.R_CA) / m.C_c
+        M[..., 0, 2] = I2 * m.R_ϕ_0 * (1 - m.α * m.R_T_0) / m.C_w
+        M[..., 1, 2] = m.T_a / (m.R_CA * m.C_c)
+        E = expm(M.reshape(-1, 3, 3) * self.dt).reshape(M.shape)
+        return E[..., :2, :2], E[..., :2, 2]
+
+    def unique_step_maps(self, motor_currents: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Returns:
+            index of each current's map (same shape as motor_currents), A_d and b_d of each distinct current
+        """
+        quantized = np.round(np.asarray(motor_currents, dtype=float) / self.current_resolution)
+        levels, index = np.unique(quantized, return_inverse=True)
+        A_d, b_d = self.step_maps(levels * self.current_resolution)
+        return index.reshape(quantized.shape), A_d, b_d
+
+    def initial_state(self, num_profiles: int, T_w0=None, T_c0=None) -> np.ndarray:
+        x = np.empty((num_profiles, 2))
+        x[:, 0] = self.model.T_w if T_w0 is None else T_w0
+        x[:, 1] = self.model.T_c if T_c0 is None else T_c0
+        return x
+
+    def simulate(self, motor_currents: np.ndarray, T_w0=None, T_c0=None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Simulates every profile step by step.
+
+        Args:
+            motor_currents (np.ndarray): (profiles, steps) motor currents in mA, each held for dt.
+            T_w0, T_c0 (float or np.ndarray): Initial winding/case temperatures in Celsius, per profile or shared.
+                Default to the model's T_w/T_c.
+
+        Returns:
+            T_w and T_c, each (profiles, steps + 1): the temperatures before the first step and after every step
+        """
+        motor_currents = np.atleast_2d(motor_currents)
+        num_profiles, num_steps = motor_currents.shape
+        index, A_d, b_d = self.unique_step_maps(motor_currents)
+
+        x = np.empty((num_steps + 1, num_profiles, 2))
+        x[0] = self.initial_state(num_profiles, T_w0, T_c0)
+        for k in range(num_steps):
+            i = index[:, k]
+            x[k + 1] = np.einsum('pij,pj->pi', A_d[i], x[k]) + b_d[i]
+        return x[:, :, 0].T, x[:, :, 1].T
+
+    def cycle_map(self, cycle_currents: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Composes the step maps of one repeating cycle (e.g. one stride) per profile.
+
+        Returns:
+            A_c (profiles, 2, 2) and b_c (profiles, 2) mapping the state at the start of a cycle to the state at its end
+        """
+        cycle_currents = np.atleast_2d(cycle_currents)
+        num_profiles, num_steps = cycle_currents.shape
+        index, A_d, b_d = self.unique_step_maps(cycle_currents)
+
+        A_c = np.broadcast_to(np.eye(2), (num_profiles, 2, 2)).copy()
+        b_c = np.zeros((num_profiles, 2))
+        for k in range(num_steps):
+            i = index[:, k]
+            A_c = A_d[i] @ A_c
+            b_c = np.einsum('pij,pj->pi', A_d[i], b_c) + b_d[i]
+        return A_c, b_c
+
+    def simulate_periodic(
+        self, cycle_currents: np.ndarray, num_cycles: int, T_w0=None, T_c0=None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Simulates each profile repeating one cycle num_cycles times, one composed map per cycle.
+        Use simulate() on a single cycle from any returned state for the ripple within that cycle.
+
+        Args:
+            cycle_currents (np.ndarray): (profiles, steps per cycle) motor currents in mA, each held for dt.
+            num_cycles (int): Number of cycles.
+            T_w0, T_c0 (float or np.ndarray): Initial winding/case temperatures in Celsius, per profile or shared.
+
+        Returns:
+            T_w and T_c, each (profiles, num_cycles + 1): the temperatures at the start of every cycle and at the end
+        """
+        A_c, b_c = self.cycle_map(cycle_currents)
+        x = np.empty((num_cycles + 1, len(A_c), 2))
+        x[0] = self.initial_state(len(A_c), T_w0, T_c0)
+        for n in range(num_cycles):
+            x[n + 1] = np.einsum('pij,pj->pi', A_c, x[n]) + b_c
+        return x[:, :, 0].T, x[:, :, 1].T
@@ -0,0 +1,86 @@
+# Description:
+# Predicts motor thermal headroom for a VAS protocol before running it.
+# Builds one stride of commanded motor current for every VAS torque level, using the same 4-point stance spline
+# as the controller (AssistanceGenerator with config.spline_timing_params) and a nominal transmission ratio.
+# Then it simulates every level over the session with thermal.ThermalBatchSimulator. Starting from ambient,
+# it reports the peak winding and case temperatures after each session length and the margin to ExoObject's limits.
+#
+# Usage: python thermal_headroom.py [--sessions 5,10,20,30] [--max-torque 40] [--levels 12]
+#                                   [--stride-period 1.12] [--stance-period 0.65] [--transmission-ratio 15]
+
+import argparse
+
+import numpy as np
+
+import config
+from assistance_generator import AssistanceGenerator
+from thermal import ThermalModel, ThermalBatchSimulator
+
+# ExoObject motor constants and limits
+EFFICIENCY = 0.9
+KT = 0.000146                   # N-m/mA
+MAX_WINDING_TEMPERATURE = 115   # C
+MAX_CASE_TEMPERATURE = 80       # C
+
+def stride_currents(peak_torques, stride_period:float, stance_period:float, transmission_ratio:float, dt:float) -> np.ndarray:
+    """
+    Commanded motor current over one stride for each peak torque, as the torque FSM would command it.
+
+    Returns:
+        (len(peak_torques), steps per stride) currents in mA
+    """
+    generator = AssistanceGenerator()
+    generator.t_rise, generator.t_peak, generator.t_fall, generator.t_toe_off, generator.holding_torque = config.spline_timing_params
+
+    t = np.arange(0, stride_period, dt)
+    torques = np.array([[generator.torque_generator_stance_MAIN(time_in_stance, stride_period, stance_period, peak_torque,
+                                                                 in_swing=time_in_stance > stance_period)
+                         for time_in_stance in t]
+                        for peak_torque in peak_torques])
+    currents = torques / (transmission_ratio * EFFICIENCY * KT)
+    return np.minimum(currents, config.MAX_ALLOWABLE_CURRENT)
+
+def predict_headroom(peak_torques, session_minutes, stride_period:float, stance_period:float, transmission_ratio:float,
+                     dt:float = 1 / 200, ambient:float = 21):
+    """
+    Returns:
+        peak winding and case temperatures over the last stride of each session, each (torques, sessions)
+    """
+    simulator = ThermalBatchSimulator(ThermalModel(ambient=ambient), dt=dt)
+    currents = stride_currents(peak_torques, stride_period, stance_period, transmission_ratio, dt)
+
+    session_strides = [int(round(minutes * 60 / (currents.shape[1] * dt))) for minutes in session_minutes]
+    T_w, T_c = simulator.simulate_periodic(currents, max(session_strides))
+
+    # Ripple within the last stride of each session, for all torques and sessions at once
+    last_stride = [stride - 1 for stride in session_strides]
+    T_w_start = T_w[:, last_stride].ravel()
+    T_c_start = T_c[:, last_stride].ravel()
+    T_w_stride, T_c_stride = simulator.simulate(np.repeat(currents, len(session_minutes), axis=0), T_w_start, T_c_start)
+    shape = (len(peak_torques), len(session_minutes))
+    return T_w_stride.max(axis=1).reshape(shape), T_c_stride.max(axis=1).reshape(shape)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Predict winding/case temperatures for every VAS torque level")
+    parser.add_argument('--sessions', default='5,10,20,30', help="session lengths (minutes of continuous walking)")
+    parser.add_argument('--max-torque', type=float, default=40.0, help="highest VAS torque (Nm), as in the VAS GUI config")
+    parser.add_argument('--levels', type=int, default=12, help="number of VAS torque levels, evenly spaced up to --max-torque")
+    parser.add_argument('--stride-period', type=float, default=1.12, help="s")
+    parser.add_argument('--stance-period', type=float, default=0.65, help="s")
+    parser.add_argument('--transmission-ratio', type=float, default=15.0, help="nominal transmission ratio over stance")
+    parser.add_argument('--ambient', type=float, default=21.0, help="C")
+    args = parser.parse_args()
+
+    session_minutes = [float(minutes) for minutes in args.sessions.split(',')]
+    peak_torques = np.arange(1, args.levels + 1) * args.max_torque / args.levels
+    T_w, T_c = predict_headroom(peak_torques, session_minutes, args.stride_period, args.stance_period,
+                                args.transmission_ratio, ambient=args.ambient)
+
+    print("Peak winding / case temperature (C) and winding headroom to {} C".format(MAX_WINDING_TEMPERATURE))
+    print("torque (Nm) " + "".join("{:>22}".format("{:g} min".format(minutes)) for minutes in session_minutes))
+    for i, torque in enumerate(peak_torques):
+        print("{:>11.2f} ".format(torque) + "".join(
+            "{:>8.1f} /{:>5.1f} ({:>+6.1f})".format(T_w[i, j], T_c[i, j], MAX_WINDING_TEMPERATURE - T_w[i, j])
+            for j in range(len(session_minutes))))
+    if (T_c >= MAX_CASE_TEMPERATURE).any():
+        print("Case temperature reaches {} C for some torques/sessions".format(MAX_CASE_TEMPERATURE))
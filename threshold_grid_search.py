@@ -0,0 +1,185 @@
+# Description:
+# Offline tuning tool for the heel strike / toe off thresholds.
+# Sweeps grids of the Bertec HS/TO force thresholds (config.HS_THRESHOLD / TO_THRESHOLD) and the IMU heel strike
+# jerk threshold (Gait_State_Estimator.gait_estimator, 1.2 g with a 0.45 s lockout) over recorded GSE logs, and scores
+# every setting on
+#   (1) disagreement between the Bertec and IMU heel strikes (1 - F1 score, Bertec as reference, heel strikes matched within a tolerance)
+#   (2) stride period instability (median absolute deviation / median of the stride intervals, averaged over both streams)
+# then prints the Pareto front of the two.
+#
+# The Bertec and IMU detections don't depend on each other's thresholds, so each file runs every (HS, TO) pair
+# through GroundContact.update_many and every jerk threshold through the IMU detector once, and only the cheap
+# matching step runs for every combination. Files are spread over a process pool.
+#
+# Usage:
+#   python threshold_grid_search.py Experimental_Logs/*.csv --workers 8 --output grid_results.csv
+
+import argparse
+import csv
+import itertools
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from GroundContact import GroundContact
+
+SIDES = ('left', 'right')
+
+def load_session(filename):
+    """
+    Loads the columns needed for heel strike detection from a GSE log (Experimental_Logs/*.csv).
+
+    Returns:
+        dict of side -> (state_time, accel_y, bertec force) arrays
+    """
+    with open(filename, 'r') as f:
+        reader = csv.reader(f, quotechar='|')
+        header = next(reader)
+        columns = [header.index(name) for side in SIDES for name in ('state_time_' + side, 'accel_y_' + side, 'all_bertec_' + side)]
+        data = np.array([[row[i] for i in columns] for row in reader if row], dtype=float)
+
+    session = {}
+    for k, side in enumerate(SIDES):
+        t, accel_y, force = data[:, 3*k], data[:, 3*k + 1], data[:, 3*k + 2]
+        session[side] = (t - t[0], accel_y, force)
+    return session
+
+def imu_heel_strikes(t, accel_y, jerk_threshold=1.2, lockout=0.45):
+    """
+    Heel strike times of Gait_State_Estimator.gait_estimator run over a recording:
+    a sample to sample change in vertical acceleration >= jerk_threshold (g), at least lockout (s) after the previous heel strike.
+    """
+    jerk = np.abs(np.diff(accel_y, prepend=0.0))
+    candidates = t[jerk >= jerk_threshold]
+
+    # lockout only applies between candidates, which are sparse
+    HS_times = []
+    prev_time = -np.inf
+    for candidate in candidates:
+        if candidate - prev_time >= lockout:
+            HS_times.append(candidate)
+            prev_time = candidate
+    return np.array(HS_times)
+
+def bertec_heel_strikes(t, force, hs_threshold, to_threshold):
+    """Heel strike times of GroundContact run over a recording with the given thresholds (N)"""
+    detector = GroundContact()
+    detector.hs_threshold = hs_threshold
+    detector.to_threshold = to_threshold
+    detector.HS_time = detector.TO_time = t[0]
+    HS_indices = detector.update_many(force, t)[0]
+    return t[HS_indices]
+
+def count_matches(HS_times_a, HS_times_b, tolerance):
+    """Number of heel strikes in a with a heel strike in b within tolerance (s)"""
+    if len(HS_times_a) == 0 or len(HS_times_b) == 0:
+        return 0
+    after = np.minimum(np.searchsorted(HS_times_b, HS_times_a), len(HS_times_b) - 1)
+    before = np.maximum(after - 1, 0)
+    distance = np.minimum(np.abs(HS_times_a - HS_times_b[before]), np.abs(HS_times_a - HS_times_b[after]))
+    return int(np.count_nonzero(distance <= tolerance))
+
+def stride_instability(HS_times):
+    """Median absolute deviation / median of the stride intervals (robust to missed or extra heel strikes)"""
+    if len(HS_times) < 3:
+        return np.nan
+    intervals = np.diff(HS_times)
+    median = np.median(intervals)
+    return np.median(np.abs(intervals - median)) / median
+
+def score_session(args):
+    """
+    Process pool worker: runs every grid setting over one file.
+
+    Returns:
+        filename, and for every (hs, to, jerk) setting:
+            [bertec HS count, imu HS count, bertec HS matched by imu, imu HS matched by bertec, stride instability] summed over sides (instability averaged)
+    """
+    filename, force_grid, jerk_grid, tolerance, lockout = args
+    session = load_session(filename)
+
+    results = {}
+    for side in SIDES:
+        t, accel_y, force = session[side]
+        bertec = {thresholds: bertec_heel_strikes(t, force, *thresholds) for thresholds in force_grid}
+        imu = {jerk: imu_heel_strikes(t, accel_y, jerk, lockout) for jerk in jerk_grid}
+        bertec_instability = {thresholds: stride_instability(HS_times) for thresholds, HS_times in bertec.items()}
+        imu_instability = {jerk: stride_instability(HS_times) for jerk, HS_times in imu.items()}
+
+        for thresholds, jerk in itertools.product(force_grid, jerk_grid):
+            counts = results.setdefault(thresholds + (jerk,), np.zeros(5))
+            counts += [len(bertec[thresholds]), len(imu[jerk]),
+                       count_matches(bertec[thresholds], imu[jerk], tolerance), count_matches(imu[jerk], bertec[thresholds], tolerance),
+                       (bertec_instability[thresholds] + imu_instability[jerk]) / (2 * len(SIDES))]
+    return filename, results
+
+def pareto_front(points):
+    """Indices of the points (rows, lower is better in every column) not dominated by any other point"""
+    front = []
+    for i, point in enumerate(points):
+        dominated = np.any(np.all(points <= point, axis=1) & np.any(points < point, axis=1))
+        if not dominated:
+            front.append(i)
+    return front
+
+def run_grid_search(filenames, hs_grid, to_grid, jerk_grid, tolerance=0.15, lockout=0.45, workers=None):
+    force_grid = [(hs, to) for hs in hs_grid for to in to_grid if to < hs]
+    jobs = [(filename, force_grid, jerk_grid, tolerance, lockout) for filename in filenames]
+
+    totals = {}
+    instabilities = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for filename, results in executor.map(score_session, jobs):
+            print("  scored {}".format(os.path.basename(filename)))
+            for setting, counts in results.items():
+                totals[setting] = totals.get(setting, 0) + counts[:4]
+                instabilities.setdefault(setting, []).append(counts[4])
+
+    settings = list(totals)
+    rows = []
+    for setting in settings:
+        n_bertec, n_imu, bertec_matched, imu_matched = totals[setting]
+        recall = bertec_matched / n_bertec if n_bertec > 0 else 0.0
+        precision = imu_matched / n_imu if n_imu > 0 else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+        instability = np.inf if np.all(np.isnan(instabilities[setting])) else np.nanmean(instabilities[setting])
+        rows.append(setting + (n_bertec, n_imu, bertec_matched, 1 - f1, instability))
+    return rows
+
+def print_front(rows):
+    points = np.array([[row[-2], row[-1]] for row in rows])
+    front = sorted(pareto_front(points), key=lambda i: rows[i][-2])
+    print("\nPareto front ({} of {} settings):".format(len(front), len(rows)))
+    print("  {:>6} {:>6} {:>6} {:>8} {:>8} {:>8} {:>13} {:>12}".format('HS (N)', 'TO (N)', 'jerk', 'bertec', 'imu', 'matched', 'disagreement', 'instability'))
+    for i in front:
+        hs, to, jerk, n_bertec, n_imu, n_matched, disagreement, instability = rows[i]
+        print("  {:>6.0f} {:>6.0f} {:>6.2f} {:>8.0f} {:>8.0f} {:>8.0f} {:>13.4f} {:>12.4f}".format(hs, to, jerk, n_bertec, n_imu, n_matched, disagreement, instability))
+
+def save_results(filename, rows):
+    with open(filename, 'w') as f:
+        writer = csv.writer(f, lineterminator='\n')
+        writer.writerow(['hs_threshold', 'to_threshold', 'jerk_threshold', 'bertec_HS', 'imu_HS', 'matched_HS', 'disagreement', 'stride_instability'])
+        writer.writerows(rows)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Grid search over heel strike/toe off thresholds on recorded GSE logs")
+    parser.add_argument('logs', nargs='+', help="GSE logs (Experimental_Logs/*.csv)")
+    parser.add_argument('--hs', type=float, nargs=3, default=[40, 150, 10], metavar=('START', 'STOP', 'STEP'), help="Bertec heel strike thresholds (N)")
+    parser.add_argument('--to', type=float, nargs=3, default=[10, 70, 5], metavar=('START', 'STOP', 'STEP'), help="Bertec toe off thresholds (N)")
+    parser.add_argument('--jerk', type=float, nargs=3, default=[0.6, 2.05, 0.1], metavar=('START', 'STOP', 'STEP'), help="IMU heel strike thresholds (g)")
+    parser.add_argument('--lockout', type=float, default=0.45, help="IMU heel strike lockout (s)")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="max Bertec/IMU heel strike separation counted as agreement (s)")
+    parser.add_argument('--workers', type=int, default=None, help="process pool size (defaults to the number of CPUs)")
+    parser.add_argument('--output', default=None, help="csv file for the scores of every setting")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    print("Scoring {} files...".format(len(args.logs)))
+    rows = run_grid_search(args.logs, np.arange(*args.hs), np.arange(*args.to), np.round(np.arange(*args.jerk), 3),
+                           tolerance=args.tolerance, lockout=args.lockout, workers=args.workers)
+    print_front(rows)
+    if args.output is not None:
+        save_results(args.output, rows)
+    print("\nDone in {:.1f} s".format(time.time() - start_time))
@@ -0,0 +1,109 @@
+# Description:
+# Online stride-normalized ensemble averages of desired vs delivered ankle torque.
+# Samples are binned by percent stance (101 bins) as they arrive. When a stance ends, the stride's per-bin averages
+# are folded into running (Welford) mean and variance per bin, and the stride and ensemble RMS tracking errors are updated.
+# Per-sample cost is O(1); the per-stride fold is one vectorized pass over the bins.
+# Call reset() when the commanded torque changes so strides at different torques aren't averaged together.
+
+import numpy as np
+
+class StrideEnsemble:
+    """
+    Args:
+        n_bins: percent stance bins (101: 0, 1, ..., 100 %)
+    """
+    def __init__(self, n_bins:int = 101):
+        self.n_bins = n_bins
+
+        # current stride (per-bin sums)
+        self.stride_desired = np.zeros(n_bins)
+        self.stride_measured = np.zeros(n_bins)
+        self.stride_count = np.zeros(n_bins)
+
+        self.reset()
+
+    def reset(self):
+        """Clears the ensemble (e.g. after a commanded torque change). The stride in progress is dropped too."""
+        self.num_strides = 0
+        self.bin_strides = np.zeros(self.n_bins)        # strides contributing to each bin
+        self.mean_desired = np.zeros(self.n_bins)
+        self.mean_measured = np.zeros(self.n_bins)
+        self.m2_desired = np.zeros(self.n_bins)
+        self.m2_measured = np.zeros(self.n_bins)
+        self.stride_rms_error = 0.0                     # RMS tracking error of the last complete stride (all its samples)
+        self.ensemble_rms_error = 0.0                   # RMS difference of the ensemble mean curves
+        self.peak_measured = 0.0                        # peak delivered torque of the last complete stride
+        self.clear_stride()
+
+    def clear_stride(self):
+        self.stride_desired[:] = 0
+        self.stride_measured[:] = 0
+        self.stride_count[:] = 0
+        self.stride_sq_error = 0.0
+        self.stride_samples = 0
+        self.stride_peak_measured = -np.inf
+        self.prev_bin = -1
+
+    def update(self, percent_stance:float, desired:float, measured:float, in_swing:bool) -> bool:
+        """
+        Adds one control tick.
+
+        Args:
+            percent_stance: time in stance / stance period * 100
+            desired, measured: desired and delivered torque (Nm)
+            in_swing: swing flag; the stride is folded in at the first swing tick or when percent stance wraps to a new stance
+        Returns:
+            True if a stride was just folded into the ensemble
+        """
+        if in_swing:
+            return self.end_stride()
+
+        b = int(round(min(max(percent_stance, 0), 100) * (self.n_bins - 1) / 100))
+        stride_done = False
+        if b < self.prev_bin:
+            # new heel strike without a swing tick in between
+            stride_done = self.end_stride()
+        self.prev_bin = b
+
+        self.stride_desired[b] += desired
+        self.stride_measured[b] += measured
+        self.stride_count[b] += 1
+        self.stride_sq_error += (measured - desired) ** 2
+        self.stride_samples += 1
+        if measured > self.stride_peak_measured:
+            self.stride_peak_measured = measured
+        return stride_done
+
+    def end_stride(self) -> bool:
+        if self.stride_samples == 0:
+            return False
+
+        # fold this stride's bin averages into the running mean/variance of each bin it covered
+        hit = self.stride_count > 0
+        desired = self.stride_desired[hit] / self.stride_count[hit]
+        measured = self.stride_measured[hit] / self.stride_count[hit]
+        self.bin_strides[hit] += 1
+        n = self.bin_strides[hit]
+
+        delta = desired - self.mean_desired[hit]
+        self.mean_desired[hit] += delta / n
+        self.m2_desired[hit] += delta * (desired - self.mean_desired[hit])
+
+        delta = measured - self.mean_measured[hit]
+        self.mean_measured[hit] += delta / n
+        self.m2_measured[hit] += delta * (measured - self.mean_measured[hit])
+
+        self.num_strides += 1
+        self.stride_rms_error = np.sqrt(self.stride_sq_error / self.stride_samples)
+        self.peak_measured = self.stride_peak_measured
+        covered = self.bin_strides > 0
+        self.ensemble_rms_error = np.sqrt(np.mean((self.mean_measured[covered] - self.mean_desired[covered]) ** 2))
+
+        self.clear_stride()
+        return True
+
+    def variance_desired(self) -> np.ndarray:
+        return np.where(self.bin_strides > 1, self.m2_desired / np.maximum(self.bin_strides - 1, 1), 0.0)
+
+    def variance_measured(self) -> np.ndarray:
+        return np.where(self.bin_strides > 1, self.m2_measured / np.maximum(self.bin_strides - 1, 1), 0.0)
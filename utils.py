@@ -1,19 +1,140 @@
+import time
+from math import isfinite
+from bisect import bisect_left, insort
+from collections import deque
+import numpy as np
+
+
+class WindowStats:
+    # Running statistics over every slot of a fixed-size circular buffer
+    # max/min are O(1) per update (amortized), median is a bisect into a sorted copy
+    # total() is sum(buffer) itself, recomputed at most once per update, so averages built on it are bitwise identical
+    # to summing the buffer (a running sum drifts from it by a few ulp, enough to flip threshold comparisons)
+    # variance uses running sums (ulp-level differences from numpy), re-summed once per wrap so error can't build up
+    # Non-finite values (NaN, inf) are only counted, never added to the running sums, sorted copy or deques:
+    # max/min/variance/median are NaN while one is in the window (total() is whatever sum(buffer) gives),
+    # and exact again once it has been overwritten
+    def __init__(self, initial_values):
+        self.size = len(initial_values)
+        self.count = 0  # number of values written so far
+        self.buffer = initial_values    # the caller's buffer, updated in place
+        self.buffer_sum = None          # sum(buffer) since the last update, None until needed
+
+        # Monotonic deques of (write index, value); the initial values get indices -size..-1
+        self.max_deque = deque()
+        self.min_deque = deque()
+        for i, val in enumerate(initial_values):
+            if isfinite(val):
+                self._push(i - self.size, val)
+
+        self.sorted_values = sorted(val for val in initial_values if isfinite(val))
+        self.resync(initial_values)
+
+    def _push(self, index, val):
+        while self.max_deque and self.max_deque[-1][1] <= val:
+            self.max_deque.pop()
+        self.max_deque.append((index, val))
+        while self.min_deque and self.min_deque[-1][1] >= val:
+            self.min_deque.pop()
+        self.min_deque.append((index, val))
+
+    def _expire(self, index):
+        # Drop values that have been overwritten by the write at index
+        oldest_index = index - self.size
+        while self.max_deque and self.max_deque[0][0] <= oldest_index:
+            self.max_deque.popleft()
+        while self.min_deque and self.min_deque[0][0] <= oldest_index:
+            self.min_deque.popleft()
+
+    def resync(self, buffer):
+        finite = [val for val in buffer if isfinite(val)]
+        self.num_nonfinite = len(buffer) - len(finite)
+        self.sum = sum(finite)
+        self.sum_sq = sum(val * val for val in finite)
+
+    def replace(self, old_val, new_val, buffer):
+        # Call after buffer has had old_val overwritten by new_val
+        self.buffer_sum = None
+        if isfinite(old_val):
+            self.sum -= old_val
+            self.sum_sq -= old_val * old_val
+            del self.sorted_values[bisect_left(self.sorted_values, old_val)]
+        else:
+            self.num_nonfinite -= 1
+
+        if isfinite(new_val):
+            self.sum += new_val
+            self.sum_sq += new_val * new_val
+            insort(self.sorted_values, new_val)
+            self._push(self.count, new_val)
+        else:
+            self.num_nonfinite += 1
+
+        self._expire(self.count)
+        self.count += 1
+        if self.count % self.size == 0:
+            self.resync(buffer)
+
+    def total(self):
+        if self.buffer_sum is None:
+            self.buffer_sum = sum(self.buffer)
+        return self.buffer_sum
+
+    def max(self):
+        return self.max_deque[0][1] if not self.num_nonfinite else float('nan')
+
+    def min(self):
+        return self.min_deque[0][1] if not self.num_nonfinite else float('nan')
+
+    def mean(self):
+        return self.total() / self.size
+
+    def variance(self):
+        if self.num_nonfinite:
+            return float('nan')
+        mean = self.sum / self.size
+        return max(self.sum_sq / self.size - mean * mean, 0.0)
+
+    def median(self):
+        if self.num_nonfinite:
+            return float('nan')
+        mid = self.size // 2
+        if self.size % 2:
+            return self.sorted_values[mid]
+        return (self.sorted_values[mid - 1] + self.sorted_values[mid]) / 2
+
+
 class MovingAverageFilter:
     # Use to track averages of some numerical quantity
     def __init__(self, initial_value:float = 0, size:int = 5):
         self.size = size
         self.buffer = [initial_value] * self.size
         self.pntr = 0
+        self.stats = WindowStats(self.buffer)
 
     def most_recent(self):
         return self.buffer[self.pntr - 1]
 
     def average(self):
-        return sum(self.buffer) / self.size
-    
+        return self.stats.total() / self.size
+
+    def max(self):
+        return self.stats.max()
+
+    def min(self):
+        return self.stats.min()
+
+    def variance(self):
+        return self.stats.variance()
+
+    def median(self):
+        return self.stats.median()
+
     def update(self, val):
+        old_val = self.buffer[self.pntr]
         self.buffer[self.pntr] = val
         self.pntr = (self.pntr + 1) % self.size
+        self.stats.replace(old_val, val, self.buffer)
 
 
 class TrueAfter:
@@ -37,9 +158,9 @@ class MovingAverageFilterPlus:
     # Use to track averages of max_size number of values
     # Plus adds cold start option fills buffer overtime until reaches max_size
     def __init__(self, cold_start:bool = False, initial_value:float = 0, size:int = 5):
-        # Buffer size atleast 2 for trimmed average 
+        # Buffer size atleast 2 for trimmed average
         self.size = max(size, 2)
-        
+
         # Cold start condition
         # warm bool indicates if buffer has been filled
         if cold_start:
@@ -51,6 +172,7 @@ class MovingAverageFilterPlus:
 
         self.buffer = [init_val] * self.size
         self.pntr = 0
+        self.stats = WindowStats(self.buffer)
 
     def iswarm(self):
         return self.warm
@@ -61,21 +183,144 @@ class MovingAverageFilterPlus:
     def average(self):
         # Regular old average
         if self.warm.isafter():
-            return sum(self.buffer) / self.size
+            return self.stats.total() / self.size
         else:
-            return sum(self.buffer) / max(self.pntr, 1)
-        
+            return self.stats.total() / max(self.pntr, 1)
+
     def trimmed_average(self):
         # Returns average without largest value in buffer
         if self.warm.isafter():
-            return (sum(self.buffer) - max(self.buffer)) / (self.size - 1)
+            return (self.stats.total() - self.stats.max()) / (self.size - 1)
         elif self.pntr < 1:
             # Need atleast 2 element for trimmed average
-            return sum(self.buffer)
+            return self.stats.total()
         else:
-            return (sum(self.buffer) - max(self.buffer)) / max(self.pntr - 1, 1)
-    
+            return (self.stats.total() - self.stats.max()) / max(self.pntr - 1, 1)
+
+    def max(self):
+        return self.stats.max()
+
+    def min(self):
+        return self.stats.min()
+
+    def variance(self):
+        return self.stats.variance()
+
+    def median(self):
+        return self.stats.median()
+
     def update(self, val):
-        self.size = min(self.size + 1, self.size)
+        old_val = self.buffer[self.pntr]
         self.buffer[self.pntr] = val
         self.pntr = (self.pntr + 1) % self.size
+        self.stats.replace(old_val, val, self.buffer)
+
+
+def hysteresis(on, off, initial=False):
+    # Vectorized two-threshold state over a whole array of samples
+    # State turns True on samples where on is True and False where off is True, otherwise holds
+    # on and off must never both be True for the same sample (i.e. off threshold below on threshold)
+    on = np.asarray(on, dtype=bool)
+    off = np.asarray(off, dtype=bool)
+    idx = np.arange(len(on))
+    last_on = np.maximum.accumulate(np.where(on, idx, -1)) if len(on) else idx
+    last_off = np.maximum.accumulate(np.where(off, idx, -1)) if len(off) else idx
+    return np.where((last_on < 0) & (last_off < 0), initial, last_on > last_off)
+
+
+def hold_last(values, valid, initial):
+    # values[i] where valid[i], otherwise the most recent valid value (initial before the first one)
+    idx = np.arange(len(values))
+    last_valid = np.maximum.accumulate(np.where(valid, idx, -1)) if len(values) else idx
+    return np.where(last_valid >= 0, np.asarray(values)[np.maximum(last_valid, 0)], initial)
+
+
+class DeviceClock:
+    # Maps a device timestamp (e.g. Dephy state_time) onto the host monotonic clock
+    # Fits host = offset + rate * device with exponentially weighted least squares, so the rate absorbs
+    # the drift between the two oscillators and the fit averages out host read/scheduling jitter
+    # The mapped times keep the spacing of the device clock, which is what the period calculations need
+    # The rate is held at 1.0 until min_samples samples have been fitted (after a start or device restart), and the
+    # returned times never go backwards, even when a refit moves the offset
+    def __init__(self, forgetting:float = 0.9999, min_samples:int = 100, clock = time.monotonic):
+        self.forgetting = forgetting
+        self.min_samples = min_samples
+        self.clock = clock
+        self.prev_mapped = None     # kept across resets: one non-decreasing timestamp per sample
+        self.reset()
+
+    def reset(self):
+        self.device_ref = None
+        self.host_ref = None
+        self.prev_device_time = None
+        self.num_samples = 0
+        # weighted sums of x = device - device_ref, y = host - host_ref
+        self.w = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.offset = 0.0
+        self.rate = 1.0
+
+    def update(self, device_time:float, host_time:float = None) -> float:
+        """
+        Folds in one (device, host) sample pair and returns device_time mapped to the host clock
+        (never earlier than the previous sample's mapped time).
+
+        Args:
+            device_time: device timestamp (s)
+            host_time: host monotonic time the sample was read, defaults to now
+        """
+        if host_time is None:
+            host_time = self.clock()
+
+        # device restarted (or timestamp wrapped): start the fit over
+        if self.prev_device_time is not None and device_time < self.prev_device_time:
+            self.reset()
+        self.prev_device_time = device_time
+
+        if self.device_ref is None:
+            self.device_ref = device_time
+            self.host_ref = host_time
+
+        x = device_time - self.device_ref
+        y = host_time - self.host_ref
+        f = self.forgetting
+        self.num_samples += 1
+        self.w = f * self.w + 1
+        self.sx = f * self.sx + x
+        self.sy = f * self.sy + y
+        self.sxx = f * self.sxx + x * x
+        self.sxy = f * self.sxy + x * y
+
+        var_x = self.sxx - self.sx * self.sx / self.w
+        if self.num_samples >= self.min_samples and var_x > 1e-9:
+            self.rate = (self.sxy - self.sx * self.sy / self.w) / var_x
+        self.offset = (self.sy - self.rate * self.sx) / self.w
+
+        mapped = self.to_host(device_time)
+        if self.prev_mapped is not None:
+            mapped = max(mapped, self.prev_mapped)
+        self.prev_mapped = mapped
+        return mapped
+
+    def to_host(self, device_time:float) -> float:
+        """Maps a device timestamp (s) to the host monotonic clock with the current fit"""
+        return self.host_ref + self.offset + self.rate * (device_time - self.device_ref)
+
+
+class WindowMean:
+    # Mean of the last size appended values (of all of them until there are size), i.e. np.mean(values[-size:])
+    # on an ever-growing list, but with fixed storage
+    # The window is small, so it is re-summed in order on each append. For windows under 8 values (numpy sums those
+    # in order too) results are bitwise identical to np.mean; larger windows can differ in the last bit
+    def __init__(self, initial_values = (), size:int = 5):
+        self.values = deque(initial_values, maxlen=size)
+        self.window_mean = sum(self.values) / len(self.values) if self.values else 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+    def append(self, val):
+        self.values.append(val)
+        self.window_mean = sum(self.values) / len(self.values)
+
+    def mean(self):
+        return self.window_mean